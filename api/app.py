@@ -5,16 +5,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import APIKeyHeader
 # Import Pydantic for data validation and settings management
 from pydantic import BaseModel
-# Import OpenAI client for interacting with OpenAI's API
-from openai import OpenAI
 import os
 import sys
-from typing import Optional, List
+from typing import Optional, List, Set
 import time
 import logging
 from datetime import datetime
 from pathlib import Path
-import shutil
+import uuid
+import asyncio
+import hashlib
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request as StarletteRequest
 from fastapi import status
@@ -26,7 +26,17 @@ if str(current_dir) not in sys.path:
 
 # Import custom utilities
 from utils.document_processor import DocumentProcessor
-from utils.vector_store import VectorStoreManager
+from utils.vector_store import VectorStoreManager, SEARCH_MODES
+from utils.metadata_index import MetadataFilter
+from utils.embedding_cache import EmbeddingCache
+from utils.api_key_cache import ApiKeyValidationCache
+from utils.client_registry import OpenAIClientRegistry
+from utils.store_registry import VectorStoreRegistry
+from utils.jobs import IngestionJobManager, IngestionJob, JobQueueFullError, JobStatusDirectory
+from utils.artifact_cache import DocumentArtifactCache, prune_to_size
+from utils.answer_cache import SemanticAnswerCache
+from utils.context_packer import ContextPacker
+from utils.cold_start import prewarm
 
 # Configure logging
 logging.basicConfig(
@@ -43,9 +53,69 @@ logger = logging.getLogger(__name__)
 app = FastAPI(title="OpenAI Chat API")
 
 # --- Global variable definitions ---
-vector_store: Optional[VectorStoreManager] = None
-# Initialize document processor EARLY - before routes that use it
-document_processor = DocumentProcessor(chunk_size=1024, chunk_overlap=0.25)
+# Embedding throughput knobs: chunks per request and batches in flight
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 100))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", 4))
+# Vector index: "exact" or "ivf" (approximate, used once a tenant holds VECTOR_ANN_MIN_SIZE chunks)
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "exact")
+VECTOR_ANN_MIN_SIZE = int(os.getenv("VECTOR_ANN_MIN_SIZE", 5000))
+IVF_NLIST = int(os.getenv("IVF_NLIST", 0)) or None
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 8))
+# Embedding storage precision: float32, float16 or int8 (scalar-quantized with a per-vector scale)
+VECTOR_PRECISION = os.getenv("VECTOR_PRECISION", "float32")
+# Default retrieval: "dense" (cosine), "lexical" (BM25, no embedding call) or "hybrid" (rank fusion of both)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "dense")
+# Chat context: candidates retrieved, then MMR-ordered, merged and packed into CHAT_CONTEXT_TOKENS
+CHAT_CONTEXT_CANDIDATES = int(os.getenv("CHAT_CONTEXT_CANDIDATES", 20))
+context_packer = ContextPacker(
+    token_budget=int(os.getenv("CHAT_CONTEXT_TOKENS", 3000)),
+    mmr_lambda=float(os.getenv("CHAT_CONTEXT_MMR_LAMBDA", 0.7)),
+)
+# Most queries accepted by one POST /api/query/batch call
+QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", 64))
+# Ingestion-time dedup: chunks at least this similar (MinHash Jaccard estimate) to a stored chunk, with
+# identical figures, become back-references instead of new rows. The default 1 merges exact copies only;
+# lower values opt in to near-duplicate merging, which drops the merged chunk's text; "off" disables dedup
+DEDUP_THRESHOLD = None if os.getenv("DEDUP_THRESHOLD", "1") == "off" else float(os.getenv("DEDUP_THRESHOLD", "1"))
+# Optional Redis tier for running several instances behind a load balancer: tenant indexes, the
+# embedding cache, API-key validations and job status are shared through REDIS_URL instead of local disk
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_PREFIX = os.getenv("REDIS_PREFIX", "bw")
+if REDIS_URL:
+    from utils.redis_backend import (
+        connect, RedisIndexTier, RedisEmbeddingCache, RedisApiKeyValidationCache, RedisJobStatus,
+    )
+    redis_client = connect(REDIS_URL)
+else:
+    redis_client = None
+# Content-addressed embedding cache shared by every VectorStoreManager in this process (or, with Redis,
+# every instance; REDIS_EMBEDDING_TTL expires entries, 0 keeps them until Redis evicts them). The SQLite
+# file is opened on the first embedding lookup, not at import.
+if redis_client is not None:
+    embedding_cache = RedisEmbeddingCache(
+        redis_client, prefix=REDIS_PREFIX, ttl=float(os.getenv("REDIS_EMBEDDING_TTL", 0)) or None,
+    )
+else:
+    embedding_cache = EmbeddingCache(
+        Path(os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite3")),
+        max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 200_000)),
+    )
+# Initialize document processor EARLY - before routes that use it. Construction is cheap: the parsing
+# stack (llama_index, pypdf) loads on the first upload, or right after startup with PREWARM=true.
+# PDF_PARSE_WORKERS sets the parse/split process pool size (default: one per core, 1 parses inline).
+document_processor = DocumentProcessor(
+    chunk_size=1024,
+    chunk_overlap=0.25,
+    parse_workers=int(os.getenv("PDF_PARSE_WORKERS", 0)) or None,
+)
+# Uploads are stored by content hash; parsed chunks + embeddings are cached per hash and chunker settings.
+# Both directories are pruned least-recently-used first past their size limits.
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "data/uploads"))
+UPLOAD_DIR_MAX_BYTES = int(os.getenv("UPLOAD_DIR_MAX_MB", 2048)) * 1024 * 1024
+artifact_cache = DocumentArtifactCache(
+    Path(os.getenv("DOCUMENT_ARTIFACT_DIR", "data/artifacts")),
+    max_bytes=int(os.getenv("DOCUMENT_ARTIFACT_MAX_MB", 2048)) * 1024 * 1024,
+)
 # --- End Global variable definitions ---
 
 # API Key header for authentication
@@ -59,38 +129,93 @@ app.add_middleware(
     allow_credentials=True,  # Allows cookies to be included in requests
     allow_methods=["*"],  # Allows all HTTP methods (GET, POST, etc.)
     allow_headers=["*"],  # Allows all headers in requests
+    expose_headers=["X-Answer-Cache"],  # Lets the browser see whether a chat answer was replayed
+)
+
+# One warm sync+async OpenAI client pair per API key, shared by chat, validation and embeddings
+client_registry = OpenAIClientRegistry(
+    max_keys=int(os.getenv("OPENAI_CLIENT_MAX_KEYS", 32)),
+    idle_ttl=float(os.getenv("OPENAI_CLIENT_IDLE_TTL", 1800)),
 )
 
 # Cache for API key validation
+api_key_cache_settings = dict(
+    positive_ttl=float(os.getenv("API_KEY_CACHE_TTL", 600)),
+    negative_ttl=float(os.getenv("API_KEY_CACHE_NEGATIVE_TTL", 30)),
+    max_size=int(os.getenv("API_KEY_CACHE_MAX_SIZE", 1024)),
+)
+if redis_client is not None:
+    api_key_cache = RedisApiKeyValidationCache(redis_client, prefix=REDIS_PREFIX, **api_key_cache_settings)
+else:
+    api_key_cache = ApiKeyValidationCache(**api_key_cache_settings)
+
 def validate_api_key(api_key: str) -> bool:
+    """Check a key against OpenAI; raises on errors that say nothing about the key itself."""
+    from openai import AuthenticationError, PermissionDeniedError
+
     try:
-        client = OpenAI(api_key=api_key)
-        client.models.list()
+        client_registry.get(api_key).client.models.list()
         print(f"API key {api_key[:8]}... validated successfully.")
         return True
-    except Exception as e:
+    except (AuthenticationError, PermissionDeniedError) as e:
         print(f"API key {api_key[:8]}... failed: {e}")
+        client_registry.discard(api_key)
         return False
 
 async def get_api_key(api_key: str = Depends(api_key_header)):
-    if not validate_api_key(api_key):
+    try:
+        is_valid = await api_key_cache.validate(api_key, validate_api_key)
+    except Exception as e:
+        # Transient failures are not cached, so the next request re-validates
+        logger.warning(f"API key {api_key[:8]}... could not be validated: {e}")
+        is_valid = False
+    if not is_valid:
         raise HTTPException(
             status_code=401,
             detail="Invalid API key"
         )
     return api_key
 
+# Metadata predicates applied before scoring; unset fields don't filter
+class SearchFilters(BaseModel):
+    file_names: Optional[Set[str]] = None   # file_name in {...}
+    document_ids: Optional[Set[str]] = None
+    page_min: Optional[int] = None          # inclusive page range, 1-based
+    page_max: Optional[int] = None
+    has_tables: Optional[bool] = None
+    has_images: Optional[bool] = None
+
+    def to_metadata_filter(self) -> MetadataFilter:
+        return MetadataFilter(
+            file_names=sorted(self.file_names) if self.file_names is not None else None,
+            document_ids=sorted(self.document_ids) if self.document_ids is not None else None,
+            page_min=self.page_min,
+            page_max=self.page_max,
+            has_tables=self.has_tables,
+            has_images=self.has_images,
+        )
+
 # Define the data model for chat requests using Pydantic
 # This ensures incoming request data is properly validated
 class ChatRequest(BaseModel):
     developer_message: str  # Message from the developer/system
     user_message: str      # Message from the user
     model: Optional[str] = "gpt-4.1-mini"  # Optional model selection with default
+    filters: Optional[SearchFilters] = None  # Restrict retrieved context, e.g. to one file
 
 class QueryRequest(BaseModel):
     query: str
     limit: Optional[int] = 5
     score_threshold: Optional[float] = 0.7
+    mode: Optional[str] = None  # dense | lexical | hybrid; defaults to SEARCH_MODE
+    filters: Optional[SearchFilters] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    limit: Optional[int] = 5
+    score_threshold: Optional[float] = 0.7
+    mode: Optional[str] = None  # dense | lexical | hybrid; defaults to SEARCH_MODE
+    filters: Optional[SearchFilters] = None  # applied to every query
 
 # Middleware for request logging
 @app.middleware("http")
@@ -120,60 +245,207 @@ class LimitUploadSizeMiddleware(BaseHTTPMiddleware):
 # Add this middleware to your app (e.g., 100MB limit)
 app.add_middleware(LimitUploadSizeMiddleware, max_upload_size=100 * 1024 * 1024)
 
+def new_vector_store_manager(api_key: str) -> VectorStoreManager:
+    """Build a VectorStoreManager with the configured embedding batching."""
+    clients = client_registry.get(api_key)
+    return VectorStoreManager(
+        openai_api_key=api_key,
+        embed_batch_size=EMBED_BATCH_SIZE,
+        max_concurrent_batches=EMBED_MAX_CONCURRENCY,
+        embedding_cache=embedding_cache,
+        http_client=clients.http_client,
+        async_http_client=clients.async_http_client,
+        index_mode=VECTOR_INDEX_MODE,
+        ann_min_size=VECTOR_ANN_MIN_SIZE,
+        ivf_nlist=IVF_NLIST,
+        ivf_nprobe=IVF_NPROBE,
+        precision=VECTOR_PRECISION,
+        search_mode=SEARCH_MODE,
+        dedup_threshold=DEDUP_THRESHOLD,
+    )
+
+# One VectorStoreManager per tenant (API key), snapshotted to disk so restarts reopen it via mmap.
+# LRU tenants are evicted from memory past the memory budget. Uvicorn workers sharing VECTOR_STORE_DIR
+# see each other's changes: writers publish a new snapshot generation and readers remap it.
+# With REDIS_URL the tenants live in Redis instead, and each instance keeps a local hot copy that it
+# reloads when the tenant's version key moves (checked at most every REDIS_SYNC_INTERVAL seconds).
+vector_stores = VectorStoreRegistry(
+    factory=new_vector_store_manager,
+    data_dir=Path(os.getenv("VECTOR_STORE_DIR", "data/vector_stores")),
+    memory_budget_bytes=int(os.getenv("VECTOR_STORE_MEMORY_BUDGET_MB", 512)) * 1024 * 1024,
+    tier=RedisIndexTier(
+        redis_client,
+        prefix=REDIS_PREFIX,
+        sync_interval=float(os.getenv("REDIS_SYNC_INTERVAL", 1.0)),
+    ) if redis_client is not None else None,
+)
+
+# Optional semantic answer cache for /api/chat: replays an earlier answer when the same chunks were
+# retrieved for a query whose embedding is at least ANSWER_CACHE_SIMILARITY cosine-similar
+answer_cache = SemanticAnswerCache(
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.95)),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", 3600)),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000)),
+) if os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in ("1", "true", "yes") else None
+
+# Background ingestion: a few workers behind a bounded queue so uploads return immediately
+# Job status is also published under JOB_STATUS_DIR (or to Redis) so any worker or instance can answer a poll
+ingestion_jobs = IngestionJobManager(
+    max_workers=int(os.getenv("INGEST_WORKERS", 2)),
+    max_queued=int(os.getenv("INGEST_QUEUE_SIZE", 8)),
+    status_store=RedisJobStatus(redis_client, prefix=REDIS_PREFIX) if redis_client is not None
+    else JobStatusDirectory(Path(os.getenv("JOB_STATUS_DIR", "data/jobs"))),
+)
+
+def save_upload(source) -> "tuple[str, Path]":
+    """Copy an upload to UPLOAD_DIR in chunks, hashing as it goes; returns (sha256, stored path)."""
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    tmp_path = UPLOAD_DIR / f".upload-{uuid.uuid4().hex}"
+    try:
+        with tmp_path.open("wb") as buffer:
+            for block in iter(lambda: source.read(1024 * 1024), b""):
+                digest.update(block)
+                buffer.write(block)
+        content_hash = digest.hexdigest()
+        file_path = UPLOAD_DIR / f"{content_hash}.pdf"
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return content_hash, file_path
+
 # --- Dependency function DEFINITIONS must come BEFORE their use in route decorators ---
 async def get_vector_store(api_key: str = Depends(get_api_key)) -> VectorStoreManager:
-    """Dependency to get the initialized VectorStoreManager instance."""
-    global vector_store
-    if vector_store is None:
-        logger.info("VectorStoreManager not initialized, initializing now.")
-        vector_store = VectorStoreManager(openai_api_key=api_key)
-    elif vector_store.embedding_model.api_key != api_key:
-        logger.info("API key changed, re-initializing VectorStoreManager.")
-        vector_store = VectorStoreManager(openai_api_key=api_key)
+    """Dependency to get the calling tenant's VectorStoreManager instance."""
+    # Only refreshes that need I/O (another worker or instance published) leave the event loop
+    vector_store = await vector_stores.aget(api_key)
+    clients = client_registry.get(api_key)
+    if vector_store.http_client is not clients.http_client:
+        # The key's pool was evicted while idle; move the store onto the fresh one
+        vector_store.use_http_clients(api_key, clients.http_client, clients.async_http_client)
     return vector_store
 # --- End of critical dependency function definitions ---
 
+# llama_index, openai and pypdf load on the first request that needs them, so "/" and /api/health answer
+# without them. PREWARM=true loads them in the background right after startup, off the readiness path.
+PREWARM = os.getenv("PREWARM", "false").lower() in ("1", "true", "yes")
+
 @app.on_event("startup")
 async def startup_event():
-    global vector_store
-    vector_store = VectorStoreManager(openai_api_key=os.getenv("OPENAI_API_KEY", "your-default-api-key"))
+    if PREWARM:
+        asyncio.get_running_loop().run_in_executor(None, prewarm, document_processor)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    ingestion_jobs.shutdown()
+    document_processor.shutdown()
+    await client_registry.aclose()
+    embedding_cache.close()
+    if redis_client is not None:
+        redis_client.close()
 
 # File upload endpoint
-@app.post("/api/upload")
+@app.post("/api/upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_file(
     request: Request,
     file: UploadFile = File(...),
     api_key: str = Depends(get_api_key),
     current_vector_store: VectorStoreManager = Depends(get_vector_store)
 ):
+    """Save the upload and queue its ingestion; poll GET /api/jobs/{job_id} for progress."""
     try:
-        # Create data directory if it doesn't exist
-        data_dir = Path("data")
-        data_dir.mkdir(exist_ok=True)
-
-        # Save uploaded file
-        file_path = data_dir / file.filename
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Process document
-        documents = document_processor.process_file(file_path)
-        chunks = document_processor.split_documents(documents)
+        if Path(file.filename).suffix.lower() != '.pdf':
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported file extension: {Path(file.filename).suffix.lower()}. Only .pdf is currently supported."
+            )
 
-        # Add to vector store - Clear any existing documents first for SimpleVectorStore
-        current_vector_store.delete_collection()
-        current_vector_store.add_documents(chunks)
+        # Hash while streaming to disk, then store under the hash so same-named files never collide
+        content_hash, file_path = await asyncio.to_thread(save_upload, file.file)
+        artifact_key = DocumentArtifactCache.key(content_hash, {
+            **document_processor.settings(),
+            "embedding_model": current_vector_store.embedding_model_name,
+        })
+
+        def ingest(job: IngestionJob) -> None:
+            job.document_id = uuid.uuid4().hex[:12]
+
+            # Held across the whole ingestion: other workers' writes to this tenant wait, and this one
+            # starts from their latest published snapshot
+            with vector_stores.writing(api_key) as store:
+                artifact = artifact_cache.load(artifact_key)
+                if artifact is not None:
+                    # Identical file and settings: reuse its chunks and embeddings, no parsing or embedding
+                    job.stage = "restoring"
+                    records, vectors, info = artifact
+                    store.restore_document(records, vectors, job.document_id, file.filename, report=job.report)
+                    job.pages_parsed = info.get("page_count", 0)
+                else:
+                    def staged_chunks():
+                        # Pages are parsed and split in a process pool and arrive here in order
+                        for page_chunks in document_processor.iter_page_chunks(file_path, file_name=file.filename):
+                            job.pages_parsed += 1
+                            if page_chunks:
+                                job.stage = "embedding"
+                            yield from page_chunks
+
+                    # Stream pages -> chunks -> embedding batches -> index; chunks are searchable as soon as indexed
+                    store.add_document_stream(staged_chunks(), job.document_id, report=job.report)
+
+                    records, vectors = store.export_document(job.document_id)
+                    if records:
+                        artifact_cache.save(artifact_key, records, vectors, {"page_count": job.pages_parsed})
+
+                store.update_document(job.document_id, content_hash=content_hash)
+                # A re-upload of the same file replaces the previous copy once the new one is in; a different
+                # file that shares the name (e.g. next quarter's report.pdf) is kept alongside it
+                for existing in store.list_documents():
+                    if (
+                        existing["document_id"] != job.document_id
+                        and existing["file_name"] == file.filename
+                        and existing.get("content_hash") == content_hash
+                    ):
+                        store.remove_document(existing["document_id"])
+
+                # Snapshotted and published to the other workers as the block exits
+                job.stage = "persisting"
+            vector_stores.enforce_budget()
+            # The upload is only needed until it is indexed; queued uploads are the newest, so pruned last
+            prune_to_size(UPLOAD_DIR, UPLOAD_DIR_MAX_BYTES, keep=[file_path])
+
+        # submit() publishes the queued status (a file or Redis write), so it runs off the event loop
+        job = await asyncio.to_thread(ingestion_jobs.submit, vector_stores.tenant_id(api_key), file.filename, ingest)
+        logger.info(f"Queued ingestion job {job.job_id} for {file.filename}")
 
         return {
-            "message": "File processed successfully",
-            "chunks": len(chunks),
+            "message": "File accepted for processing",
+            "job_id": job.job_id,
+            "status_url": f"/api/jobs/{job.job_id}",
             "filename": file.filename
         }
 
+    except HTTPException:
+        raise
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Ingestion job status endpoint
+@app.get("/api/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    api_key: str = Depends(get_api_key)
+):
+    """Report stage, pages parsed, chunks embedded and throughput for an upload."""
+    # Jobs running in another worker or instance are read from the shared status store
+    job = await asyncio.to_thread(ingestion_jobs.status, job_id, vector_stores.tenant_id(api_key))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
 # Query endpoint
 @app.post("/api/query")
 async def query_documents(
@@ -182,32 +454,26 @@ async def query_documents(
     api_key: str = Depends(get_api_key),
     current_vector_store: VectorStoreManager = Depends(get_vector_store)
 ):
+    if query_request.mode is not None and query_request.mode not in SEARCH_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown search mode: {query_request.mode}. Use one of: {', '.join(SEARCH_MODES)}."
+        )
     try:
-        results = current_vector_store.search(
+        results = await current_vector_store.asearch(
             query=query_request.query,
             limit=query_request.limit,
-            score_threshold=query_request.score_threshold
+            score_threshold=query_request.score_threshold,
+            mode=query_request.mode,
+            filters=query_request.filters.to_metadata_filter() if query_request.filters else None
         )
 
-        logger.info(f"Raw search results from vector_store.search: {results}")
-
-        # De-duplicate results based on text content, keeping the one with the highest score if text is identical
-        unique_results_dict = {}
-        for result_item in results:
-            text_content = result_item.get('text')
-            current_score = result_item.get('score', 0)
-            if text_content not in unique_results_dict or current_score > unique_results_dict[text_content].get('score', 0):
-                unique_results_dict[text_content] = result_item
-        
-        deduplicated_results = list(unique_results_dict.values())
-        # Sort by score again after de-duplication if needed, though dictionary preserves insertion order in Python 3.7+
-        # For explicit sort by score (descending):
-        # deduplicated_results.sort(key=lambda x: x.get('score', 0), reverse=True)
-
-        logger.info(f"De-duplicated search results: {deduplicated_results}")
+        # Duplicates are collapsed at ingestion: each result is stored once and lists its
+        # other locations in metadata["duplicates"]
+        logger.info(f"Search results from vector_store.search: {results}")
 
         return {
-            "results": deduplicated_results,
+            "results": results,
             "query": query_request.query
         }
 
@@ -215,6 +481,53 @@ async def query_documents(
         logger.error(f"Error querying documents: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+async def replay_answer(answer: str, piece_size: int = 64):
+    """Stream a cached answer in small pieces, like a live completion."""
+    for start in range(0, len(answer), piece_size):
+        yield answer[start:start + piece_size]
+        await asyncio.sleep(0)
+
+# Batch query endpoint
+@app.post("/api/query/batch")
+async def query_documents_batch(
+    request: Request,
+    batch_request: BatchQueryRequest,
+    api_key: str = Depends(get_api_key),
+    current_vector_store: VectorStoreManager = Depends(get_vector_store)
+):
+    """Run many queries with one embedding request and one scoring pass; same semantics as /api/query."""
+    if not batch_request.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required.")
+    if len(batch_request.queries) > QUERY_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries: {len(batch_request.queries)} (at most {QUERY_BATCH_MAX} per batch)."
+        )
+    if batch_request.mode is not None and batch_request.mode not in SEARCH_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown search mode: {batch_request.mode}. Use one of: {', '.join(SEARCH_MODES)}."
+        )
+    try:
+        batch_results = await current_vector_store.asearch_batch(
+            queries=batch_request.queries,
+            limit=batch_request.limit,
+            score_threshold=batch_request.score_threshold,
+            mode=batch_request.mode,
+            filters=batch_request.filters.to_metadata_filter() if batch_request.filters else None
+        )
+        logger.info(f"Batch search: {len(batch_request.queries)} queries")
+        return {
+            "results": [
+                {"query": query, "results": results}
+                for query, results in zip(batch_request.queries, batch_results)
+            ]
+        }
+
+    except Exception as e:
+        logger.error(f"Error querying documents in batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Define the main chat endpoint that handles POST requests
 @app.post("/api/chat")
 async def chat(
@@ -224,20 +537,31 @@ async def chat(
     current_vector_store: VectorStoreManager = Depends(get_vector_store)
 ):
     try:
-        retrieved_docs = []
+        passages = []
+        query_embedding = None
         context_for_prompt = "No context from uploaded documents was available or retrieved."
+        retrieval_ok = False
+        # Read before retrieving, so an answer is never cached against contents it did not see
+        collection_version = current_vector_store.collection_version if current_vector_store else ""
 
         if current_vector_store:
             try:
-                retrieved_docs = current_vector_store.search(query=chat_request.user_message, limit=3)
-                logger.info(f"Retrieved {len(retrieved_docs)} documents for chat context.")
-                if retrieved_docs:
-                    context_for_prompt = "Relevant context from uploaded documents:\n\n"
-                    for doc in retrieved_docs:
-                        context_for_prompt += f"- Source: {doc.get('metadata', {}).get('file_name', 'N/A')}, Page: {doc.get('metadata', {}).get('page_label', 'N/A')}\n"
-                        context_for_prompt += f"  Content: {doc.get('text', '')}\n\n"
+                # The search's query embedding (None in lexical mode) is reused for the answer cache
+                passages, query_embedding = await current_vector_store.apack_context(
+                    query=chat_request.user_message,
+                    packer=context_packer,
+                    candidates=CHAT_CONTEXT_CANDIDATES,
+                    filters=chat_request.filters.to_metadata_filter() if chat_request.filters else None
+                )
+                logger.info(
+                    f"Packed {sum(len(p.chunk_ids) for p in passages)} chunks into {len(passages)} passages, "
+                    f"{sum(p.token_count for p in passages)}/{context_packer.token_budget} context tokens."
+                )
+                if passages:
+                    context_for_prompt = ContextPacker.render(passages)
                 else:
                     context_for_prompt = "No relevant documents found for the query."
+                retrieval_ok = True
             except Exception as e:
                 logger.error(f"Error during document search for chat: {e}", exc_info=True)
                 context_for_prompt = "Error retrieving documents for context."
@@ -259,12 +583,36 @@ async def chat(
         
         logger.info(f"Sending to OpenAI for chat. System prompt (truncated): {final_system_prompt[:500]}... User message: {chat_request.user_message}")
 
-        client = OpenAI(api_key=api_key)
+        answer_key = None
+        if answer_cache is not None and retrieval_ok:
+            try:
+                if query_embedding is None:
+                    query_embedding = await current_vector_store.aembed_query(chat_request.user_message)
+                answer_key = SemanticAnswerCache.context_key(
+                    vector_stores.tenant_id(api_key),
+                    chat_request.model,
+                    base_system_prompt,
+                    [chunk_id for passage in passages for chunk_id in passage.chunk_ids],
+                    collection_version,
+                )
+                cached_answer = answer_cache.lookup(answer_key, query_embedding)
+            except Exception as e:
+                logger.error(f"Answer cache lookup failed: {e}", exc_info=True)
+                answer_key = cached_answer = None
+            if cached_answer is not None:
+                logger.info("Serving chat answer from the semantic answer cache")
+                return StreamingResponse(
+                    replay_answer(cached_answer),
+                    media_type="text/event-stream",
+                    headers={"X-Answer-Cache": "hit"}
+                )
+
+        client = client_registry.get(api_key).async_client
 
         async def generate():
             accumulated_response = ""
             try:
-                stream = client.chat.completions.create(
+                stream = await client.chat.completions.create(
                     model=chat_request.model,
                     messages=[
                         {"role": "system", "content": final_system_prompt},
@@ -272,17 +620,24 @@ async def chat(
                     ],
                     stream=True
                 )
-                for chunk in stream:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
                     content = chunk.choices[0].delta.content
                     if content:
                         accumulated_response += content
                         yield content
+
+                # Only complete answers are cached; errors and aborted streams never are
+                if answer_key is not None and accumulated_response:
+                    answer_cache.store(answer_key, query_embedding, accumulated_response)
                 
             except Exception as e:
                 logger.error(f"OpenAI API call failed: {str(e)}", exc_info=True)
                 yield "Sorry, I encountered an error processing your request with the AI model."
         
-        return StreamingResponse(generate(), media_type="text/event-stream")
+        headers = {"X-Answer-Cache": "miss"} if answer_cache is not None else None
+        return StreamingResponse(generate(), media_type="text/event-stream", headers=headers)
     
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
@@ -291,22 +646,24 @@ async def chat(
 # Health check endpoint
 @app.get("/api/health")
 async def health_check_reverted():
-    vector_store_active = False
-    global vector_store
-
-    try:
-        if vector_store:
-            vector_store_active = True
-    except Exception as e:
-        logger.warning(f"Health check: Vector store check failed: {e}")
-
+    # Counting persisted tenants scans the snapshot directory or calls Redis, so it runs off the event loop
+    vector_store_stats = await asyncio.to_thread(vector_stores.stats)
+    services = {
+        "openai": "ready", # This is a general assumption
+        "vector_store": "active" if len(vector_stores) else "not_initialized"
+    }
+    if redis_client is not None:
+        services["redis"] = "unreachable" if "tier_error" in vector_store_stats else "ok"
     return {
         "status": "ok",
         "timestamp": datetime.utcnow().isoformat(),
-        "services": {
-            "openai": "ready", # This is a general assumption
-            "vector_store": "active" if vector_store_active else "not_initialized"
-        }
+        "services": services,
+        "vector_stores": vector_store_stats,
+        "embedding_cache": embedding_cache.stats(),
+        "document_artifacts": artifact_cache.stats(),
+        "api_key_cache": api_key_cache.stats(),
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "openai_clients": client_registry.stats()
     }
 
 # Simple root health check for App Runner (no auth required)
@@ -318,6 +675,33 @@ async def root():
         "timestamp": datetime.utcnow().isoformat()
     }
 
+# List documents endpoint
+@app.get("/api/documents")
+async def list_documents(
+    request: Request,
+    api_key: str = Depends(get_api_key),
+    current_vector_store: VectorStoreManager = Depends(get_vector_store)
+):
+    """List the documents resident in the caller's vector store."""
+    return {"documents": current_vector_store.list_documents()}
+
+# Delete a single document endpoint
+@app.delete("/api/documents/{document_id}")
+async def delete_document(
+    document_id: str,
+    request: Request,
+    api_key: str = Depends(get_api_key),
+    current_vector_store: VectorStoreManager = Depends(get_vector_store)
+):
+    """Remove one document's chunks, leaving every other document's index untouched."""
+    def remove() -> bool:
+        with vector_stores.writing(api_key) as store:
+            return store.remove_document(document_id)
+
+    if not await asyncio.to_thread(remove):
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    return JSONResponse(status_code=status.HTTP_200_OK, content={"detail": f"Document {document_id} deleted."})
+
 # Delete documents endpoint
 @app.delete("/api/documents")
 async def delete_all_documents(
@@ -337,7 +721,11 @@ async def delete_all_documents(
                 content={"detail": "Vector store not initialized. API key might be missing or invalid."}
             )
 
-        deleted = current_vector_store.delete_collection()
+        def clear() -> bool:
+            with vector_stores.writing(api_key) as store:
+                return store.delete_collection()
+
+        deleted = await asyncio.to_thread(clear)
         if not deleted:
             # Handle cases where deletion might not have occurred as expected
             logger.warning("Vector store might not have been cleared as expected.")
@@ -0,0 +1,36 @@
+from typing import List
+import numpy as np
+import pytest
+from utils.vector_store import SimpleInMemoryVectorStore, VectorStoreNode
+
+def clustered(rng: np.random.Generator, rows: int, dimension: int = 64, clusters: int = 48, noise: float = 1.5) -> np.ndarray:
+    """Vectors scattered around a few topics, like chunk embeddings of related filings."""
+    centers = rng.normal(size=(clusters, dimension))
+    return (centers[rng.integers(clusters, size=rows)] + noise * rng.normal(size=(rows, dimension))).astype(np.float32)
+
+def make_nodes(count: int, document_id: str = "doc", start: int = 0) -> List[VectorStoreNode]:
+    return [
+        VectorStoreNode(
+            doc_id=f"{document_id}_{i}",
+            text=f"chunk {i}",
+            embedding=None,
+            metadata={"document_id": document_id, "file_name": f"{document_id}.pdf", "page_number": 1},
+        )
+        for i in range(start, start + count)
+    ]
+
+def recall_at_k(reference: SimpleInMemoryVectorStore, candidate: SimpleInMemoryVectorStore, queries: np.ndarray, k: int = 10) -> float:
+    """Mean fraction of the reference's exact top-k that the candidate's default search also returns."""
+    total = 0.0
+    for query in queries:
+        expected = {node.doc_id for node, _ in reference.query(query, top_k=k, exact=True)}
+        found = {node.doc_id for node, _ in candidate.query(query, top_k=k)}
+        total += len(expected & found) / len(expected)
+    return total / len(queries)
+
+@pytest.fixture
+def corpus():
+    """(rows, queries) drawn from the same topics."""
+    rng = np.random.default_rng(7)
+    vectors = clustered(rng, 12000 + 100)
+    return vectors[:12000], vectors[12000:]
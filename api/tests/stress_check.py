@@ -0,0 +1,177 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import tempfile
+import threading
+import time
+import numpy as np
+from utils.metadata_index import MetadataFilter
+from utils.vector_store import IndexView, SimpleInMemoryVectorStore, VectorStoreNode
+
+# Small vocabulary so BM25 queries match plenty of rows
+WORDS = "revenue margin guidance segment data center gaming automotive cash flow risk supply demand".split()
+
+def _document(rng: np.random.Generator, document_id: str, chunks: int, dimension: int):
+    nodes = []
+    for i in range(chunks):
+        text = " ".join(rng.choice(WORDS, size=12))
+        metadata = {"document_id": document_id, "file_name": f"{document_id}.pdf", "page_number": i % 5 + 1}
+        nodes.append(VectorStoreNode(doc_id=f"{document_id}_{i}", text=text, embedding=None, metadata=metadata))
+    return nodes, rng.normal(size=(chunks, dimension)).astype(np.float32)
+
+def _check_view(view: IndexView, rng: np.random.Generator, dimension: int, top_k: int) -> None:
+    """Run one round of reads against a view and raise AssertionError on anything inconsistent."""
+    query = rng.normal(size=dimension).astype(np.float32)
+    unit = query / np.linalg.norm(query)
+    results = view.query(query, top_k=top_k)
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True), "dense results out of order"
+    if results:
+        vectors = view.row_vectors([node.doc_id for node, _ in results])
+        assert np.allclose(vectors @ unit, scores, atol=1e-3), "dense score does not match its row"
+
+    if view.size:
+        # Derived indexes a reader builds lazily must cover every row of the view it was built on
+        row = int(rng.integers(view.size))
+        node = view._nodes[row]
+        assert view.row_index().get(node.doc_id) == row, "row index is missing a row"
+        rows = view.filter_rows(MetadataFilter(document_ids=[node.metadata["document_id"]]))
+        assert row in rows, "metadata index is missing a row"
+        assert view.query_text(node.text, top_k=1, rows=np.array([row])), "BM25 index is missing a row"
+
+    documents = view.list_documents()
+    if documents:
+        document_id = documents[int(rng.integers(len(documents)))]["document_id"]
+        rows = view.filter_rows(MetadataFilter(document_ids=[document_id]))
+        for node, _ in view.query(query, top_k=top_k, rows=rows):
+            locations = [node.metadata] + node.metadata.get("duplicates", [])
+            assert any(location.get("document_id") == document_id for location in locations), "filter leaked a row"
+
+    text = " ".join(rng.choice(WORDS, size=2))
+    lexical = view.query_text(text, top_k=top_k)
+    lexical_scores = [score for _, score in lexical]
+    assert lexical_scores == sorted(lexical_scores, reverse=True), "lexical results out of order"
+    batched = view.query_many([query], top_k=top_k)[0]
+    assert [node.doc_id for node, _ in batched] == [node.doc_id for node, _ in view.query(query, top_k=top_k, exact=True)]
+
+    # A held view must not change underneath its reader while writers publish new ones
+    assert view.query(query, top_k=top_k) == results, "held view changed"
+
+def run_stress_check(
+    readers: int = 8,
+    seconds: float = 5.0,
+    dimension: int = 64,
+    chunks_per_document: int = 40,
+    precision: str = "float32",
+    index_mode: str = "exact",
+    from_snapshot: bool = False,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Search from `readers` threads while one writer ingests, deduplicates and removes documents.
+
+    Every read checks ordering, that scores match the returned rows, that
+    filters hold, that lazily built indexes cover the whole view and that a
+    held view never changes. With from_snapshot, the store starts from a
+    loaded snapshot and is periodically saved and reloaded instead of
+    cleared, so readers keep building the indexes a load leaves out while
+    the writer appends. Returns counts and the first errors seen; an empty
+    "errors" list means the run passed.
+    """
+    store = SimpleInMemoryVectorStore(index_mode=index_mode, ann_min_size=200, precision=precision)
+    snapshot_dir: Optional[Path] = None
+    if from_snapshot:
+        snapshot_dir = Path(tempfile.mkdtemp(prefix="stress-snapshot-"))
+        nodes, vectors = _document(np.random.default_rng(seed + 1000), "seed", chunks_per_document, dimension)
+        store.add_nodes(nodes, vectors)
+        store.save(snapshot_dir)
+        store.load(snapshot_dir)
+    stop = threading.Event()
+    errors: List[str] = []
+    counts = {"reads": 0, "writes": 0}
+    lock = threading.Lock()
+
+    def read(worker: int) -> None:
+        rng = np.random.default_rng(seed + 1 + worker)
+        reads = 0
+        while not stop.is_set():
+            try:
+                _check_view(store.view(), rng, dimension, top_k=10)
+            except Exception as e:
+                with lock:
+                    errors.append(f"reader {worker}: {type(e).__name__}: {e}")
+                return
+            reads += 1
+        with lock:
+            counts["reads"] += reads
+
+    def write() -> None:
+        rng = np.random.default_rng(seed)
+        resident: List[str] = []
+        document = 0
+        while not stop.is_set():
+            try:
+                document_id = f"doc{document}"
+                nodes, vectors = _document(rng, document_id, chunks_per_document, dimension)
+                # Ingest in batches, like add_document_stream
+                for start in range(0, len(nodes), 8):
+                    store.add_nodes(nodes[start:start + 8], vectors[start:start + 8])
+                # As a registry writer does before publishing
+                store.train_ann()
+                if resident:
+                    # Claim a few of this document's locations as copies of an older document's rows
+                    donor = store.view().row_index()
+                    references = {
+                        doc_id: [{"document_id": document_id, "file_name": f"{document_id}.pdf", "page_number": 99}]
+                        for doc_id in list(donor)[:3]
+                    }
+                    store.add_duplicate_locations(references)
+                resident.append(document_id)
+                if len(resident) > 6:
+                    store.remove_document(resident.pop(int(rng.integers(len(resident)))))
+                if document % 25 == 24 and snapshot_dir is not None:
+                    store.save(snapshot_dir)
+                    store.load(snapshot_dir)
+                elif document % 25 == 24:
+                    store.clear()
+                    resident.clear()
+                document += 1
+                counts["writes"] += 1
+            except Exception as e:
+                with lock:
+                    errors.append(f"writer: {type(e).__name__}: {e}")
+                return
+
+    threads = [threading.Thread(target=read, args=(i,), daemon=True) for i in range(readers)]
+    threads.append(threading.Thread(target=write, daemon=True))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {
+        "seconds": round(time.perf_counter() - start, 2),
+        "readers": readers,
+        "reads": counts["reads"],
+        "documents_written": counts["writes"],
+        "final_rows": len(store),
+        "errors": errors[:10],
+    }
+
+if __name__ == "__main__":
+    # Run from api/: python -m tests.stress_check --readers 16 --seconds 30
+    parser = argparse.ArgumentParser(description="Stress concurrent search against ingestion on one store.")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--precision", default="float32", choices=["float32", "float16", "int8"])
+    parser.add_argument("--index-mode", default="exact", choices=["exact", "ivf"])
+    parser.add_argument("--from-snapshot", action="store_true", help="start from, and periodically reload, a snapshot")
+    args = parser.parse_args()
+    report = run_stress_check(
+        readers=args.readers, seconds=args.seconds, precision=args.precision, index_mode=args.index_mode,
+        from_snapshot=args.from_snapshot,
+    )
+    print(json.dumps(report, indent=2))
+    raise SystemExit(1 if report["errors"] else 0)
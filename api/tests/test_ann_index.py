@@ -0,0 +1,61 @@
+import numpy as np
+from utils.ann_index import IVFIndex
+from utils.vector_store import SimpleInMemoryVectorStore
+from .conftest import make_nodes, recall_at_k
+
+# IVF with the default nprobe must keep at least this share of the exact top-10
+RECALL_FLOOR = 0.9
+
+def ivf_store(**kwargs) -> SimpleInMemoryVectorStore:
+    return SimpleInMemoryVectorStore(index_mode="ivf", ann_min_size=1000, **kwargs)
+
+def test_ivf_recall_against_exact(corpus):
+    rows, queries = corpus
+    store = ivf_store()
+    store.add_nodes(make_nodes(len(rows)), rows)
+    assert store.train_ann()
+    assert recall_at_k(store, store, queries) >= RECALL_FLOOR
+
+def test_queries_never_train(corpus):
+    rows, queries = corpus
+    store = ivf_store()
+    store.add_nodes(make_nodes(len(rows)), rows)
+    exact = [node.doc_id for node, _ in store.query(queries[0], top_k=10, exact=True)]
+    assert [node.doc_id for node, _ in store.query(queries[0], top_k=10)] == exact
+    assert store.view()._ann is None
+
+def test_index_extends_until_stale(corpus):
+    rows, _ = corpus
+    store = ivf_store()
+    store.add_nodes(make_nodes(2000), rows[:2000])
+    assert store.train_ann()
+    store.add_nodes(make_nodes(4000, start=2000), rows[2000:6000])
+    assert len(store.view()._ann.labels) == 6000
+    assert not store.train_ann()
+    store.add_nodes(make_nodes(2000, start=6000), rows[6000:8000])
+    assert store.train_ann()
+    assert store.view()._ann.trained_size == 8000
+
+def test_snapshot_keeps_index(corpus, tmp_path):
+    rows, queries = corpus
+    store = ivf_store()
+    store.add_nodes(make_nodes(len(rows)), rows)
+    store.train_ann()
+    store.save(tmp_path)
+    loaded = ivf_store()
+    loaded.load(tmp_path)
+    assert np.array_equal(loaded.view()._ann.labels, store.view()._ann.labels)
+    assert np.array_equal(loaded.view()._ann.centroids, store.view()._ann.centroids)
+    assert [node.doc_id for node, _ in loaded.query(queries[0])] == [node.doc_id for node, _ in store.query(queries[0])]
+
+def test_lists_match_labels(corpus):
+    rows, queries = corpus
+    unit = rows / np.linalg.norm(rows, axis=1, keepdims=True)
+    index = IVFIndex(nprobe=4)
+    index.train(unit[:5000])
+    index = index.extended(unit[5000:9000]).extended(unit[9000:]).compacted(np.arange(0, len(rows), 3))
+    for query in queries[:10]:
+        candidates = index.candidates(query / np.linalg.norm(query))
+        probed = np.unique(index.labels[candidates])
+        assert len(probed) == 4
+        assert np.array_equal(candidates, np.flatnonzero(np.isin(index.labels, probed)))
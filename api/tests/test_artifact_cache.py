@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+import numpy as np
+from utils.artifact_cache import DocumentArtifactCache, prune_to_size
+from utils.snapshot import write_snapshot
+
+def artifact(count: int, dimension: int = 16):
+    records = [{"text": f"chunk {i}", "metadata": {"page_number": i + 1}} for i in range(count)]
+    return records, np.random.default_rng(count).normal(size=(count, dimension)).astype(np.float32)
+
+def test_concurrent_saves_of_one_key_write_it_once(tmp_path):
+    cache = DocumentArtifactCache(tmp_path)
+    records, vectors = artifact(200)
+    barrier = threading.Barrier(6)
+    written = []
+
+    def save():
+        barrier.wait()
+        written.append(cache.save("same-key", records, vectors, {"page_count": 3}))
+
+    threads = [threading.Thread(target=save) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(written) == [False] * 5 + [True]
+    loaded_records, loaded_vectors, info = cache.load("same-key")
+    assert loaded_records == records and np.array_equal(loaded_vectors, vectors) and info == {"page_count": 3}
+
+def test_save_failure_is_not_raised(tmp_path):
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+    records, vectors = artifact(3)
+    assert DocumentArtifactCache(blocker).save("key", records, vectors, {}) is False
+
+def test_least_recently_used_artifacts_are_pruned(tmp_path):
+    records, vectors = artifact(50)
+    cache = DocumentArtifactCache(tmp_path)
+    cache.save("first", records, vectors, {})
+    size = sum(f.stat().st_size for f in (tmp_path / "first").rglob("*") if f.is_file())
+    cache.max_bytes = int(size * 2.5)
+    cache.save("second", records, vectors, {})
+    # Reading the older artifact makes "second" the least recently used
+    past = time.time() - 60
+    os.utime(tmp_path / "first", (past, past))
+    os.utime(tmp_path / "second", (past + 1, past + 1))
+    assert cache.load("first") is not None
+    cache.save("third", records, vectors, {})
+    assert cache.load("first") is not None and cache.load("third") is not None
+    assert cache.load("second") is None
+
+def test_prune_keeps_in_progress_and_kept_entries(tmp_path):
+    for name in ("a.pdf", "b.pdf", ".upload-partial"):
+        (tmp_path / name).write_bytes(b"x" * 100)
+    assert prune_to_size(tmp_path, 50, keep=[tmp_path / "b.pdf"]) == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == [".upload-partial", "b.pdf"]
+
+def test_snapshot_cleanup_leaves_other_writers_temporary_directories(tmp_path):
+    in_progress = tmp_path / "snapshots" / ".tmp-00000002-abcdef12"
+    in_progress.mkdir(parents=True)
+    write_snapshot(tmp_path, np.zeros((1, 4), dtype=np.float32), [b"{}"], [])
+    write_snapshot(tmp_path, np.zeros((1, 4), dtype=np.float32), [b"{}"], [])
+    assert in_progress.exists()
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+import pytest
+from utils.client_registry import OpenAIClientRegistry
+
+pytest.importorskip("openai")
+
+def evict_from_thread(registry: OpenAIClientRegistry) -> None:
+    """Push the oldest key out of a one-key registry from a worker thread, as ingestion does."""
+    thread = threading.Thread(target=registry.get, args=("sk-second",))
+    thread.start()
+    thread.join()
+
+def test_eviction_off_the_loop_waits_out_the_grace_period():
+    async def run():
+        registry = OpenAIClientRegistry(max_keys=1, close_grace=0.2)
+        first = registry.get("sk-first")
+        evict_from_thread(registry)
+        # A stream started before the eviction can still use the pool
+        assert not first.http_client.is_closed and registry.stats()["closing"] == 1
+        await asyncio.sleep(0.4)
+        assert first.http_client.is_closed and first.async_http_client.is_closed
+        assert registry.stats()["closing"] == 0
+        await registry.aclose()
+
+    asyncio.run(run())
+
+def test_eviction_on_the_loop_keeps_its_close_task():
+    async def run():
+        registry = OpenAIClientRegistry(max_keys=1, close_grace=0.1)
+        first = registry.get("sk-first")
+        registry.get("sk-second")
+        [(_, task)] = registry._closing.values()
+        assert isinstance(task, asyncio.Task) and not first.http_client.is_closed
+        await task
+        assert first.async_http_client.is_closed and not registry._closing
+
+    asyncio.run(run())
+
+def test_shutdown_closes_pools_in_their_grace_period():
+    async def run():
+        registry = OpenAIClientRegistry(max_keys=1, close_grace=60.0)
+        first = registry.get("sk-first")
+        evict_from_thread(registry)
+        await registry.aclose()
+        assert first.http_client.is_closed and first.async_http_client.is_closed
+        assert registry.stats() == {"keys": 0, "max_keys": 1, "closing": 0}
+
+    asyncio.run(run())
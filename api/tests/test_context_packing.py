@@ -0,0 +1,63 @@
+import asyncio
+import numpy as np
+import pytest
+from utils.context_packer import ContextPacker
+from utils.vector_store import VectorStoreManager, VectorStoreNode
+
+class CountingEmbedding:
+    """Stands in for OpenAIEmbedding: a fixed vector per text, counting calls."""
+
+    def __init__(self, dimension: int = 16):
+        self.dimension = dimension
+        self.calls = 0
+
+    def vector(self, text: str):
+        rng = np.random.default_rng(sum(text.encode()))
+        return list(rng.normal(size=self.dimension))
+
+    async def aget_text_embedding(self, text: str):
+        self.calls += 1
+        return self.vector(text)
+
+@pytest.fixture
+def manager():
+    manager = VectorStoreManager(openai_api_key="test")
+    model = manager._embedding_model = CountingEmbedding()
+    texts = [f"revenue grew {i} percent in the data center segment" for i in range(12)]
+    manager.vector_store.add_nodes([
+        VectorStoreNode(
+            doc_id=f"report_{i}",
+            text=text,
+            embedding=model.vector(text),
+            metadata={"document_id": "report", "file_name": "report.pdf", "page_number": i + 1, "token_count": 10},
+        )
+        for i, text in enumerate(texts)
+    ])
+    return manager
+
+@pytest.mark.parametrize("mode,embeddings", [("dense", 1), ("hybrid", 1), ("lexical", 0)])
+def test_query_embedded_at_most_once(manager, mode, embeddings):
+    packer = ContextPacker(token_budget=1000)
+    passages, query_embedding = asyncio.run(
+        manager.apack_context("data center revenue", packer, score_threshold=-1.0, mode=mode)
+    )
+    assert passages
+    assert manager._embedding_model.calls == embeddings
+    assert (query_embedding is not None) == bool(embeddings)
+
+def test_lexical_keeps_retrieval_order(manager):
+    packer = ContextPacker(token_budget=1000)
+    results = asyncio.run(manager.asearch("revenue grew 7 percent", limit=5, mode="lexical"))
+    passages, _ = asyncio.run(manager.apack_context("revenue grew 7 percent", packer, candidates=5, mode="lexical"))
+    assert [p.chunk_ids[0] for p in passages] == [r["id"] for r in results]
+
+def test_packing_after_load_reads_no_row_index(manager, tmp_path):
+    # After a load, the doc_id -> row index is only built by parsing every record; packing must not need it
+    manager.vector_store.save(tmp_path)
+    manager.vector_store.load(tmp_path)
+    view = manager.vector_store.view()
+    passages, _ = asyncio.run(
+        manager.apack_context("data center revenue", ContextPacker(token_budget=1000), score_threshold=-1.0)
+    )
+    assert passages
+    assert view._row_ids is None
@@ -0,0 +1,17 @@
+from utils.embedding_cache import EmbeddingCache
+
+def test_database_opens_on_first_use(tmp_path):
+    path = tmp_path / "cache" / "embeddings.sqlite3"
+    cache = EmbeddingCache(path, max_entries=2)
+    assert not path.exists() and cache.stats()["entries"] is None
+    cache.close()
+
+    cache.put_many("model", ["revenue", "margin", "guidance"], [[1.0], [2.0], [3.0]])
+    assert path.exists() and cache.stats()["entries"] == 2
+    assert cache.get_many("model", ["revenue", "guidance"]) == [None, [3.0]]
+    cache.close()
+
+    reopened = EmbeddingCache(path)
+    assert reopened.get("model", "margin") == [2.0]
+    assert reopened.stats()["entries"] == 2
+    reopened.close()
@@ -0,0 +1,32 @@
+import numpy as np
+from utils.metadata_index import MetadataFilter
+from utils.vector_store import SimpleInMemoryVectorStore
+from .conftest import clustered, make_nodes
+
+def test_indexes_built_during_append_cover_new_rows(tmp_path, monkeypatch):
+    rows = clustered(np.random.default_rng(3), 15, dimension=16)
+    store = SimpleInMemoryVectorStore()
+    store.add_nodes(make_nodes(10, "old"), rows[:10])
+    store.save(tmp_path)
+    # A load leaves BM25, metadata and row indexes to be built on first use
+    store.load(tmp_path)
+    loaded = store.view()
+
+    count_location = SimpleInMemoryVectorStore._count_location
+
+    def count_while_reading(documents, location):
+        # A reader building every lazy index on the published view while the writer is mid-append
+        loaded.row_index()
+        loaded.filter_rows(MetadataFilter(document_ids=["old"]))
+        loaded.query_text("chunk", top_k=1)
+        count_location(documents, location)
+
+    monkeypatch.setattr(SimpleInMemoryVectorStore, "_count_location", staticmethod(count_while_reading))
+    store.add_nodes(make_nodes(5, "new", start=10), rows[10:])
+    monkeypatch.undo()
+
+    view = store.view()
+    assert view.size == 15
+    assert all(view.contains(f"new_{i}") for i in range(10, 15))
+    assert list(view.filter_rows(MetadataFilter(document_ids=["new"]))) == [10, 11, 12, 13, 14]
+    assert {node.doc_id for node, _ in view.query_text("chunk 12", top_k=1)} == {"new_12"}
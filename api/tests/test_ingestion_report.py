@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+import numpy as np
+from utils.embedding_cache import EmbeddingCache
+from utils.embeddings import IngestionReport
+from utils.vector_store import VectorStoreManager
+
+class FixedEmbedding:
+    """Stands in for OpenAIEmbedding: a fixed vector per text."""
+
+    def get_text_embedding_batch(self, texts):
+        return [list(np.random.default_rng(sum(text.encode())).normal(size=16)) for text in texts]
+
+def chunks(texts):
+    return [SimpleNamespace(text=text, metadata={"file_name": "q3.pdf", "page_number": i + 1}) for i, text in enumerate(texts)]
+
+def manager(tmp_path) -> VectorStoreManager:
+    manager = VectorStoreManager(openai_api_key="test", embed_batch_size=2, embedding_cache=EmbeddingCache(tmp_path / "cache.sqlite3"))
+    manager._embedding_model = FixedEmbedding()
+    return manager
+
+TEXTS = [f"revenue in segment {i} grew by {i * 3} percent year over year" for i in range(5)]
+
+def test_stream_and_restore_count_chunks_the_same_way(tmp_path):
+    # The last chunk repeats the first, so it is stored as a back-reference
+    texts = TEXTS + [TEXTS[0]]
+    streamed = manager(tmp_path)
+    report = streamed.add_document_stream(chunks(texts), "q3")
+    assert (report.chunks, report.cache_hits, report.indexed, report.duplicates, report.total_chunks) == (5, 0, 5, 1, 6)
+
+    # Re-embedding the same text serves every row from the cache: indexed, but not embedded
+    again = manager(tmp_path).add_document_stream(chunks(texts), "q3")
+    assert (again.chunks, again.cache_hits, again.indexed, again.total_chunks) == (0, 5, 5, 6)
+
+    records, vectors = streamed.export_document("q3")
+    restored = IngestionReport()
+    manager(tmp_path / "other").restore_document(records, vectors, "copy", "q3.pdf", report=restored)
+    assert (restored.chunks, restored.indexed, restored.duplicates, restored.total_chunks) == (0, 5, 1, 6)
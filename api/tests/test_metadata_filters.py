@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from utils.metadata_index import MetadataFilter
+from utils.vector_store import VectorStoreManager, VectorStoreNode
+
+def node(doc_id: str, text: str, file_name: str, page: int, **extra) -> VectorStoreNode:
+    document_id = file_name.split(".")[0]
+    metadata = {"document_id": document_id, "file_name": file_name, "page_number": page, **extra}
+    return VectorStoreNode(doc_id=doc_id, text=text, embedding=None, metadata=metadata)
+
+@pytest.fixture
+def manager():
+    manager = VectorStoreManager(openai_api_key="test")
+    store = manager.vector_store
+    store.add_nodes(
+        [
+            node("d_0", "cash flow", "D.pdf", 3),
+            node("a_0", "net revenue by segment", "A.pdf", 5),
+            node("b_0", "net revenue guidance", "B.pdf", 7),
+            node("c_0", "net revenue risks", "C.pdf", 2, has_tables=True),
+        ],
+        np.eye(4, 8, dtype=np.float32),
+    )
+    # B.pdf repeats A's chunk on page 1, and C's on page 9
+    store.add_duplicate_locations({
+        "a_0": [{"document_id": "B", "file_name": "B.pdf", "page_number": 1}],
+        "c_0": [{"document_id": "B", "file_name": "B.pdf", "page_number": 9}],
+    })
+    return manager
+
+def search(manager, **predicates):
+    return manager.search("net revenue", limit=10, mode="lexical", filters=MetadataFilter(**predicates))
+
+def test_one_location_must_meet_every_predicate(manager):
+    results = search(manager, file_names=["B.pdf"], page_min=5, page_max=10)
+    assert sorted(result["id"] for result in results) == ["b_0", "c_0"]
+    assert {result["id"] for result in search(manager, file_names=["A.pdf"], page_min=1, page_max=1)} == set()
+
+def test_result_reports_the_matching_location(manager):
+    [result] = search(manager, file_names=["B.pdf"], page_min=1, page_max=1)
+    assert result["id"] == "a_0"
+    assert (result["metadata"]["file_name"], result["metadata"]["page_number"]) == ("B.pdf", 1)
+    assert result["metadata"]["duplicates"] == [{"document_id": "A", "file_name": "A.pdf", "page_number": 5}]
+
+def test_row_flags_combine_with_any_location(manager):
+    [result] = search(manager, document_ids=["B"], has_tables=True)
+    assert result["id"] == "c_0"
+    assert result["metadata"]["page_number"] == 9
+
+def test_compaction_keeps_locations_aligned(manager):
+    # D's only row goes, and every other row moves up one
+    manager.remove_document("D")
+    view = manager.vector_store.view()
+    assert list(view.filter_rows(MetadataFilter(file_names=["B.pdf"], page_min=5))) == sorted(
+        view.row_index()[doc_id] for doc_id in ("b_0", "c_0")
+    )
+    assert list(view.filter_rows(MetadataFilter(file_names=["B.pdf"], page_max=1))) == [view.row_index()["a_0"]]
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from utils.vector_store import SimpleInMemoryVectorStore
+from .conftest import make_nodes, recall_at_k
+
+# Share of the float32 top-10 each reduced precision must keep
+RECALL_FLOORS = {"float16": 0.99, "int8": 0.95}
+
+@pytest.mark.parametrize("precision", sorted(RECALL_FLOORS))
+def test_recall_against_float32(corpus, precision):
+    rows, queries = corpus
+    reference = SimpleInMemoryVectorStore()
+    reference.add_nodes(make_nodes(len(rows)), rows)
+    store = SimpleInMemoryVectorStore(precision=precision)
+    store.add_nodes(make_nodes(len(rows)), rows)
+    assert recall_at_k(reference, store, queries) >= RECALL_FLOORS[precision]
+
+@pytest.mark.parametrize("precision", sorted(RECALL_FLOORS))
+def test_scores_close_to_float32(corpus, precision):
+    rows, queries = corpus
+    store = SimpleInMemoryVectorStore(precision=precision)
+    store.add_nodes(make_nodes(len(rows)), rows)
+    query = queries[0] / np.linalg.norm(queries[0])
+    unit = rows / np.linalg.norm(rows, axis=1, keepdims=True)
+    for node, score in store.query(query, top_k=10):
+        row = int(node.doc_id.rpartition("_")[2])
+        assert score == pytest.approx(float(unit[row] @ query), abs=1e-2)
+
+def test_snapshot_keeps_precision(corpus, tmp_path):
+    rows, queries = corpus
+    store = SimpleInMemoryVectorStore(precision="int8")
+    store.add_nodes(make_nodes(len(rows)), rows)
+    store.save(tmp_path)
+    loaded = SimpleInMemoryVectorStore(precision="int8")
+    loaded.load(tmp_path)
+    assert loaded.view()._matrix.dtype == np.int8
+    assert [node.doc_id for node, _ in loaded.query(queries[0])] == [node.doc_id for node, _ in store.query(queries[0])]
@@ -0,0 +1,113 @@
+import asyncio
+import time
+import numpy as np
+import pytest
+from utils.jobs import IngestionJobManager
+from utils.store_registry import VectorStoreRegistry
+from utils.vector_store import VectorStoreManager
+from .conftest import clustered, make_nodes
+
+fakeredis = pytest.importorskip("fakeredis")
+from utils.redis_backend import RedisApiKeyValidationCache, RedisEmbeddingCache, RedisIndexTier, RedisJobStatus  # noqa: E402
+
+API_KEY = "sk-test"
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+def instance(server, tmp_path, **store_kwargs) -> VectorStoreRegistry:
+    """One API instance: its own Redis client and resident stores, sharing the server with the others."""
+    client = fakeredis.FakeRedis(server=server)
+    return VectorStoreRegistry(
+        lambda api_key: VectorStoreManager(openai_api_key=api_key, **store_kwargs),
+        tmp_path,
+        tier=RedisIndexTier(client, sync_interval=0),
+    )
+
+def ranking(store: VectorStoreManager, query: np.ndarray):
+    return [(node.doc_id, round(score, 5)) for node, score in store.vector_store.query(query, top_k=5)]
+
+def test_index_round_trip(server, tmp_path):
+    first, second = instance(server, tmp_path / "a"), instance(server, tmp_path / "b")
+    rng = np.random.default_rng(0)
+    rows = clustered(rng, 300)
+    with first.writing(API_KEY) as store:
+        store.vector_store.add_nodes(make_nodes(200, "report"), rows[:200])
+        store.vector_store.add_nodes(make_nodes(100, "deck"), rows[200:])
+        store.update_document("report", content_hash="c86deba7")
+
+    reader = second.get(API_KEY)
+    assert reader.list_documents() == first.get(API_KEY).list_documents()
+    assert reader.list_documents()[0]["content_hash"] == "c86deba7"
+    assert ranking(reader, rows[5]) == ranking(first.get(API_KEY), rows[5])
+
+    with second.writing(API_KEY) as store:
+        store.remove_document("report")
+    assert [d["document_id"] for d in first.get(API_KEY).list_documents()] == ["deck"]
+    assert len(first.get(API_KEY).vector_store) == 100
+
+    with first.writing(API_KEY) as store:
+        store.remove_document("deck")
+    assert len(second.get(API_KEY).vector_store) == 0
+    assert fakeredis.FakeRedis(server=server).scard("bw:index:tenants") == 0
+
+def test_reload_reuses_writer_centroids(server, tmp_path):
+    options = {"index_mode": "ivf", "ann_min_size": 500}
+    first, second = instance(server, tmp_path / "a", **options), instance(server, tmp_path / "b", **options)
+    rows = clustered(np.random.default_rng(1), 2000)
+    with first.writing(API_KEY) as store:
+        store.vector_store.add_nodes(make_nodes(len(rows)), rows)
+    written = first.get(API_KEY).vector_store.view()._ann
+    loaded = second.get(API_KEY).vector_store.view()._ann
+    assert np.array_equal(loaded.centroids, written.centroids)
+    assert np.array_equal(loaded.labels, written.labels)
+
+def test_stats_report_redis_outage(server, tmp_path):
+    registry = instance(server, tmp_path)
+    with registry.writing(API_KEY) as store:
+        store.vector_store.add_nodes(make_nodes(3), clustered(np.random.default_rng(0), 3, dimension=8))
+    assert registry.stats()["persisted_tenants"] == 1
+    server.connected = False
+    stats = registry.stats()
+    assert stats["persisted_tenants"] is None and "ConnectionError" in stats["tier_error"]
+    assert stats["resident_tenants"] == 1
+
+def test_embedding_cache_is_shared(server):
+    first = RedisEmbeddingCache(fakeredis.FakeRedis(server=server))
+    second = RedisEmbeddingCache(fakeredis.FakeRedis(server=server))
+    first.put_many("model", ["revenue", "margin"], [[1.0, 0.0], [0.0, 1.0]])
+    assert second.get_many("model", ["margin", "guidance"]) == [[0.0, 1.0], None]
+    assert second.get("other-model", "revenue") is None
+
+def test_api_key_validation_is_shared(server):
+    calls = []
+
+    def validator(api_key: str) -> bool:
+        calls.append(api_key)
+        return True
+
+    first = RedisApiKeyValidationCache(fakeredis.FakeRedis(server=server))
+    second = RedisApiKeyValidationCache(fakeredis.FakeRedis(server=server))
+    assert asyncio.run(first.validate(API_KEY, validator))
+    assert asyncio.run(second.validate(API_KEY, validator))
+    assert calls == [API_KEY]
+
+    second.invalidate(API_KEY)
+    third = RedisApiKeyValidationCache(fakeredis.FakeRedis(server=server))
+    assert asyncio.run(third.validate(API_KEY, validator))
+    assert calls == [API_KEY, API_KEY]
+
+def test_job_status_is_shared(server):
+    running = IngestionJobManager(status_store=RedisJobStatus(fakeredis.FakeRedis(server=server)))
+    polling = IngestionJobManager(status_store=RedisJobStatus(fakeredis.FakeRedis(server=server)))
+    try:
+        job = running.submit("tenant", "report.pdf", lambda job: None)
+        deadline = time.monotonic() + 5
+        while (polling.status(job.job_id, "tenant") or {}).get("stage") != "completed":
+            assert time.monotonic() < deadline, "job status never reached the other instance"
+            time.sleep(0.05)
+        assert polling.status(job.job_id, "someone-else") is None
+    finally:
+        running.shutdown()
+        polling.shutdown()
@@ -0,0 +1,15 @@
+import pytest
+from .stress_check import run_stress_check
+
+@pytest.mark.parametrize("precision,index_mode,from_snapshot", [
+    ("float32", "exact", False),
+    ("float32", "ivf", False),
+    ("int8", "exact", False),
+    ("float32", "exact", True),
+])
+def test_readers_see_consistent_views(precision, index_mode, from_snapshot):
+    report = run_stress_check(
+        readers=4, seconds=1.5, precision=precision, index_mode=index_mode, from_snapshot=from_snapshot
+    )
+    assert report["errors"] == []
+    assert report["reads"] and report["documents_written"]
@@ -0,0 +1,130 @@
+from typing import Optional
+import copy
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class IVFIndex:
+    """Inverted-file ANN index over L2-normalized vectors, implemented on NumPy.
+
+    Rows are clustered around spherical k-means centroids. A query scores only
+    the rows in its `nprobe` closest clusters, trading recall for latency.
+    New rows are assigned to their nearest centroid without retraining.
+    Each list's rows are kept contiguous in one array (`order`, delimited by
+    `offsets`), so finding candidates costs the size of the probed lists, not
+    of the store. An index is never changed once trained: extended() and
+    compacted() return new indexes, so a reader holding an older store view
+    keeps lists that line up with its rows.
+    """
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8, n_iter: int = 15, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        # Cluster id for each row of the store's matrix, aligned with its rows
+        self.labels = np.empty(0, dtype=np.int32)
+        # Row indices grouped by list: list i holds order[offsets[i]:offsets[i + 1]], in row order
+        self.order = np.empty(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.trained_size = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray, max_training_points: int = 256) -> None:
+        """Fit centroids on (a sample of) the vectors and assign every row."""
+        n = vectors.shape[0]
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(self.seed)
+
+        # k-means only needs a few hundred points per centroid to converge
+        sample_size = min(n, nlist * max_training_points)
+        sample = vectors[np.sort(rng.choice(n, size=sample_size, replace=False))] if sample_size < n else np.asarray(vectors)
+        centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=nlist)
+            empty = counts == 0
+            # Re-seed empty clusters from random points so every list stays useful
+            sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        self.centroids = centroids
+        self._set_labels(self.assign(vectors))
+        self.trained_size = n
+        logger.info(f"Trained IVF index: {n} rows, {nlist} lists")
+
+    @classmethod
+    def restored(cls, centroids: np.ndarray, labels: np.ndarray, trained_size: int, nprobe: int = 8) -> "IVFIndex":
+        """An index rebuilt from the centroids and labels of a trained one, e.g. read from a snapshot."""
+        index = cls(nlist=centroids.shape[0], nprobe=nprobe)
+        index.centroids = np.asarray(centroids, dtype=np.float32)
+        index._set_labels(np.asarray(labels, dtype=np.int32))
+        index.trained_size = trained_size
+        return index
+
+    def _set_labels(self, labels: np.ndarray) -> None:
+        """Set the row labels and regroup the rows by list (a stable sort keeps each list in row order)."""
+        self.labels = labels
+        self.order = np.argsort(labels, kind="stable").astype(np.int64)
+        counts = np.bincount(labels, minlength=self.centroids.shape[0])
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def assign(self, vectors: np.ndarray, block_size: int = 8192) -> np.ndarray:
+        """Nearest-centroid id for each row, computed in blocks to bound memory."""
+        labels = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], block_size):
+            block = vectors[start:start + block_size]
+            labels[start:start + block_size] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def extended(self, vectors: np.ndarray) -> "IVFIndex":
+        """A copy that also covers rows appended to the store's matrix, sharing the centroids.
+
+        Appended rows have the highest indices, so each one goes at the end of
+        its list; existing entries only shift, and nothing is re-sorted.
+        """
+        index = copy.copy(self)
+        added = self.assign(vectors)
+        nlist = self.centroids.shape[0]
+        old_counts = np.diff(self.offsets)
+        added_counts = np.bincount(added, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(old_counts + added_counts)]).astype(np.int64)
+
+        order = np.empty(len(self.order) + len(added), dtype=np.int64)
+        old_lists = np.repeat(np.arange(nlist), old_counts)
+        order[offsets[old_lists] + np.arange(len(self.order)) - self.offsets[old_lists]] = self.order
+        by_list = np.argsort(added, kind="stable")
+        new_lists = added[by_list]
+        added_starts = np.concatenate([[0], np.cumsum(added_counts)])
+        within = np.arange(len(added)) - added_starts[new_lists]
+        order[offsets[new_lists] + old_counts[new_lists] + within] = len(self.labels) + by_list
+
+        index.labels = np.concatenate([self.labels, added])
+        index.order = order
+        index.offsets = offsets
+        return index
+
+    def compacted(self, kept_indices: np.ndarray) -> "IVFIndex":
+        """A copy aligned with the store's rows after a compaction."""
+        index = copy.copy(self)
+        index._set_labels(self.labels[kept_indices])
+        return index
+
+    def candidates(self, query_vector: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Row indices in the nprobe lists whose centroids are closest to the query, ascending."""
+        nprobe = min(nprobe or self.nprobe, self.centroids.shape[0])
+        centroid_scores = self.centroids @ query_vector
+        probe = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+        # Sorted so the scoring pass reads the matrix front to back
+        return np.sort(np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in probe]))
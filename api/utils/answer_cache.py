@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import logging
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CachedAnswer:
+    query_vector: np.ndarray
+    answer: str
+    expires_at: float
+
+class SemanticAnswerCache:
+    """In-process cache of chat answers, matched by query meaning rather than exact text.
+
+    Answers are grouped by a context key: tenant, model, system prompt, the
+    ids of the retrieved chunks and the collection version. Within a group a
+    lookup hits when the new query embedding's cosine similarity to a cached
+    query reaches `similarity_threshold`. Any change to the tenant's
+    collection bumps its version, so answers built on old content stop
+    matching and age out. Entries expire after `ttl` seconds and the cache is
+    LRU-bounded to `max_entries`.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl: float = 3600.0, max_entries: int = 1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # (context key, sequence number) -> CachedAnswer, in LRU order
+        self._entries: "OrderedDict[Tuple[str, int], CachedAnswer]" = OrderedDict()
+        # context key -> sequence numbers of its entries
+        self._groups: Dict[str, List[int]] = {}
+        self._sequence = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def context_key(
+        tenant: str, model: str, system_prompt: str, chunk_ids: Sequence[str], collection_version: str
+    ) -> str:
+        payload = "\x1f".join([tenant, model, system_prompt, collection_version, *chunk_ids])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, context_key: str, query_embedding: List[float]) -> Optional[str]:
+        """Return the cached answer for the most similar query in the context, or None."""
+        query_vector = self._normalize(query_embedding)
+        now = time.monotonic()
+        best_score, best_entry = -1.0, None
+        for sequence in list(self._groups.get(context_key, ())):
+            entry = self._entries.get((context_key, sequence))
+            if entry is None or entry.expires_at <= now:
+                self._drop(context_key, sequence)
+                continue
+            score = float(entry.query_vector @ query_vector)
+            if score > best_score:
+                best_score, best_entry = score, (context_key, sequence)
+        if best_entry is None or best_score < self.similarity_threshold:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(best_entry)
+        self.hits += 1
+        return self._entries[best_entry].answer
+
+    def store(self, context_key: str, query_embedding: List[float], answer: str) -> None:
+        self._sequence += 1
+        self._entries[(context_key, self._sequence)] = CachedAnswer(
+            query_vector=self._normalize(query_embedding),
+            answer=answer,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        self._groups.setdefault(context_key, []).append(self._sequence)
+        while len(self._entries) > self.max_entries:
+            (evicted_key, evicted_sequence), _ = self._entries.popitem(last=False)
+            self._drop(evicted_key, evicted_sequence)
+
+    def _drop(self, context_key: str, sequence: int) -> None:
+        self._entries.pop((context_key, sequence), None)
+        group = self._groups.get(context_key)
+        if group is not None and sequence in group:
+            group.remove(sequence)
+            if not group:
+                del self._groups[context_key]
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class ApiKeyValidationCache:
+    """In-process TTL cache for API-key validation results.
+
+    Keys are stored only as sha256 digests. Valid and invalid results get
+    separate TTLs, concurrent validations of the same key share one upstream
+    call, and the table is LRU-bounded.
+    """
+
+    def __init__(self, positive_ttl: float = 600.0, negative_ttl: float = 30.0, max_size: int = 1024):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        # digest -> (is_valid, expires_at)
+        self._entries: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    def lookup(self, api_key: str) -> Optional[bool]:
+        """Return the cached result for a key, or None if absent or expired."""
+        digest = self._digest(api_key)
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        is_valid, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return is_valid
+
+    def store(self, api_key: str, is_valid: bool) -> None:
+        ttl = self.positive_ttl if is_valid else self.negative_ttl
+        digest = self._digest(api_key)
+        self._entries[digest] = (is_valid, time.monotonic() + ttl)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, api_key: str) -> None:
+        self._entries.pop(self._digest(api_key), None)
+
+    async def validate(self, api_key: str, validator: Callable[[str], bool]) -> bool:
+        """Return whether the key is valid, calling the blocking validator at most once per key at a time.
+
+        Exceptions from the validator (network trouble, etc.) are propagated to
+        every waiter and not cached, so a transient failure is retried next time.
+        """
+        cached = self.lookup(api_key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        digest = self._digest(api_key)
+        pending = self._in_flight.get(digest)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[digest] = future
+        try:
+            is_valid = await asyncio.to_thread(validator, api_key)
+            self.store(api_key, is_valid)
+            future.set_result(is_valid)
+            return is_valid
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited future does not log a warning
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(digest, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,126 @@
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import numpy as np
+from .snapshot import write_snapshot, open_snapshot, snapshot_exists
+
+logger = logging.getLogger(__name__)
+
+def _entry_bytes(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+def prune_to_size(root: Path, max_bytes: int, keep: Iterable[Path] = ()) -> int:
+    """Delete the least recently modified entries of a directory until it fits max_bytes.
+
+    Entries are the files and directories directly under root; dotted names
+    (in-progress writes, locks) and anything in keep are never deleted.
+    Returns the number of entries removed.
+    """
+    root = Path(root)
+    if not root.exists():
+        return 0
+    keep = {Path(path).name for path in keep}
+    entries = []
+    for entry in root.iterdir():
+        if entry.name.startswith("."):
+            continue
+        try:
+            entries.append((entry.stat().st_mtime, _entry_bytes(entry), entry))
+        except FileNotFoundError:
+            continue  # removed by another process while scanning
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        if entry.name in keep:
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry, ignore_errors=True)
+        else:
+            entry.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    if removed:
+        logger.info(f"Pruned {removed} entries from {root} to stay under {max_bytes} bytes")
+    return removed
+
+class DocumentArtifactCache:
+    """Parsed chunks and their embeddings, stored under the source file's content hash.
+
+    The key also covers the chunker settings and embedding model, so changing
+    either one can never restore stale chunks. Artifacts use the same on-disk
+    snapshot format as the vector store.
+
+    Saves from every worker process go through one flock on the cache
+    directory, so two ingestions of the same file never write the same key
+    at once; the second finds the artifact there and skips it. Past
+    max_bytes, the least recently used artifacts are deleted.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(content_hash: str, settings: Dict[str, Any]) -> str:
+        settings_hash = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        return f"{content_hash}-{settings_hash}"
+
+    def load(self, key: str) -> Optional[Tuple[List[Dict[str, Any]], np.ndarray, Dict[str, Any]]]:
+        """Return (chunk records, float32 vectors, info) for a key, or None on a miss."""
+        path = self.root / key
+        try:
+            if not snapshot_exists(path):
+                self.misses += 1
+                return None
+            matrix, scales, nodes, documents, _ = open_snapshot(path, lambda index, record: record)
+            # Recently used artifacts are the last to be pruned
+            os.utime(path)
+        except (OSError, ValueError) as e:
+            # Pruned or written by another process mid-read, or unreadable: parse the file again instead
+            logger.warning(f"Could not read document artifact {key[:16]}: {e}")
+            self.misses += 1
+            return None
+        vectors = np.asarray(matrix, dtype=np.float32)
+        if scales is not None:
+            vectors = vectors * np.asarray(scales)[:, None]
+        self.hits += 1
+        return list(nodes), vectors, (documents[0] if documents else {})
+
+    def save(self, key: str, records: List[Dict[str, Any]], vectors: np.ndarray, info: Dict[str, Any]) -> bool:
+        """Store an artifact unless the key already has one; returns whether it was written.
+
+        Best-effort: the document is already in the tenant's store, so a
+        failure here is logged and never raised.
+        """
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(self.root / ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                path = self.root / key
+                if snapshot_exists(path):
+                    return False
+                encoded = (json.dumps(record).encode("utf-8") for record in records)
+                write_snapshot(path, np.asarray(vectors, dtype=np.float32), encoded, [info])
+                prune_to_size(self.root, self.max_bytes, keep=[path])
+            finally:
+                os.close(fd)
+        except Exception as e:
+            logger.warning(f"Could not store document artifact {key[:16]}: {e}")
+            return False
+        logger.info(f"Stored document artifact {key[:16]} ({len(records)} chunks)")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses}
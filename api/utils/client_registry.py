@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Tuple, Union
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import httpx
+# openai is slow to import, so it is loaded with the first client pair
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PooledClients:
+    """Long-lived sync and async OpenAI clients for one API key, sharing tuned HTTP pools."""
+    client: "OpenAI"
+    async_client: "AsyncOpenAI"
+    http_client: httpx.Client
+    async_http_client: httpx.AsyncClient
+    last_used: float = field(default_factory=time.monotonic)
+
+class OpenAIClientRegistry:
+    """Keeps one warm client pair per API key with LRU eviction of idle keys."""
+
+    def __init__(
+        self,
+        max_keys: int = 32,
+        idle_ttl: float = 1800.0,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 120.0,
+        timeout: float = 60.0,
+        close_grace: float = 120.0,
+    ):
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=10.0)
+        # Evicted clients may still be serving a stream, so they are closed after a grace period
+        self.close_grace = close_grace
+        self._entries: "OrderedDict[str, PooledClients]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Pools waiting out their grace period, with the task or timer that will close them
+        self._closing: Dict[int, Tuple[PooledClients, Union[asyncio.Task, threading.Timer]]] = {}
+        # The event loop the async clients run on, so a worker thread can close them there
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def _digest(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    def get(self, api_key: str) -> PooledClients:
+        """Return the pooled clients for a key, creating them on first use."""
+        digest = self._digest(api_key)
+        evicted: List[PooledClients] = []
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                entry = self._create(api_key)
+                self._entries[digest] = entry
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(digest)
+            evicted = self._evict_locked()
+        for stale in evicted:
+            self._schedule_close(stale)
+        return entry
+
+    def discard(self, api_key: str) -> None:
+        """Drop a key's clients, e.g. after it fails validation."""
+        with self._lock:
+            entry = self._entries.pop(self._digest(api_key), None)
+        if entry is not None:
+            self._schedule_close(entry, grace=0.0)
+
+    def _create(self, api_key: str) -> PooledClients:
+        from openai import OpenAI, AsyncOpenAI
+
+        http_client = httpx.Client(limits=self.limits, timeout=self.timeout)
+        async_http_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return PooledClients(
+            client=OpenAI(api_key=api_key, http_client=http_client),
+            async_client=AsyncOpenAI(api_key=api_key, http_client=async_http_client),
+            http_client=http_client,
+            async_http_client=async_http_client,
+        )
+
+    def _evict_locked(self) -> List[PooledClients]:
+        """Pop entries idle past idle_ttl, then least-recently-used ones over max_keys."""
+        evicted = []
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._entries:
+            digest, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_keys and entry.last_used >= cutoff:
+                break
+            del self._entries[digest]
+            evicted.append(entry)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} idle OpenAI client pool(s)")
+        return evicted
+
+    def _schedule_close(self, entry: PooledClients, grace: Optional[float] = None) -> None:
+        grace = self.close_grace if grace is None else grace
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None:
+            # Worker thread: a timer waits out the grace period, then closes the async pool on its own loop
+            handle = threading.Timer(grace, self._close_from_thread, args=(entry,))
+            handle.daemon = True
+        else:
+            async def close_later():
+                await asyncio.sleep(grace)
+                await self._close(entry)
+
+            handle = loop.create_task(close_later())
+        with self._lock:
+            self._closing[id(entry)] = (entry, handle)
+        if loop is None:
+            handle.start()
+        else:
+            # The registry holds the task until it finishes, so it cannot be garbage collected mid-sleep
+            handle.add_done_callback(lambda _: self._closed(entry))
+
+    def _closed(self, entry: PooledClients) -> None:
+        with self._lock:
+            self._closing.pop(id(entry), None)
+
+    def _close_from_thread(self, entry: PooledClients) -> None:
+        self._closed(entry)
+        entry.http_client.close()
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(entry.async_http_client.aclose(), loop)
+
+    @staticmethod
+    async def _close(entry: PooledClients) -> None:
+        entry.http_client.close()
+        await entry.async_http_client.aclose()
+
+    async def aclose(self) -> None:
+        """Close every pool, including evicted ones still in their grace period; called on application shutdown."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            closing = list(self._closing.values())
+            self._closing.clear()
+        for entry, handle in closing:
+            handle.cancel()
+            entries.append(entry)
+        for entry in entries:
+            await self._close(entry)
+        logger.info(f"Closed {len(entries)} OpenAI client pool(s)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"keys": len(self._entries), "max_keys": self.max_keys, "closing": len(self._closing)}
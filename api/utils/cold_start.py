@@ -0,0 +1,122 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import argparse
+import importlib
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# Modules that dominate a cold start; the code that needs them imports them on first use
+HEAVY_MODULES = ("openai", "llama_index.core", "llama_index.embeddings.openai", "pypdf")
+
+def prewarm(document_processor=None) -> float:
+    """Import HEAVY_MODULES and build the processor's splitter and tokenizer; returns seconds taken."""
+    start = time.perf_counter()
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+    if document_processor is not None:
+        document_processor.warm()
+    elapsed = time.perf_counter() - start
+    logger.info(f"Pre-warmed heavy dependencies in {elapsed * 1000:.0f} ms")
+    return elapsed
+
+# name -> (module to import, path to request once the app has started, or None to only import)
+ENTRY_POINTS = {
+    "app": ("app", None),
+    "lambda_handler": ("lambda_handler", None),
+    "simple_app": ("simple_app", None),
+    "app GET /": ("app", "/"),
+    "app GET /api/health": ("app", "/api/health"),
+}
+
+# Runs in a fresh interpreter; prints one JSON line of timings
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+module = __import__(sys.argv[1])
+imported = time.perf_counter()
+result = {"import_ms": (imported - start) * 1000}
+if len(sys.argv) > 2:
+    from fastapi.testclient import TestClient
+    with TestClient(module.app) as client:
+        started = time.perf_counter()
+        response = client.get(sys.argv[2])
+        done = time.perf_counter()
+    result.update(
+        startup_ms=(started - imported) * 1000,
+        request_ms=(done - started) * 1000,
+        first_response_ms=(done - start) * 1000,
+        status=response.status_code,
+    )
+print(json.dumps(result))
+"""
+
+def _probe(module: str, path: Optional[str], workdir: Path, env: Dict[str, str]) -> Dict[str, Any]:
+    """Time one cold start of an entry point in a new process."""
+    argv = [sys.executable, "-c", _PROBE, module] + ([path] if path else [])
+    start = time.perf_counter()
+    completed = subprocess.run(argv, cwd=workdir, env=env, capture_output=True, text=True)
+    process_ms = (time.perf_counter() - start) * 1000
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        stderr = completed.stderr.strip().splitlines()
+        return {"error": stderr[-1] if stderr else f"exit code {completed.returncode}"}
+    result = json.loads(lines[-1])
+    result["process_ms"] = process_ms
+    return result
+
+def run_cold_start_benchmark(
+    entry_points: Optional[List[str]] = None, repeat: int = 3, env: Optional[Dict[str, str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Cold-start each entry point `repeat` times in fresh interpreters and report median milliseconds.
+
+    Every run gets an empty working directory, so no caches, snapshots or
+    logs carry over between runs. process_ms is wall time for the whole
+    process, interpreter start-up and shutdown included; import_ms is the
+    entry point's import alone. Request entry points also report startup_ms
+    (startup events), request_ms and first_response_ms (import to first
+    response). An entry point that cannot start (e.g. lambda_handler
+    without mangum installed) reports its error instead.
+    """
+    api_dir = Path(__file__).resolve().parent.parent
+    child_env = dict(os.environ if env is None else env)
+    child_env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(api_dir), child_env.get("PYTHONPATH")]))
+    report: Dict[str, Dict[str, Any]] = {}
+    for name in entry_points or list(ENTRY_POINTS):
+        module, path = ENTRY_POINTS[name]
+        runs = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory(prefix="cold-start-") as workdir:
+                runs.append(_probe(module, path, Path(workdir), child_env))
+        failed = [run for run in runs if "error" in run]
+        if failed:
+            report[name] = {"error": failed[0]["error"]}
+            continue
+        report[name] = {
+            key: round(statistics.median(run[key] for run in runs), 1)
+            for key in runs[0] if key != "status"
+        }
+        if path:
+            report[name]["status"] = runs[-1]["status"]
+    return report
+
+if __name__ == "__main__":
+    # Run from api/: python -m utils.cold_start --repeat 5 --output cold_start.jsonl
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the API entry points.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--entry-point", action="append", choices=list(ENTRY_POINTS), dest="entry_points")
+    parser.add_argument("--output", type=Path, help="append the results to this JSON-lines file")
+    args = parser.parse_args()
+    results = run_cold_start_benchmark(args.entry_points, repeat=args.repeat)
+    if args.output is not None:
+        record = {"timestamp": time.time(), "python": sys.version.split()[0], "results": results}
+        with args.output.open("a", encoding="utf-8") as log:
+            log.write(json.dumps(record) + "\n")
+    print(json.dumps(results, indent=2))
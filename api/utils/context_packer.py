@@ -0,0 +1,156 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from .document_processor import count_tokens
+
+@dataclass
+class ContextPassage:
+    """One contiguous piece of prompt context, built from one or more merged chunks."""
+    text: str
+    metadata: Dict[str, Any]
+    token_count: int
+    score: float
+    chunk_ids: List[str] = field(default_factory=list)
+    span: Optional[Tuple[int, int]] = None  # character span within the page, when known
+
+class ContextPacker:
+    """Fills a token budget with retrieved chunks for a chat prompt.
+
+    Candidates are ordered by maximal marginal relevance, so a chunk that
+    mostly repeats one already chosen ranks below a less similar one; without
+    a query vector (lexical search) they keep their retrieval order. They are
+    then added greedily while they fit the budget, using the token counts
+    recorded at ingestion. A chunk that overlaps or touches a chosen chunk on
+    the same page is merged into it, and only the new text is paid for.
+    """
+
+    # Largest gap, in characters, between two chunks on a page that still counts as adjacent
+    adjacency_gap = 2
+
+    def __init__(self, token_budget: int = 3000, mmr_lambda: float = 0.7):
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+
+    def mmr_order(self, query_vector: np.ndarray, vectors: np.ndarray) -> List[int]:
+        """Candidate indices in maximal-marginal-relevance order (vectors are L2-normalized rows)."""
+        if not len(vectors):
+            return []
+        relevance = vectors @ query_vector
+        redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+        remaining = np.ones(len(vectors), dtype=bool)
+        order = []
+        for _ in range(len(vectors)):
+            penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+            marginal = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * penalty
+            marginal[~remaining] = -np.inf
+            best = int(np.argmax(marginal))
+            order.append(best)
+            remaining[best] = False
+            redundancy = np.maximum(redundancy, vectors @ vectors[best])
+        return order
+
+    def pack(
+        self,
+        candidates: List[Dict[str, Any]],
+        query_vector: Optional[np.ndarray] = None,
+        vectors: Optional[np.ndarray] = None,
+    ) -> List[ContextPassage]:
+        """Choose and merge candidates (search result dicts, aligned with vectors) within the budget."""
+        passages: List[ContextPassage] = []
+        used = 0
+        order = range(len(candidates)) if query_vector is None else self.mmr_order(query_vector, vectors)
+        for index in order:
+            candidate = candidates[index]
+            metadata = candidate.get('metadata', {})
+            tokens = metadata.get('token_count') or count_tokens(candidate['text'])
+            span = self._span(candidate)
+
+            target = self._mergeable(passages, metadata, span)
+            if target is not None:
+                merged_text, extra_text = self._merge_text(target, candidate['text'], span)
+                extra_tokens = count_tokens(extra_text) if extra_text else 0
+                if used + extra_tokens > self.token_budget:
+                    continue
+                target.text = merged_text
+                target.span = (min(target.span[0], span[0]), max(target.span[1], span[1]))
+                target.token_count += extra_tokens
+                target.chunk_ids.append(candidate['id'])
+                used += extra_tokens
+                used -= self._coalesce(passages, target)
+                continue
+
+            if used + tokens > self.token_budget:
+                continue
+            passages.append(ContextPassage(
+                text=candidate['text'],
+                metadata=metadata,
+                token_count=tokens,
+                score=float(candidate.get('score', 0.0)),
+                chunk_ids=[candidate['id']],
+                span=span,
+            ))
+            used += tokens
+        return passages
+
+    def _coalesce(self, passages: List[ContextPassage], target: ContextPassage) -> int:
+        """Fold passages that the grown target now touches into it; returns the tokens saved."""
+        saved = 0
+        while True:
+            others = [passage for passage in passages if passage is not target]
+            neighbour = self._mergeable(others, target.metadata, target.span)
+            if neighbour is None:
+                return saved
+            merged_text, _ = self._merge_text(target, neighbour.text, neighbour.span)
+            merged_tokens = count_tokens(merged_text)
+            saved += target.token_count + neighbour.token_count - merged_tokens
+            target.text = merged_text
+            target.span = (min(target.span[0], neighbour.span[0]), max(target.span[1], neighbour.span[1]))
+            target.token_count = merged_tokens
+            target.score = max(target.score, neighbour.score)
+            target.chunk_ids.extend(neighbour.chunk_ids)
+            passages.remove(neighbour)
+
+    @staticmethod
+    def _span(candidate: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        metadata = candidate.get('metadata', {})
+        start, end = metadata.get('char_start'), metadata.get('char_end')
+        # Offsets are only trusted when they describe this exact text
+        if start is None or end is None or end - start != len(candidate['text']):
+            return None
+        return start, end
+
+    def _mergeable(
+        self, passages: List[ContextPassage], metadata: Dict[str, Any], span: Optional[Tuple[int, int]]
+    ) -> Optional[ContextPassage]:
+        if span is None:
+            return None
+        page = (metadata.get('document_id'), metadata.get('page_number'))
+        for passage in passages:
+            if passage.span is None or (passage.metadata.get('document_id'), passage.metadata.get('page_number')) != page:
+                continue
+            if span[0] <= passage.span[1] + self.adjacency_gap and span[1] + self.adjacency_gap >= passage.span[0]:
+                return passage
+        return None
+
+    @staticmethod
+    def _merge_text(passage: ContextPassage, text: str, span: Tuple[int, int]) -> Tuple[str, str]:
+        """Union of the passage and a chunk on the same page; returns (merged text, newly added text)."""
+        start, end = passage.span
+        prefix = suffix = ""
+        if span[0] < start:
+            prefix = text[:start - span[0]] if span[1] >= start else text + " "
+        if span[1] > end:
+            suffix = text[end - span[0]:] if span[0] <= end else " " + text
+        return prefix + passage.text + suffix, prefix + suffix
+
+    @staticmethod
+    def render(passages: List[ContextPassage]) -> str:
+        """Format passages as the context section of the system prompt."""
+        parts = ["Relevant context from uploaded documents:\n\n"]
+        for passage in passages:
+            parts.append(
+                f"- Source: {passage.metadata.get('file_name', 'N/A')}, "
+                f"Page: {passage.metadata.get('page_label', 'N/A')}\n"
+                f"  Content: {passage.text}\n\n"
+            )
+        return "".join(parts)
@@ -0,0 +1,134 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import re
+import zlib
+import numpy as np
+
+# Metadata keys that describe where a chunk occurs, as opposed to what it contains
+LOCATION_FIELDS = ("document_id", "file_name", "page_number", "page_label", "char_start", "char_end")
+
+_WORD = re.compile(r"\w+")
+# Figures with their sign, currency and percent marks; word tokens alone would read "(1.2)" as "1 2"
+_FIGURE = re.compile(r"[-(]?\$?\d[\d,.]*%?\)?")
+# Mersenne prime for the universal hash family (a * x + b) mod p
+_PRIME = (1 << 61) - 1
+
+def location_of(metadata: Dict) -> Dict:
+    """The location fields of a chunk's metadata."""
+    return {field: metadata[field] for field in LOCATION_FIELDS if field in metadata}
+
+def figures_of(text: str) -> str:
+    """The text's figures in order, e.g. "$60.92 (1,234) 12%", trailing punctuation stripped."""
+    return " ".join(figure.rstrip(".,") for figure in _FIGURE.findall(text))
+
+def content_hash(text: str) -> str:
+    """Hash of the whitespace- and case-normalized text, so re-flowed copies still match exactly.
+
+    Figures are hashed with their signs and decimal marks, so "(1.2)" and "12" never collide.
+    """
+    normalized = " ".join(_WORD.findall(text.lower())) + "\x00" + figures_of(text)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+class DuplicateIndex:
+    """Exact and near-duplicate lookup for chunk text, keyed by node doc_id.
+
+    Exact copies are found by content hash. With a threshold below 1,
+    near-duplicates (e.g. boilerplate with a reworded sentence or a changed
+    page header) are also found with MinHash signatures over word shingles,
+    bucketed by locality-sensitive hashing: bands of the signature hash into
+    buckets, so only chunks sharing a bucket are compared. A candidate counts
+    as a duplicate when its estimated Jaccard similarity reaches `threshold`
+    and its figures are identical. A duplicate's own text is dropped, so two
+    chunks that differ in any number (revenue for 2024 vs 2023) are always
+    kept as separate rows.
+    """
+
+    def __init__(self, threshold: float = 1.0, num_perm: int = 64, bands: int = 8, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._exact: Dict[str, str] = {}
+        self._hash_of: Dict[str, str] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._figures: Dict[str, str] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._hash_of)
+
+    def empty_copy(self) -> "DuplicateIndex":
+        """An empty index with the same settings, so its signatures compare with this one's."""
+        return DuplicateIndex(
+            threshold=self.threshold, num_perm=self.num_perm, bands=self.bands, shingle_size=self.shingle_size,
+            seed=self.seed,
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the text's word shingles."""
+        words = _WORD.findall(text.lower())
+        k = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # 32-bit inputs times 61-bit multipliers can overflow uint64; the wrap is deterministic, which is all MinHash needs
+        permuted = (hashes[:, None] * self._a[None, :] + self._b[None, :]) % np.uint64(_PRIME)
+        return permuted.min(axis=0)
+
+    def find(self, text: str) -> Optional[str]:
+        """doc_id of an indexed chunk that duplicates text, or None."""
+        canonical = self._exact.get(content_hash(text))
+        if canonical is not None or self.threshold >= 1.0:
+            return canonical
+        signature = self.signature(text)
+        figures = figures_of(text)
+        for key in self._band_keys(signature):
+            for doc_id in self._buckets.get(key, ()):
+                other = self._signatures.get(doc_id)
+                if (
+                    other is not None
+                    and self._figures.get(doc_id) == figures
+                    and np.mean(other == signature) >= self.threshold
+                ):
+                    return doc_id
+        return None
+
+    def add(self, doc_id: str, text: str) -> None:
+        """Register a stored chunk as the canonical copy of its content."""
+        digest = content_hash(text)
+        self._exact.setdefault(digest, doc_id)
+        self._hash_of[doc_id] = digest
+        if self.threshold >= 1.0:
+            return
+        signature = self.signature(text)
+        self._signatures[doc_id] = signature
+        self._figures[doc_id] = figures_of(text)
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(doc_id)
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        """Forget chunks that are no longer stored."""
+        for doc_id in doc_ids:
+            digest = self._hash_of.pop(doc_id, None)
+            if digest is not None and self._exact.get(digest) == doc_id:
+                del self._exact[digest]
+            self._figures.pop(doc_id, None)
+            signature = self._signatures.pop(doc_id, None)
+            if signature is None:
+                continue
+            for key in self._band_keys(signature):
+                bucket = self._buckets.get(key)
+                if bucket and doc_id in bucket:
+                    bucket.remove(doc_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def _band_keys(self, signature: np.ndarray):
+        rows = self.num_perm // self.bands
+        for band in range(self.bands):
+            yield band, signature[band * rows:(band + 1) * rows].tobytes()
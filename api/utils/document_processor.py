@@ -1,26 +1,80 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import logging
-from llama_index.readers.file import PDFReader
-from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core.schema import Document, NodeWithScore
+import multiprocessing
+import os
+# llama_index and pypdf take most of a cold start to import, so they are
+# imported on first use and requests that never parse or split skip them
+if TYPE_CHECKING:
+    from llama_index.core.node_parser import SentenceSplitter
+    from llama_index.core.schema import Document
 # import magic # Removed
 # from PIL import Image # Removed
 # import io # Seems unused, removing
 
 logger = logging.getLogger(__name__)
 
+# Bumped whenever chunk metadata changes shape, or cached artifacts from older code must not be reused
+# (4: artifacts exported while near-duplicate merging could replace a chunk's text)
+METADATA_VERSION = 4
+
+def count_tokens(text: str) -> int:
+    """Token count with the same tokenizer SentenceSplitter sizes chunks with."""
+    from llama_index.core.utils import get_tokenizer
+    return len(get_tokenizer()(text))
+
+# Per-process processors used by pool workers, keyed by chunker settings
+_worker_processors: Dict[Tuple[int, float], "DocumentProcessor"] = {}
+
+def _parse_page_range(
+    file_path: str, start: int, end: int, chunk_size: int, chunk_overlap: float, file_name: Optional[str] = None
+) -> List[List[Tuple[str, Dict[str, Any]]]]:
+    """Pool worker: parse and split pages [start, end), returning (text, metadata) chunks per page."""
+    key = (chunk_size, chunk_overlap)
+    processor = _worker_processors.get(key)
+    if processor is None:
+        processor = _worker_processors[key] = DocumentProcessor(chunk_size, chunk_overlap, parse_workers=0)
+    return [
+        [(chunk.text, chunk.metadata) for chunk in processor.split_documents([page])]
+        for page in processor.iter_pdf_pages(Path(file_path), start, end, file_name=file_name)
+    ]
+
 class DocumentProcessor:
-    def __init__(self, chunk_size: int = 1024, chunk_overlap: float = 0.25):
+    def __init__(
+        self,
+        chunk_size: int = 1024,
+        chunk_overlap: float = 0.25,
+        parse_workers: Optional[int] = None,
+        pages_per_shard: int = 8,
+    ):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.node_parser = SentenceSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=int(chunk_size * chunk_overlap)
-        )
-        self.pdf_reader = PDFReader()
+        self._node_parser: Optional["SentenceSplitter"] = None
+        # Parsing and splitting are CPU-bound, so large PDFs are sharded across processes
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        self.pages_per_shard = pages_per_shard
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def node_parser(self) -> "SentenceSplitter":
+        """The sentence splitter, built on first use."""
+        if self._node_parser is None:
+            from llama_index.core.node_parser import SentenceSplitter
+            self._node_parser = SentenceSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=int(self.chunk_size * self.chunk_overlap)
+            )
+        return self._node_parser
 
-    def process_file(self, file_path: Path) -> List[Document]:
+    def warm(self) -> None:
+        """Import the parsing stack and build the splitter and tokenizer ahead of the first upload."""
+        import pypdf  # noqa: F401
+        self.node_parser
+        count_tokens("warm")
+
+    def process_file(self, file_path: Path) -> List["Document"]:
         """Process a file and return a list of documents."""
         try:
             # mime = magic.Magic(mime=True) # Removed
@@ -41,46 +95,140 @@ class DocumentProcessor:
             logger.error(f"Error processing file {file_path}: {str(e)}", exc_info=True)
             raise
 
-    def _process_pdf(self, file_path: Path) -> List[Document]:
+    def _process_pdf(self, file_path: Path) -> List["Document"]:
         """Process PDF file with special handling for tables and images."""
-        try:
-            # Load PDF with enhanced metadata
-            documents = self.pdf_reader.load_data(file_path)
-
-            # Process each document
-            processed_docs = []
-            for doc in documents:
-                # Extract metadata
-                metadata = doc.metadata
-                
-                # Create enhanced document with metadata
-                enhanced_doc = Document(
-                    text=doc.text,
-                    metadata={
-                        **metadata,
-                        'file_name': file_path.name,
-                        'file_type': 'pdf',
-                        'page_number': metadata.get('page_number', 0),
-                        'has_tables': 'table' in doc.text.lower(),
-                        'has_images': bool(metadata.get('images', []))
-                    }
-                )
-                processed_docs.append(enhanced_doc)
+        return list(self.iter_pdf_pages(file_path))
+
+    def iter_pdf_pages(
+        self, file_path: Path, start: int = 0, end: Optional[int] = None, file_name: Optional[str] = None
+    ) -> Iterator["Document"]:
+        """Yield one enhanced Document per PDF page in [start, end), parsing pages lazily.
 
-            return processed_docs
+        Produces the same text and metadata as PDFReader.load_data followed by
+        the enhancement in _process_pdf, without holding every page in memory.
+        file_name overrides the name recorded in metadata (defaults to the path's name).
+        """
+        import pypdf
+        from llama_index.core.schema import Document
+
+        file_name = file_name or file_path.name
+        try:
+            with file_path.open("rb") as stream:
+                pdf = pypdf.PdfReader(stream)
+                # page_labels rebuilds the whole list on each access, so read it once
+                page_labels = pdf.page_labels
+                end = len(pdf.pages) if end is None else min(end, len(pdf.pages))
+                for page_index in range(start, end):
+                    doc = Document(
+                        text=pdf.pages[page_index].extract_text(),
+                        metadata={
+                            "page_label": page_labels[page_index],
+                            "page_number": page_index + 1,
+                            "file_name": file_name,
+                        }
+                    )
+                    yield self._enhance_page(doc, file_name)
 
         except Exception as e:
             logger.error(f"Error processing PDF {file_path}: {str(e)}", exc_info=True)
             raise
 
-    def split_documents(self, documents: List[Document]) -> List[Document]:
-        """Split documents into chunks with overlap."""
+    def iter_page_chunks(self, file_path: Path, file_name: Optional[str] = None) -> Iterator[List["Document"]]:
+        """Yield the chunks of each PDF page, in page order.
+
+        Large files are split into page-range shards that are parsed and
+        chunked in a process pool; results are merged back in page order, so
+        output is identical to the serial path.
+        """
+        import pypdf
+        from llama_index.core.schema import Document
+
+        with file_path.open("rb") as stream:
+            page_count = len(pypdf.PdfReader(stream).pages)
+
+        if self.parse_workers <= 1 or page_count <= self.pages_per_shard:
+            for page in self.iter_pdf_pages(file_path, file_name=file_name):
+                yield self.split_documents([page])
+            return
+
+        shards = deque(range(0, page_count, self.pages_per_shard))
+        pending: "deque" = deque()
+        pool = self._get_pool()
+        # Keep a couple of shards queued per worker; more would only buffer memory
+        max_in_flight = self.parse_workers * 2
+        while shards or pending:
+            while shards and len(pending) < max_in_flight:
+                start = shards.popleft()
+                pending.append(pool.submit(
+                    _parse_page_range, str(file_path), start, start + self.pages_per_shard,
+                    self.chunk_size, self.chunk_overlap, file_name,
+                ))
+            for page in pending.popleft().result():
+                yield [Document(text=text, metadata=metadata) for text, metadata in page]
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn avoids forking a server process that has live threads and locks
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _enhance_page(self, doc: "Document", file_name: str) -> "Document":
+        """Attach the table/image/page metadata this processor adds to every page."""
+        from llama_index.core.schema import Document
+
+        # Extract metadata
+        metadata = doc.metadata
+
+        # Create enhanced document with metadata
+        return Document(
+            text=doc.text,
+            metadata={
+                **metadata,
+                'file_name': file_name,
+                'file_type': 'pdf',
+                'page_number': metadata.get('page_number', 0),
+                'has_tables': 'table' in doc.text.lower(),
+                'has_images': bool(metadata.get('images', []))
+            }
+        )
+
+    def settings(self) -> Dict[str, Any]:
+        """Settings that determine chunk boundaries and metadata, for cache keys."""
+        return {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap, "metadata_version": METADATA_VERSION}
+
+    def iter_chunks(self, pages: Iterable["Document"]) -> Iterator["Document"]:
+        """Split pages into chunks as they arrive; chunks never span pages, matching split_documents."""
+        for page in pages:
+            yield from self.split_documents([page])
+
+    def split_documents(self, documents: List["Document"]) -> List["Document"]:
+        """Split documents into chunks with overlap.
+
+        Each chunk records its token count and its character span within the
+        page, so prompts can be budgeted and overlapping chunks merged without
+        re-tokenizing.
+        """
+        from llama_index.core.schema import Document
+
         try:
             nodes = self.node_parser.get_nodes_from_documents(documents)
             return [
                 Document(
                     text=node.get_content(),
-                    metadata=getattr(node, 'metadata', {})
+                    metadata={
+                        **getattr(node, 'metadata', {}),
+                        'token_count': count_tokens(node.get_content()),
+                        'char_start': node.start_char_idx,
+                        'char_end': node.end_char_idx,
+                    }
                 )
                 for node in nodes
             ]
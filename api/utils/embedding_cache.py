@@ -0,0 +1,130 @@
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """Disk-backed, content-addressed embedding cache with LRU eviction.
+
+    Entries are keyed by sha256(model name + normalized text) and stored as raw
+    float32 blobs in SQLite, so they survive restarts and collection deletes.
+    The database is opened on first use, not at construction, so importing
+    the app never touches it.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 200_000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Entry count, known once the database is open
+        self._size: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """The open database, opening it on first use; call with self._lock held."""
+        if self._conn is not None:
+            return self._conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Opened embedding cache at {self.path} with {self._size} entries")
+        return self._conn
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """Content address for a (model, text) pair; whitespace and unicode form are normalized."""
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Look up embeddings for texts; missing entries come back as None."""
+        keys = [self.make_key(model_name, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            conn = self._connection()
+            # SQLite caps bound parameters, so look keys up in slices
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                conn.commit()
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for result in results if result is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model_name, [text])[0]
+
+    def put_many(self, model_name: str, texts: Sequence[str], embeddings: Sequence[List[float]]) -> None:
+        """Store embeddings, evicting least-recently-used entries past max_entries."""
+        now = time.time()
+        rows = [
+            (self.make_key(model_name, text), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._size = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if self._size > self.max_entries:
+                overflow = self._size - self.max_entries
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self._size -= overflow
+                logger.info(f"Evicted {overflow} least-recently-used embeddings from cache")
+            conn.commit()
+
+    def put(self, model_name: str, text: str, embedding: List[float]) -> None:
+        self.put_many(model_name, [text], [embedding])
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for estimating embedding spend saved; entries is None until first use."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,145 @@
+from typing import List, Optional, Callable, Dict, Any
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+def retryable_errors() -> tuple:
+    """Errors worth retrying; anything else (bad key, bad request) fails fast.
+
+    openai is imported here rather than at module level because it is slow
+    to import; by the time a batch fails, the embedding model has loaded it.
+    """
+    from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+    return (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+@dataclass
+class IngestionReport:
+    """Throughput numbers for one embedding run.
+
+    chunks counts only the texts sent to the embedding API; a document's
+    chunks are either indexed (as new rows, whether embedded, served from
+    the cache or restored) or duplicates, and total_chunks is their sum.
+    """
+    chunks: int = 0
+    batches: int = 0
+    retries: int = 0
+    cache_hits: int = 0
+    # Chunks stored as new rows
+    indexed: int = 0
+    # Chunks stored as back-references to an existing (near-)identical chunk instead of being embedded
+    duplicates: int = 0
+    seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def total_chunks(self) -> int:
+        return self.indexed + self.duplicates
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.total_chunks / self.seconds if self.seconds > 0 else 0.0
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def add(
+        self,
+        chunks: int = 0,
+        batches: int = 0,
+        cache_hits: int = 0,
+        indexed: int = 0,
+        duplicates: int = 0,
+        seconds: float = 0.0,
+    ) -> None:
+        """Thread-safe accumulation, for reports shared by concurrent embedding workers."""
+        with self._lock:
+            self.chunks += chunks
+            self.batches += batches
+            self.cache_hits += cache_hits
+            self.indexed += indexed
+            self.duplicates += duplicates
+            self.seconds += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "retries": self.retries,
+            "cache_hits": self.cache_hits,
+            "indexed": self.indexed,
+            "duplicates": self.duplicates,
+            "total_chunks": self.total_chunks,
+            "seconds": round(self.seconds, 3),
+            "chunks_per_second": round(self.chunks_per_second, 2),
+        }
+
+class BatchEmbedder:
+    """Embeds texts in fixed-size batches with a bounded number of batches in flight."""
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.embed_batch = embed_batch
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def embed(self, texts: List[str], report: Optional[IngestionReport] = None) -> List[List[float]]:
+        """Embed all texts, preserving input order."""
+        report = report if report is not None else IngestionReport()
+        start = time.perf_counter()
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.max_concurrency == 1:
+            results = [self._embed_with_backoff(batch, report) for batch in batches]
+        else:
+            # The pool size is the in-flight bound; map() keeps batch order
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                results = list(pool.map(lambda batch: self._embed_with_backoff(batch, report), batches))
+
+        report.add(chunks=len(texts), batches=len(batches), seconds=time.perf_counter() - start)
+        return [embedding for batch in results for embedding in batch]
+
+    def _embed_with_backoff(self, batch: List[str], report: IngestionReport) -> List[List[float]]:
+        """Embed one batch, backing off exponentially on rate limits and transient errors."""
+        attempt = 0
+        while True:
+            try:
+                return self.embed_batch(batch)
+            except retryable_errors() as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                attempt += 1
+                report.record_retry()
+                logger.warning(
+                    f"Embedding batch of {len(batch)} failed ({type(e).__name__}), "
+                    f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """Honor the server's Retry-After header when present, else use jittered exponential backoff."""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        delay = min(self.base_delay * (2 ** attempt), self.max_delay)
+        return delay * (0.5 + random.random() / 2)
@@ -0,0 +1,188 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Any, Optional
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from .embeddings import IngestionReport
+
+logger = logging.getLogger(__name__)
+
+class JobQueueFullError(Exception):
+    """Raised when the ingestion queue cannot accept another job."""
+
+@dataclass
+class IngestionJob:
+    """Progress of one background ingestion."""
+    job_id: str
+    tenant: str
+    filename: str
+    stage: str = "queued"  # queued -> parsing -> (restoring | embedding) -> persisting -> completed | failed
+    pages_parsed: int = 0
+    document_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    report: IngestionReport = field(default_factory=IngestionReport)
+
+    @property
+    def done(self) -> bool:
+        return self.stage in ("completed", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "stage": self.stage,
+            "pages_parsed": self.pages_parsed,
+            # Sent to the embedding API; cache hits, restored chunks and duplicates are not embedded
+            "chunks_embedded": self.report.chunks,
+            "chunks_indexed": self.report.indexed,
+            "chunks_total": self.report.total_chunks,
+            "chunks_per_second": round(self.report.total_chunks / elapsed, 2) if elapsed > 0 else 0.0,
+            "elapsed_seconds": round(elapsed, 3),
+            "document_id": self.document_id,
+            "ingestion": self.report.to_dict() if self.stage == "completed" else None,
+            "error": self.error,
+        }
+
+class JobStatusDirectory:
+    """Published job status as one JSON file per job, for processes that share a directory."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def write(self, job_id: str, payload: Dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{job_id}.json"
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex[:8]}.tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def read(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads((self.directory / f"{job_id}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def delete(self, job_id: str) -> None:
+        (self.directory / f"{job_id}.json").unlink(missing_ok=True)
+
+class IngestionJobManager:
+    """Runs ingestion jobs on a small worker pool behind a bounded queue.
+
+    With a status_store shared by several processes (a JobStatusDirectory,
+    or Redis across instances), each process publishes its jobs' status
+    there, every publish_interval seconds while any is running, so a job can
+    be polled through whichever process the request lands on.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queued: int = 8,
+        retention_seconds: float = 3600.0,
+        status_store=None,
+        publish_interval: float = 1.0,
+    ):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self.status_store = status_store
+        self.publish_interval = publish_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+        self._publisher: Optional[threading.Thread] = None
+
+    def submit(self, tenant: str, filename: str, work: Callable[[IngestionJob], None]) -> IngestionJob:
+        """Queue work(job) to run in the background; raises JobQueueFullError when saturated."""
+        with self._lock:
+            self._prune_locked()
+            pending = sum(1 for job in self._jobs.values() if not job.done)
+            if pending >= self.max_workers + self.max_queued:
+                raise JobQueueFullError(f"Ingestion queue is full ({pending} jobs pending)")
+            job = IngestionJob(job_id=uuid.uuid4().hex, tenant=tenant, filename=filename)
+            self._jobs[job.job_id] = job
+            if self.status_store is not None and self._publisher is None:
+                self._publisher = threading.Thread(target=self._publish_running, name="job-status", daemon=True)
+                self._publisher.start()
+        self._publish(job)
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id: str, tenant: str) -> Optional[IngestionJob]:
+        """Look up a job; other tenants' jobs are reported as missing."""
+        job = self._jobs.get(job_id)
+        if job is None or job.tenant != tenant:
+            return None
+        return job
+
+    def status(self, job_id: str, tenant: str) -> Optional[Dict[str, Any]]:
+        """A job's to_dict(), whether it runs in this process or another one sharing the status store."""
+        job = self.get(job_id, tenant)
+        if job is not None:
+            return job.to_dict()
+        if self.status_store is None or not re.fullmatch(r"[0-9a-f]{32}", job_id):
+            return None
+        published = self.status_store.read(job_id)
+        if published is None or published.get("tenant") != tenant:
+            return None
+        return published["status"]
+
+    def _publish(self, job: IngestionJob) -> None:
+        if self.status_store is None:
+            return
+        try:
+            self.status_store.write(job.job_id, {"tenant": job.tenant, "status": job.to_dict()})
+        except Exception as e:
+            logger.warning(f"Could not publish status of job {job.job_id}: {e}")
+
+    def _publish_running(self) -> None:
+        """Publish running jobs' progress until none is left running."""
+        while True:
+            with self._lock:
+                running = [job for job in self._jobs.values() if not job.done]
+                if not running:
+                    self._publisher = None
+                    return
+            for job in running:
+                self._publish(job)
+            time.sleep(self.publish_interval)
+
+    def _run(self, job: IngestionJob, work: Callable[[IngestionJob], None]) -> None:
+        job.started_at = time.time()
+        job.stage = "parsing"
+        try:
+            work(job)
+            # Wall time of the whole job, parsing and persisting included
+            job.report.seconds = time.time() - job.started_at
+            job.stage = "completed"
+            logger.info(f"Ingestion job {job.job_id} for {job.filename} completed: {job.report.to_dict()}")
+        except Exception as e:
+            job.error = str(e)
+            job.stage = "failed"
+            logger.error(f"Ingestion job {job.job_id} for {job.filename} failed: {e}", exc_info=True)
+        finally:
+            job.finished_at = time.time()
+            self._publish(job)
+
+    def _prune_locked(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [j.job_id for j in self._jobs.values() if j.done and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+            if self.status_store is not None:
+                self.status_store.delete(job_id)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
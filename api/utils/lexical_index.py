@@ -0,0 +1,115 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import math
+import re
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Keeps tokens like "fy2024", "10-k", "3.5" and "non-gaap" whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/&'][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens with common English stopwords removed."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """Incremental in-memory inverted index scored with Okapi BM25.
+
+    Rows are aligned with the vector store's matrix rows. add() appends rows
+    in place, and search() takes the row count of the caller's store view, so
+    rows added for a later view are ignored. compacted() returns a new index
+    for the store's compaction, like IVFIndex. Each term keeps a posting list
+    of (row, term frequency); IDF and the average row length are computed at
+    query time, so adding rows never rescans the existing postings.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> parallel lists of row ids and term frequencies
+        self._rows: Dict[str, List[int]] = {}
+        self._freqs: Dict[str, List[int]] = {}
+        self._lengths: List[int] = []
+        self._postings = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, texts: Iterable[str]) -> None:
+        """Index rows appended to the store, in row order."""
+        for text in texts:
+            row = len(self._lengths)
+            counts: Dict[str, int] = {}
+            tokens = tokenize(text)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, count in counts.items():
+                self._rows.setdefault(term, []).append(row)
+                self._freqs.setdefault(term, []).append(count)
+            self._postings += len(counts)
+            # Length last: a reader never sees a row id past len(self)
+            self._lengths.append(len(tokens))
+
+    def compacted(self, kept_indices: np.ndarray) -> "BM25Index":
+        """A new index over the kept rows, renumbered like the store's compaction."""
+        remap = np.full(len(self._lengths), -1, dtype=np.int64)
+        remap[kept_indices] = np.arange(len(kept_indices))
+        rows: Dict[str, List[int]] = {}
+        freqs: Dict[str, List[int]] = {}
+        for term, term_rows in self._rows.items():
+            new_rows = remap[term_rows]
+            kept = new_rows >= 0
+            if kept.any():
+                rows[term] = new_rows[kept].tolist()
+                freqs[term] = np.asarray(self._freqs[term])[kept].tolist()
+        index = BM25Index(k1=self.k1, b=self.b)
+        index._rows, index._freqs = rows, freqs
+        index._lengths = [self._lengths[i] for i in kept_indices]
+        index._postings = sum(len(term_rows) for term_rows in rows.values())
+        return index
+
+    def search(
+        self, query: str, top_k: int, rows: Optional[np.ndarray] = None, n: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """Best (row, BM25 score) pairs for the query, highest first; rows with no matching term are skipped.
+
+        Pass rows to rank only within that subset of rows, and n to see only
+        the first n rows, as a store view of that size would.
+        """
+        n = len(self._lengths) if n is None else min(n, len(self._lengths))
+        terms = set(tokenize(query))
+        if not n or not terms or top_k <= 0:
+            return []
+
+        lengths = np.asarray(self._lengths[:n], dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(1.0, float(lengths.sum()) / n))
+        scores = np.zeros(n, dtype=np.float32)
+        for term in terms:
+            term_rows = self._rows.get(term)
+            if not term_rows:
+                continue
+            posting = np.asarray(term_rows, dtype=np.int64)
+            freqs = np.asarray(self._freqs[term][:len(posting)], dtype=np.float32)
+            posting = posting[:len(freqs)]
+            in_range = posting < n
+            posting, freqs = posting[in_range], freqs[in_range]
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            scores[posting] += idf * freqs * (self.k1 + 1) / (freqs + norm[posting])
+
+        matched = np.flatnonzero(scores)
+        if rows is not None:
+            matched = np.intersect1d(matched, rows, assume_unique=True)
+        if not len(matched):
+            return []
+        k = min(top_k, len(matched))
+        top = matched[np.argpartition(scores[matched], -k)[-k:]] if k < len(matched) else matched
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(row), float(scores[row])) for row in top]
+
+    def memory_bytes(self) -> int:
+        """Rough resident size: list slots and small ints for every posting and row length."""
+        return self._postings * 16 + len(self._lengths) * 8 + len(self._rows) * 64
@@ -0,0 +1,176 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+
+@dataclass
+class MetadataFilter:
+    """Chunk metadata predicates; unset fields match everything, set fields must all match."""
+    file_names: Optional[List[str]] = None
+    document_ids: Optional[List[str]] = None
+    page_min: Optional[int] = None  # inclusive, 1-based page_number
+    page_max: Optional[int] = None  # inclusive
+    has_tables: Optional[bool] = None
+    has_images: Optional[bool] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return all(value is None for value in vars(self).values())
+
+    def matches_location(self, location: Dict[str, Any]) -> bool:
+        """Whether one location (a chunk's own, or a back-reference) meets every file, document and page predicate."""
+        if self.file_names is not None and location.get("file_name") not in self.file_names:
+            return False
+        if self.document_ids is not None and location.get("document_id") not in self.document_ids:
+            return False
+        if self.page_min is not None or self.page_max is not None:
+            page = location.get("page_number")
+            if page is None:
+                return False
+            if (self.page_min is not None and page < self.page_min) or (self.page_max is not None and page > self.page_max):
+                return False
+        return True
+
+class MetadataIndex:
+    """Per-field posting lists over chunk metadata, aligned with the store's rows.
+
+    Every indexed field maps each value to the list of entries that carry it,
+    so a filter is answered by unioning the postings of the allowed values and
+    intersecting across fields. The cost is proportional to the matching rows,
+    not the store size. Page ranges walk the distinct page numbers, which are
+    few compared with rows.
+
+    File, document and page are properties of a location, and a row can have
+    several (its own and its back-references), so those fields are indexed
+    per location: each location gets an id, and a row matches only when one
+    of its locations meets every location predicate. Table and image flags
+    describe the text, which all locations share, and are indexed per row.
+    Appended rows are indexed in place and hidden from store views of an
+    earlier size by rows(n=...); anything that changes existing rows works on
+    a copy().
+    """
+
+    location_fields = ("file_name", "document_id", "page_number")
+    row_fields = ("has_tables", "has_images")
+    fields = location_fields + row_fields
+
+    def __init__(self):
+        # location_fields post location ids, row_fields post rows
+        self._postings: Dict[str, Dict[Any, List[int]]] = {field: {} for field in self.fields}
+        # location id -> row
+        self._location_rows: List[int] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """Index rows appended to the store, in row order, including their back-referenced locations."""
+        for metadata in metadatas:
+            self._add_location(self._size, metadata)
+            for field in self.row_fields:
+                value = metadata.get(field)
+                if value is not None:
+                    self._postings[field].setdefault(value, []).append(self._size)
+            self.add_locations(self._size, metadata.get('duplicates', ()))
+            self._size += 1
+
+    def add_locations(self, row: int, locations: Iterable[Dict[str, Any]]) -> None:
+        """Make an existing row also match through additional locations (back-references)."""
+        for location in locations:
+            self._add_location(row, location)
+
+    def _add_location(self, row: int, location: Dict[str, Any]) -> None:
+        location_id = len(self._location_rows)
+        # Mapped before it is posted, so a concurrent reader can resolve every id it finds
+        self._location_rows.append(row)
+        for field in self.location_fields:
+            value = location.get(field)
+            if value is not None:
+                self._postings[field].setdefault(value, []).append(location_id)
+
+    def copy(self) -> "MetadataIndex":
+        index = MetadataIndex()
+        index._postings = {
+            field: {value: list(entries) for value, entries in values.items()} for field, values in self._postings.items()
+        }
+        index._location_rows = list(self._location_rows)
+        index._size = self._size
+        return index
+
+    def compacted(self, kept_indices: np.ndarray) -> "MetadataIndex":
+        """A new index over the kept rows, renumbered like the store's compaction."""
+        row_remap = np.full(self._size, -1, dtype=np.int64)
+        row_remap[kept_indices] = np.arange(len(kept_indices))
+        location_rows = row_remap[np.asarray(self._location_rows, dtype=np.int64)]
+        kept_locations = location_rows >= 0
+        location_remap = np.full(len(location_rows), -1, dtype=np.int64)
+        location_remap[kept_locations] = np.arange(int(kept_locations.sum()))
+
+        index = MetadataIndex()
+        for field, values in self._postings.items():
+            remap = location_remap if field in self.location_fields else row_remap
+            compacted = {}
+            for value, entries in values.items():
+                new_entries = remap[entries]
+                new_entries = new_entries[new_entries >= 0]
+                if len(new_entries):
+                    compacted[value] = new_entries.tolist()
+            index._postings[field] = compacted
+        index._location_rows = location_rows[kept_locations].tolist()
+        index._size = len(kept_indices)
+        return index
+
+    def rows(self, metadata_filter: Optional[MetadataFilter], n: Optional[int] = None) -> Optional[np.ndarray]:
+        """Sorted row ids below n (default: all rows) matching the filter, or None when the filter restricts nothing."""
+        if metadata_filter is None or metadata_filter.is_empty:
+            return None
+        n = self._size if n is None else min(n, self._size)
+
+        locations = []
+        if metadata_filter.file_names is not None:
+            locations.append(self._union("file_name", metadata_filter.file_names))
+        if metadata_filter.document_ids is not None:
+            locations.append(self._union("document_id", metadata_filter.document_ids))
+        if metadata_filter.page_min is not None or metadata_filter.page_max is not None:
+            low = metadata_filter.page_min if metadata_filter.page_min is not None else -np.inf
+            high = metadata_filter.page_max if metadata_filter.page_max is not None else np.inf
+            # Listed first: rows appended for a later view can add pages while this runs
+            pages = [page for page in list(self._postings["page_number"]) if low <= page <= high]
+            locations.append(self._union("page_number", pages))
+
+        selections = []
+        if locations:
+            location_ids = self._intersect(locations)
+            # Read after the postings, so it covers every id they hold
+            location_rows = np.asarray(self._location_rows, dtype=np.int64)
+            selections.append(np.unique(location_rows[location_ids]))
+        for field in self.row_fields:
+            value = getattr(metadata_filter, field)
+            if value is not None:
+                selections.append(self._union(field, [value]))
+        result = self._intersect(selections)
+        return result[result < n]
+
+    @staticmethod
+    def _intersect(selections: List[np.ndarray]) -> np.ndarray:
+        # Smallest first, so each step shrinks the working set as early as possible
+        selections = sorted(selections, key=len)
+        result = selections[0]
+        for selection in selections[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, selection, assume_unique=True)
+        return result
+
+    def _union(self, field: str, values: Iterable[Any]) -> np.ndarray:
+        postings = [self._postings[field].get(value) for value in values]
+        postings = [np.asarray(entries[:], dtype=np.int64) for entries in postings if entries]
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+        # Back-references append older rows out of order, so sort and dedupe
+        return np.unique(np.concatenate(postings))
+
+    def memory_bytes(self) -> int:
+        """Rough resident size of the posting lists."""
+        entries = sum(len(entries) for values in self._postings.values() for entries in values.values())
+        return (entries + len(self._location_rows)) * 16
@@ -0,0 +1,363 @@
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import logging
+import threading
+import time
+import numpy as np
+import redis
+from .api_key_cache import ApiKeyValidationCache
+from .embedding_cache import EmbeddingCache
+from .vector_store import VectorStoreManager, VectorStoreNode
+
+logger = logging.getLogger(__name__)
+
+# Redis layout, all under one prefix (default "bw"):
+#   {prefix}:index:tenants               set of tenants with a non-empty index
+#   {prefix}:index:{tenant}:version      publish counter, INCR'd with every change
+#   {prefix}:index:{tenant}:lock         writer lock, renewed while held
+#   {prefix}:index:{tenant}:rows         hash doc_id -> JSON record (doc_id, text, metadata)
+#   {prefix}:index:{tenant}:vectors      hash doc_id -> normalized float32 row bytes
+#   {prefix}:index:{tenant}:documents    JSON document summaries, in insertion order
+#   {prefix}:index:{tenant}:ivf          hash: centroids (float32 bytes), lists, trained_size of the IVF index
+#   {prefix}:embedding:{key}             float32 bytes, keyed like EmbeddingCache
+#   {prefix}:api_key:{sha256}            "1" or "0", expiring with the validation TTL
+#   {prefix}:job:{job_id}                JSON job status
+
+def connect(url: str) -> "redis.Redis":
+    """Client for REDIS_URL; thread-safe, with its own connection pool."""
+    return redis.Redis.from_url(url, health_check_interval=30)
+
+class RedisIndexTier:
+    """Publishes tenant stores to Redis, so instances behind a load balancer share one collection.
+
+    Redis holds each tenant's rows and vectors. Every instance keeps a full
+    local hot copy in its SimpleInMemoryVectorStore and searches only that
+    copy. A publish sends just the rows that changed since this instance last
+    opened or published the tenant, and bumps the version key in the same
+    MULTI/EXEC, so other instances see the old contents or the new ones,
+    never a mix. Instances compare the version key with their copy at most
+    every sync_interval seconds, and reload the copy when it has moved. The
+    writer's IVF centroids are published too, so a reload only assigns rows
+    to them instead of training its own.
+    Writers hold a Redis lock, renewed while the write runs, so ingestion on
+    one instance never races a write on another.
+    """
+
+    def __init__(self, client: "redis.Redis", prefix: str = "bw", sync_interval: float = 1.0, lock_timeout: float = 60.0):
+        self.client = client
+        self.prefix = prefix
+        self.sync_interval = sync_interval
+        self.lock_timeout = lock_timeout
+        # tenant -> (checked at, version) from the last version read
+        self._checked: Dict[str, Tuple[float, int]] = {}
+        # tenant -> {doc_id: digest of its record} as Redis holds it, for diffing publishes
+        self._published: Dict[str, Dict[str, bytes]] = {}
+        # tenant -> IVF centroids as Redis holds them, so unchanged centroids are not sent again
+        self._centroids: Dict[str, Optional[np.ndarray]] = {}
+
+    def _key(self, tenant: str, name: str) -> str:
+        return f"{self.prefix}:index:{tenant}:{name}"
+
+    def generation(self, tenant: str, fresh: bool = False) -> int:
+        """The tenant's version key, re-read at most every sync_interval seconds unless fresh."""
+        now = time.monotonic()
+        checked = self._checked.get(tenant)
+        if not fresh and checked is not None and now - checked[0] < self.sync_interval:
+            return checked[1]
+        version = int(self.client.get(self._key(tenant, "version")) or 0)
+        self._checked[tenant] = (now, version)
+        return version
+
+    def cached_generation(self, tenant: str) -> Optional[int]:
+        """The version last read, while it is less than sync_interval old; None when Redis must be asked."""
+        checked = self._checked.get(tenant)
+        if checked is None or time.monotonic() - checked[0] >= self.sync_interval:
+            return None
+        return checked[1]
+
+    @contextmanager
+    def lock(self, tenant: str):
+        lock = self.client.lock(
+            self._key(tenant, "lock"), timeout=self.lock_timeout, sleep=0.1, thread_local=False
+        )
+        lock.acquire()
+        stop = threading.Event()
+
+        def renew():
+            # Ingesting a large document can outlast the timeout; keep the lock while it runs
+            while not stop.wait(self.lock_timeout / 3):
+                lock.reacquire()
+
+        renewer = threading.Thread(target=renew, name="index-lock", daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            renewer.join()
+            lock.release()
+
+    def open(self, tenant: str, store: VectorStoreManager) -> None:
+        """Load the tenant's rows from Redis into the store's local copy in one swap."""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(self._key(tenant, "version"))
+        pipe.hgetall(self._key(tenant, "rows"))
+        pipe.hgetall(self._key(tenant, "vectors"))
+        pipe.get(self._key(tenant, "documents"))
+        pipe.hgetall(self._key(tenant, "ivf"))
+        version, rows, vectors, documents, ivf = pipe.execute()
+        version = int(version or 0)
+        self._checked[tenant] = (time.monotonic(), version)
+        self._published[tenant] = {doc_id.decode(): hashlib.sha1(record).digest() for doc_id, record in rows.items()}
+        centroids = None
+        if ivf:
+            centroids = np.frombuffer(ivf[b"centroids"], dtype=np.float32).reshape(int(ivf[b"lists"]), -1)
+        self._centroids[tenant] = centroids
+        if not rows:
+            if len(store.vector_store):
+                store.vector_store.clear()
+            return
+
+        documents = json.loads(documents or "[]")
+        order = {entry["document_id"]: i for i, entry in enumerate(documents)}
+        records = sorted((json.loads(record) for record in rows.values()), key=lambda r: self._row_order(r, order))
+        nodes = [
+            VectorStoreNode(doc_id=r["doc_id"], text=r["text"], embedding=None, metadata=r["metadata"])
+            for r in records
+        ]
+        matrix = np.stack([np.frombuffer(vectors[r["doc_id"].encode()], dtype=np.float32) for r in records])
+        store.vector_store.replace(
+            nodes, matrix, ivf=(centroids, int(ivf[b"trained_size"])) if ivf else None, documents=documents
+        )
+        logger.info(f"Loaded vector store for tenant {tenant[:8]} from Redis ({len(nodes)} nodes, version {version})")
+
+    @staticmethod
+    def _row_order(record: Dict[str, Any], order: Dict[str, int]):
+        """Rows in document insertion order, then chunk order within the document."""
+        prefix, _, index = record["doc_id"].rpartition("_")
+        return order.get(record["metadata"].get("document_id"), len(order)), prefix, int(index) if index.isdigit() else 0
+
+    def publish(self, tenant: str, store: VectorStoreManager) -> int:
+        """Send the rows that changed since the last open or publish; returns the new version."""
+        view = store.vector_store.view()
+        published = self._published.get(tenant, {})
+        current: Dict[str, bytes] = {}
+        upserts: Dict[str, bytes] = {}
+        new_ids: List[str] = []
+        for node, record in zip(view.nodes(), view.node_records()):
+            digest = hashlib.sha1(record).digest()
+            current[node.doc_id] = digest
+            if published.get(node.doc_id) != digest:
+                upserts[node.doc_id] = record
+                if node.doc_id not in published:
+                    new_ids.append(node.doc_id)
+        removed = [doc_id for doc_id in published if doc_id not in current]
+
+        pipe = self.client.pipeline(transaction=True)
+        if upserts:
+            pipe.hset(self._key(tenant, "rows"), mapping=upserts)
+        if new_ids:
+            # Row content never changes once stored, so only new rows carry a vector
+            vectors = view.row_vectors(new_ids)
+            pipe.hset(self._key(tenant, "vectors"), mapping={
+                doc_id: vectors[i].astype(np.float32).tobytes() for i, doc_id in enumerate(new_ids)
+            })
+        if removed:
+            pipe.hdel(self._key(tenant, "rows"), *removed)
+            pipe.hdel(self._key(tenant, "vectors"), *removed)
+        pipe.set(self._key(tenant, "documents"), json.dumps(view.list_documents()))
+        centroids = view._ann.centroids if view._ann is not None and current else None
+        if centroids is not self._centroids.get(tenant):
+            pipe.delete(self._key(tenant, "ivf"))
+            if centroids is not None:
+                pipe.hset(self._key(tenant, "ivf"), mapping={
+                    "centroids": centroids.astype(np.float32).tobytes(),
+                    "lists": centroids.shape[0],
+                    "trained_size": view._ann.trained_size,
+                })
+        if current:
+            pipe.sadd(f"{self.prefix}:index:tenants", tenant)
+        else:
+            pipe.srem(f"{self.prefix}:index:tenants", tenant)
+        pipe.incr(self._key(tenant, "version"))
+        version = int(pipe.execute()[-1])
+
+        self._published[tenant] = current
+        self._centroids[tenant] = centroids
+        self._checked[tenant] = (time.monotonic(), version)
+        logger.info(
+            f"Published vector store for tenant {tenant[:8]} to Redis: version {version}, "
+            f"{len(upserts)} rows written, {len(removed)} removed"
+        )
+        return version
+
+    def forget(self, tenant: str) -> None:
+        self._checked.pop(tenant, None)
+        self._published.pop(tenant, None)
+        self._centroids.pop(tenant, None)
+
+    def persisted_tenants(self) -> int:
+        return int(self.client.scard(f"{self.prefix}:index:tenants"))
+
+class RedisEmbeddingCache:
+    """EmbeddingCache counterpart stored in Redis and shared by every instance.
+
+    Keys match EmbeddingCache.make_key. Entries expire after ttl seconds
+    (None keeps them), and Redis's maxmemory policy does any LRU eviction.
+    If Redis is unreachable, lookups count as misses and writes are skipped,
+    so embedding falls back to OpenAI instead of failing.
+    """
+
+    def __init__(self, client: "redis.Redis", prefix: str = "bw", ttl: Optional[float] = None):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    make_key = staticmethod(EmbeddingCache.make_key)
+
+    def _key(self, model_name: str, text: str) -> str:
+        return f"{self.prefix}:embedding:{self.make_key(model_name, text)}"
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Look up embeddings for texts with one MGET; missing entries come back as None."""
+        if not texts:
+            return []
+        try:
+            blobs = self.client.mget([self._key(model_name, text) for text in texts])
+        except redis.RedisError as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            blobs = [None] * len(texts)
+        results = [np.frombuffer(blob, dtype=np.float32).tolist() if blob is not None else None for blob in blobs]
+        hit_count = sum(1 for result in results if result is not None)
+        with self._lock:
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model_name, [text])[0]
+
+    def put_many(self, model_name: str, texts: Sequence[str], embeddings: Sequence[List[float]]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for text, embedding in zip(texts, embeddings):
+            blob = np.asarray(embedding, dtype=np.float32).tobytes()
+            pipe.set(self._key(model_name, text), blob, ex=int(self.ttl) if self.ttl else None)
+        try:
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def put(self, model_name: str, text: str, embedding: List[float]) -> None:
+        self.put_many(model_name, [text], [embedding])
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        """The client is shared and closed by its owner."""
+
+class RedisApiKeyValidationCache(ApiKeyValidationCache):
+    """ApiKeyValidationCache whose results are also shared through Redis.
+
+    A key validated by any instance is trusted by all of them until its TTL
+    runs out. The in-process table is still consulted first. On a miss, the
+    shared entry is read in the worker thread the validator runs in, before
+    calling it, so the event loop never waits on Redis and concurrent
+    validations of one key still share one lookup. If Redis is unreachable
+    the cache works per instance.
+    """
+
+    def __init__(self, client: "redis.Redis", prefix: str = "bw", **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.prefix = prefix
+        # digest -> seconds left on the shared entry a validation was answered from, for store()
+        self._shared_ttls: Dict[str, float] = {}
+
+    def _key(self, api_key: str) -> str:
+        return f"{self.prefix}:api_key:{self._digest(api_key)}"
+
+    async def validate(self, api_key: str, validator: Callable[[str], bool]) -> bool:
+        def validate_shared(key: str) -> bool:
+            shared = self._shared_lookup(key)
+            if shared is not None:
+                is_valid, ttl = shared
+                self._shared_ttls[self._digest(key)] = ttl
+                return is_valid
+            is_valid = validator(key)
+            self._shared_store(key, is_valid)
+            return is_valid
+
+        return await super().validate(api_key, validate_shared)
+
+    def store(self, api_key: str, is_valid: bool) -> None:
+        super().store(api_key, is_valid)
+        ttl = self._shared_ttls.pop(self._digest(api_key), None)
+        if ttl is not None:
+            # Kept locally only for what remains of the shared entry's TTL
+            self._entries[self._digest(api_key)] = (is_valid, time.monotonic() + ttl)
+
+    def _shared_lookup(self, api_key: str) -> Optional[Tuple[bool, float]]:
+        """(is_valid, seconds left) from Redis, or None; blocking."""
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.get(self._key(api_key))
+            pipe.pttl(self._key(api_key))
+            value, ttl_ms = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"API key cache lookup failed: {e}")
+            return None
+        if value is None or ttl_ms <= 0:
+            return None
+        return value == b"1", ttl_ms / 1000.0
+
+    def _shared_store(self, api_key: str, is_valid: bool) -> None:
+        ttl = self.positive_ttl if is_valid else self.negative_ttl
+        try:
+            self.client.set(self._key(api_key), b"1" if is_valid else b"0", px=max(1, int(ttl * 1000)))
+        except redis.RedisError as e:
+            logger.warning(f"API key cache write failed: {e}")
+
+    def invalidate(self, api_key: str) -> None:
+        """Drop the key here and in Redis; blocking, so call it from a worker thread."""
+        super().invalidate(api_key)
+        try:
+            self.client.delete(self._key(api_key))
+        except redis.RedisError as e:
+            logger.warning(f"API key cache invalidation failed: {e}")
+
+class RedisJobStatus:
+    """Published job status in Redis, so any instance can answer a job poll (see IngestionJobManager)."""
+
+    def __init__(self, client: "redis.Redis", prefix: str = "bw", ttl: float = 3600.0):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def write(self, job_id: str, payload: Dict[str, Any]) -> None:
+        self.client.set(f"{self.prefix}:job:{job_id}", json.dumps(payload), ex=int(self.ttl))
+
+    def read(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = self.client.get(f"{self.prefix}:job:{job_id}")
+        except redis.RedisError as e:
+            logger.warning(f"Job status lookup failed: {e}")
+            return None
+        return json.loads(value) if value is not None else None
+
+    def delete(self, job_id: str) -> None:
+        try:
+            self.client.delete(f"{self.prefix}:job:{job_id}")
+        except redis.RedisError as e:
+            logger.warning(f"Job status delete failed: {e}")
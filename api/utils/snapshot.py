@@ -0,0 +1,327 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# On-disk index layout (one directory per store):
+#   CURRENT                      name of the last complete snapshot, swapped atomically
+#   snapshots/<generation>/
+#       manifest.json            format version, row count, dimension, dtype, document summaries
+#       embeddings.<f32|f16|i8>  raw row-major matrix in the store's precision, opened with np.memmap
+#       scales.f32               per-row dequantization scales (int8 only)
+#       nodes.bin                one UTF-8 JSON record (doc_id, text, metadata) per chunk
+#       nodes.idx.npy            int64 byte offsets into nodes.bin (count + 1 entries)
+#       ivf_centroids.f32        IVF centroids, (lists, dimension), when the store had a trained index
+#       ivf_labels.i32           IVF list of each row (count entries), alongside ivf_centroids.f32
+# and, next to the directory, <name>.generation: an 8-byte publish counter (see GenerationCounter)
+FORMAT_NAME = "banker-wingman-index"
+FORMAT_VERSION = 1
+EMBEDDING_FILES = {"float32": "embeddings.f32", "float16": "embeddings.f16", "int8": "embeddings.i8"}
+# Readers in other processes read CURRENT and then map its files without a lock, so a writer keeps the
+# generation it replaced; open_snapshot retries in the rare case a reader is two publishes behind
+OPEN_ATTEMPTS = 3
+# A temporary snapshot directory untouched for this long was left by a writer that crashed
+ABANDONED_TMP_SECONDS = 3600
+
+class SnapshotNodes(Sequence):
+    """Node list backed by a snapshot sidecar; records are only parsed when a node is accessed.
+
+    Nodes added after the snapshot was opened are kept in an ordinary list
+    after the snapshot rows, so the store can keep growing incrementally.
+    Snapshot rows that are replaced (e.g. with updated metadata) are kept as
+    in-memory overrides.
+    """
+
+    def __init__(self, records: np.ndarray, offsets: np.ndarray, make_node: Callable[[int, Dict[str, Any]], Any]):
+        self._records = records
+        self._offsets = offsets
+        self._make_node = make_node
+        self._base_count = len(offsets) - 1
+        self._extra: List[Any] = []
+        self._overrides: Dict[int, Any] = {}
+
+    def __len__(self) -> int:
+        return self._base_count + len(self._extra)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("node index out of range")
+        if index >= self._base_count:
+            return self._extra[index - self._base_count]
+        if index in self._overrides:
+            return self._overrides[index]
+        return self._make_node(index, json.loads(self.record_bytes(index)))
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __setitem__(self, index: int, node: Any) -> None:
+        if index < 0:
+            index += len(self)
+        if index >= self._base_count:
+            self._extra[index - self._base_count] = node
+        else:
+            self._overrides[index] = node
+
+    def extend(self, nodes: Iterable[Any]) -> None:
+        self._extra.extend(nodes)
+
+    def copy(self) -> "SnapshotNodes":
+        """A list over the same mapped records whose overrides and added nodes can change independently."""
+        nodes = SnapshotNodes(self._records, self._offsets, self._make_node)
+        nodes._extra = list(self._extra)
+        nodes._overrides = dict(self._overrides)
+        return nodes
+
+    def is_snapshot_row(self, index: int) -> bool:
+        """True while a row is still exactly as stored in the snapshot."""
+        return index < self._base_count and index not in self._overrides
+
+    def record_bytes(self, index: int) -> bytes:
+        """Raw JSON record for a snapshot row, without parsing it."""
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return self._records[start:end].tobytes()
+
+    @property
+    def extra_nodes(self) -> List[Any]:
+        return self._extra
+
+    def resident_bytes(self) -> int:
+        """Bytes held in process memory; the mapped sidecar is page cache and not counted."""
+        return sum(len(node.text) for node in self._extra) + sum(len(node.text) for node in self._overrides.values())
+
+class GenerationCounter:
+    """Publish counter for one store, shared by every process on the node.
+
+    The counter is an int64 in a small file that each process maps with
+    MAP_SHARED, so reading it is a plain memory load and can be done on every
+    request: when it differs from the generation a process last loaded,
+    another process has published a newer snapshot. Writers hold lock(), an
+    exclusive flock on the same file, while they refresh, mutate, snapshot
+    and bump(), so writes from different processes apply one after another.
+    The file lives outside the snapshot directory, which is deleted when a
+    store is emptied.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < 8:
+                os.ftruncate(fd, 8)
+        finally:
+            os.close(fd)
+        self._value = np.memmap(self.path, dtype=np.int64, mode="r+", shape=(1,))
+
+    @property
+    def value(self) -> int:
+        return int(self._value[0])
+
+    def bump(self) -> int:
+        """Advance the counter (under lock()) and return the new generation."""
+        self._value[0] += 1
+        return int(self._value[0])
+
+    @contextmanager
+    def lock(self):
+        """Exclusive cross-process write lock; also excludes other threads, which open their own descriptor."""
+        fd = os.open(str(self.path), os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+def _fsync_path(path: Path) -> None:
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _current_snapshot(directory: Path) -> Optional[Path]:
+    pointer = directory / "CURRENT"
+    if not pointer.exists():
+        return None
+    snapshot = directory / "snapshots" / pointer.read_text().strip()
+    return snapshot if (snapshot / "manifest.json").exists() else None
+
+def snapshot_exists(directory: Path) -> bool:
+    return _current_snapshot(Path(directory)) is not None
+
+def write_snapshot(
+    directory: Path,
+    embeddings: np.ndarray,
+    records: Iterable[bytes],
+    documents: List[Dict[str, Any]],
+    scales: Optional[np.ndarray] = None,
+    ivf: Optional[Tuple[np.ndarray, np.ndarray, int]] = None,
+) -> Path:
+    """Write a new snapshot generation and atomically point CURRENT at it.
+
+    Everything is written into a temporary directory, fsynced, renamed into
+    place, and only then published via CURRENT, so a crash at any point
+    leaves the previous snapshot intact and readable. ivf is a trained IVF
+    index as (centroids, labels, trained_size), stored so readers can search
+    it without training their own.
+    """
+    directory = Path(directory)
+    snapshots_dir = directory / "snapshots"
+    snapshots_dir.mkdir(parents=True, exist_ok=True)
+
+    previous = _current_snapshot(directory)
+    generation = int(previous.name) + 1 if previous is not None else 1
+    name = f"{generation:08d}"
+    tmp_dir = snapshots_dir / f".tmp-{name}-{uuid.uuid4().hex[:8]}"
+    tmp_dir.mkdir()
+
+    try:
+        matrix = np.ascontiguousarray(embeddings)
+        dtype = matrix.dtype.name
+        if dtype not in EMBEDDING_FILES:
+            raise ValueError(f"Unsupported embedding dtype for snapshot: {dtype}")
+        with (tmp_dir / EMBEDDING_FILES[dtype]).open("wb") as f:
+            matrix.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if scales is not None:
+            with (tmp_dir / "scales.f32").open("wb") as f:
+                np.ascontiguousarray(scales, dtype=np.float32).tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+
+        if ivf is not None:
+            centroids, labels, trained_size = ivf
+            for file_name, array in (("ivf_centroids.f32", np.asarray(centroids, dtype=np.float32)),
+                                     ("ivf_labels.i32", np.asarray(labels, dtype=np.int32))):
+                with (tmp_dir / file_name).open("wb") as f:
+                    np.ascontiguousarray(array).tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+        offsets = [0]
+        with (tmp_dir / "nodes.bin").open("wb") as f:
+            for record in records:
+                f.write(record)
+                offsets.append(offsets[-1] + len(record))
+            f.flush()
+            os.fsync(f.fileno())
+        np.save(tmp_dir / "nodes.idx.npy", np.asarray(offsets, dtype=np.int64))
+
+        manifest = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "count": int(matrix.shape[0]),
+            "dimension": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            "dtype": dtype,
+            "documents": documents,
+        }
+        if ivf is not None:
+            manifest["ivf"] = {"lists": int(ivf[0].shape[0]), "trained_size": int(ivf[2])}
+        with (tmp_dir / "manifest.json").open("w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        final_dir = snapshots_dir / name
+        os.replace(tmp_dir, final_dir)
+        _fsync_path(snapshots_dir)
+
+        pointer_tmp = directory / f".CURRENT.{uuid.uuid4().hex[:8]}"
+        with pointer_tmp.open("w") as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer_tmp, directory / "CURRENT")
+        _fsync_path(directory)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # Generations before the previous one are garbage; open memmaps keep their inodes alive. Another
+    # writer's temporary directory may still be in use, so only ones left behind by a crash are removed.
+    keep = {name, previous.name} if previous is not None else {name}
+    for stale in snapshots_dir.iterdir():
+        if stale.name in keep:
+            continue
+        if stale.name.startswith(".tmp-"):
+            try:
+                if time.time() - stale.stat().st_mtime < ABANDONED_TMP_SECONDS:
+                    continue
+            except FileNotFoundError:
+                continue
+        shutil.rmtree(stale, ignore_errors=True)
+    return final_dir
+
+def open_snapshot(
+    directory: Path,
+    make_node: Callable[[int, Dict[str, Any]], Any],
+) -> Tuple[np.ndarray, Optional[np.ndarray], SnapshotNodes, List[Dict[str, Any]], Optional[Tuple[np.ndarray, np.ndarray, int]]]:
+    """Map the current snapshot without parsing it: returns (matrix, scales, nodes, documents, ivf).
+
+    ivf is (centroids, labels, trained_size) as passed to write_snapshot, or
+    None when the snapshot has no IVF index.
+
+    Safe against a writer in another process publishing at the same time:
+    if the generation CURRENT named is retired before its files are mapped,
+    CURRENT is read again.
+    """
+    for attempt in range(OPEN_ATTEMPTS):
+        try:
+            return _open_current(Path(directory), make_node)
+        except FileNotFoundError:
+            if attempt == OPEN_ATTEMPTS - 1:
+                raise
+            logger.info(f"Snapshot in {directory} was replaced while opening it; retrying")
+
+def _open_current(
+    directory: Path,
+    make_node: Callable[[int, Dict[str, Any]], Any],
+) -> Tuple[np.ndarray, Optional[np.ndarray], SnapshotNodes, List[Dict[str, Any]], Optional[Tuple[np.ndarray, np.ndarray, int]]]:
+    snapshot = _current_snapshot(directory)
+    if snapshot is None:
+        raise FileNotFoundError(f"No snapshot found in {directory}")
+
+    with (snapshot / "manifest.json").open(encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME or manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format in {snapshot}: {manifest.get('format')} v{manifest.get('version')}")
+
+    count, dimension, dtype = manifest["count"], manifest["dimension"], manifest["dtype"]
+    scales = None
+    if count:
+        # Copy-on-write mapping: in-place compaction never touches the file on disk
+        matrix = np.memmap(snapshot / EMBEDDING_FILES[dtype], dtype=dtype, mode="c", shape=(count, dimension))
+        if (snapshot / "scales.f32").exists():
+            scales = np.memmap(snapshot / "scales.f32", dtype=np.float32, mode="c", shape=(count,))
+        records = np.memmap(snapshot / "nodes.bin", dtype=np.uint8, mode="r")
+    else:
+        matrix = np.zeros((0, dimension), dtype=dtype)
+        if dtype == "int8":
+            scales = np.zeros(0, dtype=np.float32)
+        records = np.zeros(0, dtype=np.uint8)
+    offsets = np.load(snapshot / "nodes.idx.npy", mmap_mode="r")
+    ivf = None
+    if "ivf" in manifest and count:
+        centroids = np.fromfile(snapshot / "ivf_centroids.f32", dtype=np.float32).reshape(manifest["ivf"]["lists"], dimension)
+        labels = np.memmap(snapshot / "ivf_labels.i32", dtype=np.int32, mode="r", shape=(count,))
+        ivf = (centroids, labels, manifest["ivf"]["trained_size"])
+    return matrix, scales, SnapshotNodes(records, offsets, make_node), manifest["documents"], ivf
+
+def delete_snapshots(directory: Path) -> None:
+    shutil.rmtree(Path(directory), ignore_errors=True)
@@ -0,0 +1,233 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Any, Optional
+import asyncio
+import hashlib
+import logging
+import threading
+from .vector_store import VectorStoreManager
+from .snapshot import GenerationCounter, snapshot_exists, delete_snapshots
+
+logger = logging.getLogger(__name__)
+
+class SnapshotTier:
+    """Publishes tenant stores as snapshot generations under data_dir.
+
+    Every process on the node that shares data_dir sees the same
+    generations: publish() writes a snapshot and bumps the tenant's shared
+    GenerationCounter, and open() memory-maps the latest snapshot. Snapshot
+    pages are file-backed, so the processes share one copy of each tenant's
+    matrix and chunk records.
+    """
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        self._counters: Dict[str, GenerationCounter] = {}
+
+    def generation(self, tenant: str, fresh: bool = False) -> int:
+        """The tenant's latest published generation; a memory read, so always fresh."""
+        return self._counter(tenant).value
+
+    def cached_generation(self, tenant: str) -> Optional[int]:
+        """The generation if it can be read without I/O (the counter is already mapped), else None."""
+        counter = self._counters.get(tenant)
+        return counter.value if counter is not None else None
+
+    def lock(self, tenant: str):
+        return self._counter(tenant).lock()
+
+    def open(self, tenant: str, store: VectorStoreManager) -> None:
+        """Map the tenant's latest snapshot into the store, or empty it when there is none."""
+        snapshot_path = self.data_dir / tenant
+        if snapshot_exists(snapshot_path):
+            try:
+                store.vector_store.load(snapshot_path)
+            except FileNotFoundError:
+                # Emptied by another process while we were opening it
+                if snapshot_exists(snapshot_path):
+                    raise
+                store.vector_store.clear()
+                return
+            logger.info(
+                f"Opened vector store snapshot for tenant {tenant[:8]} "
+                f"({len(store.vector_store)} nodes)"
+            )
+        elif len(store.vector_store):
+            store.vector_store.clear()
+
+    def publish(self, tenant: str, store: VectorStoreManager) -> int:
+        """Snapshot the store (or drop its snapshot once empty) and return the new generation."""
+        path = self.data_dir / tenant
+        if not len(store.vector_store):
+            delete_snapshots(path)
+        else:
+            store.vector_store.save(path)
+            logger.info(f"Snapshotted vector store for tenant {tenant[:8]} ({len(store.vector_store)} nodes)")
+        return self._counter(tenant).bump()
+
+    def forget(self, tenant: str) -> None:
+        """Called when the tenant's store leaves memory."""
+
+    def persisted_tenants(self) -> int:
+        return sum(1 for p in self.data_dir.iterdir() if p.is_dir()) if self.data_dir.exists() else 0
+
+    def _counter(self, tenant: str) -> GenerationCounter:
+        counter = self._counters.get(tenant)
+        if counter is None:
+            counter = GenerationCounter(self.data_dir / f"{tenant}.generation")
+            self._counters[tenant] = counter
+        return counter
+
+class VectorStoreRegistry:
+    """Per-tenant VectorStoreManager instances under a shared memory budget.
+
+    Tenants are identified by a hash of their API key. Each tenant's store is
+    published through a tier after it changes, so it survives restarts and
+    redeploys. By default that is a SnapshotTier under data_dir. When the
+    resident stores exceed the budget, the least-recently-used ones are
+    dropped from memory and reopened lazily on that tenant's next request.
+
+    Several processes can share one tier: worker processes on a node through
+    data_dir, or instances behind a load balancer through a RedisIndexTier.
+    Every change goes through writing(), which serializes writers across all
+    of them and publishes a new generation. Each get() compares the tenant's
+    published generation with the one its resident store reflects and
+    reopens the store when another process has published.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], VectorStoreManager],
+        data_dir: Path,
+        memory_budget_bytes: int = 512 * 1024 * 1024,
+        tier=None,
+    ):
+        self.factory = factory
+        self.data_dir = Path(data_dir)
+        self.memory_budget_bytes = memory_budget_bytes
+        self.tier = tier if tier is not None else SnapshotTier(self.data_dir)
+        self._stores: "OrderedDict[str, VectorStoreManager]" = OrderedDict()
+        # tenant -> generation its resident store reflects
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def tenant_id(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+
+    def get(self, api_key: str) -> VectorStoreManager:
+        """Return the tenant's store, reopening it if it is not resident or another process published."""
+        return self._resident(api_key, fresh=False)
+
+    def current(self, api_key: str) -> Optional[VectorStoreManager]:
+        """The tenant's resident store if it is known to be up to date without any I/O or locking, else None."""
+        tenant = self.tenant_id(api_key)
+        store = self._stores.get(tenant)
+        if store is None:
+            return None
+        generation = self.tier.cached_generation(tenant)
+        if generation is None or self._generations.get(tenant) != generation:
+            return None
+        try:
+            self._stores.move_to_end(tenant)
+        except KeyError:
+            # Evicted meanwhile
+            return None
+        return store
+
+    async def aget(self, api_key: str) -> VectorStoreManager:
+        """get() for the event loop.
+
+        Checking a shared tier (a Redis round trip) and reopening a store
+        after another process published (a snapshot remap or a full reload
+        from Redis) run in a worker thread, so the loop keeps serving other
+        requests meanwhile.
+        """
+        store = self.current(api_key)
+        if store is None:
+            store = await asyncio.to_thread(self.get, api_key)
+        return store
+
+    def _resident(self, api_key: str, fresh: bool) -> VectorStoreManager:
+        tenant = self.tenant_id(api_key)
+        with self._lock:
+            generation = self.tier.generation(tenant, fresh=fresh)
+            store = self._stores.get(tenant)
+            if store is None:
+                store = self.factory(api_key)
+                self.tier.open(tenant, store)
+                self._stores[tenant] = store
+                self._generations[tenant] = generation
+            elif self._generations.get(tenant) != generation:
+                self.tier.open(tenant, store)
+                self._generations[tenant] = generation
+            self._stores.move_to_end(tenant)
+            return store
+
+    @contextmanager
+    def writing(self, api_key: str):
+        """Yield the tenant's store for a change, then publish it as a new generation.
+
+        Writers for the tenant, in this process or any other sharing the
+        tier, run one at a time, and each starts from the latest published
+        generation. If the change raises, nothing is published and the store
+        is reopened from the last published generation on its next use.
+        Before publishing, the writer trains the store's IVF index if the
+        change left it missing or stale, so readers never train one.
+        """
+        tenant = self.tenant_id(api_key)
+        with self.tier.lock(tenant):
+            store = self._resident(api_key, fresh=True)
+            try:
+                yield store
+                # Train any IVF index the change calls for now, so it is published with the rows
+                store.vector_store.train_ann()
+            except BaseException:
+                with self._lock:
+                    self._generations.pop(tenant, None)
+                raise
+            with self._lock:
+                self._generations[tenant] = self.tier.publish(tenant, store)
+
+    def peek(self, api_key: str) -> Optional[VectorStoreManager]:
+        """Return the tenant's resident store without reloading or touching LRU order."""
+        return self._stores.get(self.tenant_id(api_key))
+
+    def resident_bytes(self) -> int:
+        return sum(store.vector_store.memory_bytes() for store in list(self._stores.values()))
+
+    def enforce_budget(self) -> None:
+        """Evict least-recently-used tenants from memory until the resident set fits the budget.
+
+        The most recently used tenant always stays resident.
+        """
+        with self._lock:
+            while len(self._stores) > 1 and self.resident_bytes() > self.memory_budget_bytes:
+                tenant, store = self._stores.popitem(last=False)
+                self._generations.pop(tenant, None)
+                self._evict(tenant, store)
+
+    def _evict(self, tenant: str, store: VectorStoreManager) -> None:
+        # Every mutation is published as it happens, so the tier is already current
+        self.tier.forget(tenant)
+        logger.info(f"Evicted vector store for tenant {tenant[:8]} from memory")
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /api/health. Reading the tier is blocking I/O (a directory scan or a Redis
+        call), so call this off the event loop; a tier that cannot be read is reported, not raised."""
+        stats = {
+            "resident_tenants": len(self._stores),
+            "persisted_tenants": None,
+            "resident_bytes": self.resident_bytes(),
+            "memory_budget_bytes": self.memory_budget_bytes,
+        }
+        try:
+            stats["persisted_tenants"] = self.tier.persisted_tenants()
+        except Exception as e:
+            logger.warning(f"Could not count persisted tenants: {e}")
+            stats["tier_error"] = f"{type(e).__name__}: {e}"
+        return stats
@@ -1,128 +1,1424 @@
-from typing import List, Dict, Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Optional, Tuple
+import asyncio
+import json
 import logging
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.core.schema import Document
+import queue
+import threading
+import time
+import uuid
 import numpy as np
+import httpx
+from .embeddings import BatchEmbedder, IngestionReport
+from .embedding_cache import EmbeddingCache
+from .ann_index import IVFIndex
+from .lexical_index import BM25Index
+from .metadata_index import MetadataIndex, MetadataFilter
+from .dedup import DuplicateIndex, LOCATION_FIELDS, location_of
+from .context_packer import ContextPacker, ContextPassage
+from .snapshot import SnapshotNodes, write_snapshot, open_snapshot
 from dataclasses import dataclass
+# llama_index is slow to import, so the embedding model is built on first use (see embedding_model)
+if TYPE_CHECKING:
+    from llama_index.core.schema import Document
+    from llama_index.embeddings.openai import OpenAIEmbedding
 
 logger = logging.getLogger(__name__)
 
 @dataclass
 class VectorStoreNode:
-    """Simple node for storing document chunks with embeddings."""
+    """Simple node for storing document chunks with embeddings.
+
+    The store keeps vectors in its own matrix; once a node has been added its
+    embedding list is released (set to None) so it is not held twice. Nodes
+    are shared by every request reading the store, so query scores are
+    returned alongside them rather than stored on them.
+    """
     doc_id: str
     text: str
-    embedding: List[float]
+    embedding: Optional[List[float]]
     metadata: Dict[str, Any]
-    score: float = 0.0
 
-class SimpleInMemoryVectorStore:
-    """Simple in-memory vector store implementation using cosine similarity."""
-    
-    def __init__(self):
-        self.nodes: List[VectorStoreNode] = []
-    
-    def add_nodes(self, nodes: List[VectorStoreNode]) -> None:
-        """Add nodes to the vector store."""
-        self.nodes.extend(nodes)
-    
-    def query(self, query_embedding: List[float], top_k: int = 5) -> List[VectorStoreNode]:
-        """Query the vector store using cosine similarity."""
-        if not self.nodes:
+# Storage dtype for each supported precision
+PRECISION_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# Retrieval modes: cosine only, BM25 only (no embedding call), or both fused with reciprocal rank fusion
+SEARCH_MODES = ("dense", "lexical", "hybrid")
+
+class IndexView:
+    """One published version of a SimpleInMemoryVectorStore, read without locks.
+
+    The store's writer never changes a view its readers can see: it builds
+    the next view and publishes it with a single attribute assignment, so a
+    request that holds a view filters, scores and formats against one
+    consistent store however many uploads or deletions run meanwhile.
+    Appending shares the node list, the matrix and the BM25 and metadata
+    postings with the previous view, but only writes past its `size`, which
+    that view never reads. Compaction, back-reference updates, clear and load
+    build new containers. Derived indexes a view lacks (after a load or a
+    compaction) are built on first use and kept on that view, except the IVF
+    index: only writers train it (see SimpleInMemoryVectorStore.train_ann),
+    and a view without one is searched exactly.
+    """
+
+    def __init__(
+        self,
+        store: "SimpleInMemoryVectorStore",
+        nodes,
+        matrix: Optional[np.ndarray],
+        scales: Optional[np.ndarray],
+        size: int,
+        documents: Dict[str, Dict[str, Any]],
+        ann: Optional[IVFIndex] = None,
+        lexical: Optional[BM25Index] = None,
+        metadata: Optional[MetadataIndex] = None,
+        row_ids: Optional[Dict[str, int]] = None,
+    ):
+        # Configuration only: precision, index mode and their parameters
+        self._store = store
+        # Rows at or past size belong to later views
+        self._nodes = nodes
+        self._matrix = matrix
+        self._scales = scales
+        self.size = size
+        # document_id -> {"document_id", "file_name", "chunks", ...} for every resident document;
+        # chunks counts every location in the document, including back-references, and any other
+        # fields were recorded with update_document
+        self._documents = documents
+        # Changes on every publish, so anything derived from the contents can tell it went stale
+        self.version = uuid.uuid4().hex
+        self._ann = ann
+        self._lexical = lexical
+        self._metadata = metadata
+        # doc_id -> row
+        self._row_ids = row_ids
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def dimension(self) -> Optional[int]:
+        """Embedding dimension, or None while the store is empty."""
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Normalized embedding rows in this view, as float32 (a copy unless stored as float32)."""
+        if self._matrix is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._dequantize(slice(0, self.size))
+
+    def nodes(self) -> Iterable[VectorStoreNode]:
+        """The view's nodes in row order."""
+        return (self._nodes[row] for row in range(self.size))
+
+    def row_index(self) -> Dict[str, int]:
+        """doc_id -> row for every row in the view."""
+        row_ids = self._row_ids
+        if row_ids is None:
+            row_ids = {node.doc_id: row for row, node in enumerate(self.nodes())}
+            self._row_ids = row_ids
+        return row_ids
+
+    def contains(self, doc_id: str) -> bool:
+        row = self.row_index().get(doc_id)
+        return row is not None and row < self.size
+
+    def row_vectors(self, doc_ids: List[str]) -> np.ndarray:
+        """Normalized float32 vectors for the given stored chunks, in the given order."""
+        row_ids = self.row_index()
+        return self.vectors([row_ids[doc_id] for doc_id in doc_ids])
+
+    def vectors(self, rows: List[int]) -> np.ndarray:
+        """Normalized float32 vectors for rows of this view (e.g. from rank()), in the given order."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        return self._dequantize(rows)
+
+    def export_document(self, document_id: str):
+        """Return (nodes, float32 vectors) for every location of one document, back-references included.
+
+        Each returned node carries that location's fields in its metadata and
+        no back-references of its own.
+        """
+        nodes, indices = [], []
+        for row, node in enumerate(self.nodes()):
+            for location in SimpleInMemoryVectorStore._locations(node.metadata):
+                if location.get('document_id') != document_id:
+                    continue
+                metadata = {k: v for k, v in node.metadata.items() if k != 'duplicates'}
+                metadata.update(location)
+                nodes.append(VectorStoreNode(doc_id=node.doc_id, text=node.text, embedding=None, metadata=metadata))
+                indices.append(row)
+        rows = np.asarray(indices, dtype=np.int64)
+        vectors = self._dequantize(rows) if len(rows) else np.empty((0, self.dimension or 0), dtype=np.float32)
+        return nodes, vectors
+
+    def list_documents(self) -> List[Dict[str, Any]]:
+        """Summaries of the documents in this view, in insertion order."""
+        return [dict(entry) for entry in self._documents.values()]
+
+    def filter_rows(self, metadata_filter: Optional[MetadataFilter]) -> Optional[np.ndarray]:
+        """Rows whose metadata matches the filter, or None when nothing is filtered out."""
+        if metadata_filter is None or metadata_filter.is_empty:
+            return None
+        metadata = self._metadata
+        if metadata is None:
+            metadata = MetadataIndex()
+            metadata.add(node.metadata for node in self.nodes())
+            self._metadata = metadata
+        return metadata.rows(metadata_filter, n=self.size)
+
+    def query(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        exact: bool = False,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[Tuple[VectorStoreNode, float]]:
+        """Query the view using cosine similarity; returns (node, score) pairs, best first.
+
+        Pass exact=True to bypass the ANN index and score every row. Pass rows
+        (from this view's filter_rows) to score only that subset, exactly.
+        """
+        return [(self._nodes[row], score) for row, score in self.rank(query_embedding, top_k, exact, rows)]
+
+    def rank(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        exact: bool = False,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        """query(), as (row, score) pairs."""
+        if not self.size or top_k <= 0 or (rows is not None and not len(rows)):
+            return []
+
+        query_vector = SimpleInMemoryVectorStore._normalize(np.asarray(query_embedding, dtype=np.float32))
+        if rows is not None:
+            candidates = rows
+        else:
+            candidates = None if exact else self._ann_candidates(query_vector, top_k)
+        scores = self._score(query_vector, candidates)
+
+        # argpartition is O(N); only the k winners are fully sorted
+        k = min(top_k, len(scores))
+        if k < len(scores):
+            top_indices = np.argpartition(scores, -k)[-k:]
+        else:
+            top_indices = np.arange(len(scores))
+        top_indices = top_indices[np.argsort(scores[top_indices])[::-1]]
+
+        return [
+            (int(index if candidates is None else candidates[index]), float(scores[index]))
+            for index in top_indices
+        ]
+
+    def query_text(
+        self, query: str, top_k: int = 5, rows: Optional[np.ndarray] = None
+    ) -> List[Tuple[VectorStoreNode, float]]:
+        """Query the BM25 index; returns (node, BM25 score) pairs, best first. Needs no embedding."""
+        return [(self._nodes[row], score) for row, score in self.rank_text(query, top_k, rows)]
+
+    def rank_text(
+        self, query: str, top_k: int = 5, rows: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """query_text(), as (row, BM25 score) pairs."""
+        if not self.size or top_k <= 0 or (rows is not None and not len(rows)):
             return []
-        
-        # Calculate cosine similarity for each node
-        for node in self.nodes:
-            similarity = self._cosine_similarity(query_embedding, node.embedding)
-            node.score = similarity
-        
-        # Sort by similarity score (descending) and return top_k
-        sorted_nodes = sorted(self.nodes, key=lambda x: x.score, reverse=True)
-        return sorted_nodes[:top_k]
-    
+        return [(int(row), score) for row, score in self._lexical_index().search(query, top_k, rows=rows, n=self.size)]
+
+    def _lexical_index(self) -> BM25Index:
+        lexical = self._lexical
+        if lexical is None:
+            lexical = BM25Index()
+            lexical.add(node.text for node in self.nodes())
+            self._lexical = lexical
+            logger.info(f"Built BM25 index over {len(lexical)} rows")
+        return lexical
+
+    def query_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[List[Tuple[VectorStoreNode, float]]]:
+        """Exact cosine top-k for several queries from one matrix-matrix product; (node, score) pairs per query."""
+        return [
+            [(self._nodes[row], score) for row, score in ranking]
+            for ranking in self.rank_many(query_embeddings, top_k, rows)
+        ]
+
+    def rank_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """query_many(), as (row, score) pairs per query."""
+        if not len(query_embeddings):
+            return []
+        if not self.size or top_k <= 0 or (rows is not None and not len(rows)):
+            return [[] for _ in query_embeddings]
+
+        query_matrix = SimpleInMemoryVectorStore._normalize(np.asarray(query_embeddings, dtype=np.float32))
+        # (rows, queries): one column of scores per query
+        scores = self._score(query_matrix.T, rows)
+        k = min(top_k, scores.shape[0])
+        if k < scores.shape[0]:
+            top = np.argpartition(scores, -k, axis=0)[-k:]
+        else:
+            top = np.broadcast_to(np.arange(scores.shape[0])[:, None], scores.shape)
+        top_scores = np.take_along_axis(scores, top, axis=0)
+        order = np.argsort(-top_scores, axis=0, kind="stable")
+        top = np.take_along_axis(top, order, axis=0)
+        top_scores = np.take_along_axis(top_scores, order, axis=0)
+
+        results = []
+        for column in range(scores.shape[1]):
+            ranking = []
+            for index, score in zip(top[:, column], top_scores[:, column]):
+                ranking.append((int(index if rows is None else rows[index]), float(score)))
+            results.append(ranking)
+        return results
+
+    def _ann_candidates(self, query_vector: np.ndarray, top_k: int) -> Optional[np.ndarray]:
+        """Candidate rows from the IVF index, or None when exact search should be used."""
+        store = self._store
+        if store.index_mode != "ivf" or self.size < store.ann_min_size or self._ann is None:
+            return None
+        candidates = self._ann.candidates(query_vector)
+        # Too few rows in the probed lists to fill top_k: exact search is both cheap and correct
+        return candidates if len(candidates) >= top_k else None
+
+    def _score(self, query_vector: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine scores for all rows (rows=None) or the given row indices.
+
+        query_vector may also be a (dim, queries) matrix, giving one column of scores per query.
+        """
+        if self._store.precision == "float32":
+            matrix = self.embeddings if rows is None else self._matrix[rows]
+            return matrix @ query_vector
+
+        total = self.size if rows is None else len(rows)
+        block_rows = self._store.score_block_rows
+        scores = np.empty((total,) + query_vector.shape[1:], dtype=np.float32)
+        for start in range(0, total, block_rows):
+            end = min(start + block_rows, total)
+            block = slice(start, end) if rows is None else rows[start:end]
+            scores[start:end] = self._dequantize(block) @ query_vector
+        return scores
+
+    def _dequantize(self, rows) -> np.ndarray:
+        """float32 copy (or view, for float32 storage) of the selected stored rows."""
+        if self._store.precision == "float32":
+            return self._matrix[rows]
+        block = self._matrix[rows].astype(np.float32)
+        if self._store.precision == "int8":
+            block *= self._scales[rows][:, None]
+        return block
+
+    def index_bytes(self) -> int:
+        """Bytes used by the stored embedding rows and their scales."""
+        if self._matrix is None:
+            return 0
+        row_bytes = self._matrix.shape[1] * self._matrix.itemsize
+        scale_bytes = 4 if self._scales is not None else 0
+        return self.size * (row_bytes + scale_bytes)
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size: the allocated embedding matrix plus node text.
+
+        Pages of a memory-mapped snapshot are file-backed and not counted.
+        """
+        matrix_bytes = 0
+        if self._matrix is not None and not isinstance(self._matrix, np.memmap):
+            matrix_bytes = self._matrix.nbytes + (0 if self._scales is None else self._scales.nbytes)
+        if self._lexical is not None:
+            matrix_bytes += self._lexical.memory_bytes()
+        if self._metadata is not None:
+            matrix_bytes += self._metadata.memory_bytes()
+        if isinstance(self._nodes, SnapshotNodes):
+            return matrix_bytes + self._nodes.resident_bytes()
+        return matrix_bytes + sum(len(node.text) for node in self.nodes())
+
+    def node_records(self):
+        """Serialized sidecar records in row order, reusing raw bytes for rows that came from a snapshot."""
+        for index in range(self.size):
+            if isinstance(self._nodes, SnapshotNodes) and self._nodes.is_snapshot_row(index):
+                yield self._nodes.record_bytes(index)
+                continue
+            node = self._nodes[index]
+            yield json.dumps(
+                {"doc_id": node.doc_id, "text": node.text, "metadata": node.metadata}
+            ).encode("utf-8")
+
+class SimpleInMemoryVectorStore:
+    """Simple in-memory vector store implementation using cosine similarity.
+
+    Embeddings are kept in one contiguous, L2-normalized matrix so a query is a
+    single matrix-vector product followed by a partial top-k sort. The matrix
+    is stored as float32, float16, or int8 with a per-row scale, and is
+    dequantized block by block while scoring.
+    With index_mode="ivf", stores of at least ann_min_size rows are searched
+    through an IVF index instead; smaller stores always use exact search.
+    Writers train the index with train_ann() before they publish, so queries
+    never wait for k-means; until a trained view is published, they search
+    exactly.
+    A BM25 inverted index over the chunk text and posting lists over the
+    chunk metadata are kept alongside, row for row.
+    Each row is stored once per distinct content: other places the same (or a
+    near-identical) chunk occurs are kept as back-references in
+    metadata['duplicates'], alongside the row's own location fields.
+
+    Contents are published as immutable IndexViews. Writers are serialized
+    and each publishes a new view; readers call view() once per request and
+    read it without locks. The convenience readers on the store each use the
+    view current at the time of the call, so a request that needs several
+    reads (filter, then score, then fetch vectors) should hold one view.
+    """
+
+    # Rows allocated up front; the matrix then grows geometrically
+    initial_capacity = 256
+    growth_factor = 2
+    # Retrain IVF centroids once the store has grown this much since the last training
+    ann_retrain_growth = 4
+    # Rows dequantized at a time while scoring, bounding the float32 scratch buffer
+    score_block_rows = 16384
+
+    def __init__(
+        self,
+        index_mode: str = "exact",
+        ann_min_size: int = 5000,
+        ivf_nlist: Optional[int] = None,
+        ivf_nprobe: int = 8,
+        precision: str = "float32",
+        dedup_threshold: float = 1.0,
+    ):
+        if index_mode not in ("exact", "ivf"):
+            raise ValueError(f"Unknown index mode: {index_mode}")
+        if precision not in PRECISION_DTYPES:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.index_mode = index_mode
+        self.ann_min_size = ann_min_size
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        self.precision = precision
+        self.dedup_threshold = dedup_threshold
+        # Held by writers only; readers never take it
+        self._write_lock = threading.Lock()
+        self._view = self._empty_view()
+        # Content lookup used while ingesting; None after a snapshot load and rebuilt on first use
+        self._duplicates: Optional[DuplicateIndex] = DuplicateIndex(threshold=dedup_threshold)
+
+    def view(self) -> IndexView:
+        """The currently published contents; stays consistent however long the caller holds it."""
+        return self._view
+
+    def __len__(self) -> int:
+        return self._view.size
+
+    @property
+    def version(self) -> str:
+        """Changes on every mutation, so anything derived from the contents can tell it went stale."""
+        return self._view.version
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return self._view.dimension
+
+    def query(
+        self, query_embedding: List[float], top_k: int = 5, exact: bool = False
+    ) -> List[Tuple[VectorStoreNode, float]]:
+        return self._view.query(query_embedding, top_k=top_k, exact=exact)
+
+    def query_text(self, query: str, top_k: int = 5) -> List[Tuple[VectorStoreNode, float]]:
+        return self._view.query_text(query, top_k=top_k)
+
+    def list_documents(self) -> List[Dict[str, Any]]:
+        return self._view.list_documents()
+
+    def export_document(self, document_id: str):
+        return self._view.export_document(document_id)
+
+    def index_bytes(self) -> int:
+        return self._view.index_bytes()
+
+    def memory_bytes(self) -> int:
+        return self._view.memory_bytes()
+
+    def _empty_view(self) -> IndexView:
+        return IndexView(self, [], None, None, 0, {}, lexical=BM25Index(), metadata=MetadataIndex(), row_ids={})
+
+    def add_nodes(self, nodes: List[VectorStoreNode], vectors: Optional[np.ndarray] = None) -> None:
+        """Add nodes to the vector store.
+
+        Embeddings come from node.embedding unless a (len(nodes), dim) matrix
+        is passed in as vectors.
+        """
+        if not nodes:
+            return
+
+        if vectors is None:
+            vectors = np.asarray([node.embedding for node in nodes], dtype=np.float32)
+        vectors = self._normalize(np.asarray(vectors, dtype=np.float32))
+        stored, scales = self._quantize(vectors)
+        with self._write_lock:
+            current = self._view
+            start, end = current.size, current.size + len(nodes)
+            matrix, matrix_scales = self._reserve(current, end, vectors.shape[1])
+            # Rows past current.size are invisible to every published view, so they are written in place
+            matrix[start:end] = stored
+            if scales is not None:
+                matrix_scales[start:end] = scales
+            for node in nodes:
+                # The matrix row is now the only copy of the vector
+                node.embedding = None
+            current._nodes.extend(nodes)
+
+            # Read each derived index once: a reader may build a missing one on `current` meanwhile, and
+            # that index stops at current.size, so it must not be carried into the new view
+            ann, lexical, metadata, row_ids = current._ann, current._lexical, current._metadata, current._row_ids
+            if ann is not None:
+                # New rows join the nearest existing list; train_ann retrains once the centroids are stale
+                ann = ann.extended(vectors)
+            if lexical is not None:
+                lexical.add(node.text for node in nodes)
+            if metadata is not None:
+                metadata.add(node.metadata for node in nodes)
+            if row_ids is not None:
+                for row, node in enumerate(nodes, start=start):
+                    row_ids[node.doc_id] = row
+            documents = dict(current._documents)
+            for node in nodes:
+                for location in self._locations(node.metadata):
+                    self._count_location(documents, location)
+            self._view = IndexView(
+                self, current._nodes, matrix, matrix_scales, end, documents,
+                ann=ann, lexical=lexical, metadata=metadata, row_ids=row_ids,
+            )
+
+    def add_duplicate_locations(self, references: Dict[str, List[Dict[str, Any]]]) -> int:
+        """Attach back-references (doc_id -> extra locations) to stored rows; returns how many were attached.
+
+        References to rows that have been removed in the meantime are dropped.
+        """
+        with self._write_lock:
+            current = self._view
+            row_ids = current.row_index()
+            nodes = self._copy_nodes(current)
+            metadata_index = current._metadata.copy() if current._metadata is not None else None
+            documents = dict(current._documents)
+            attached = 0
+            for doc_id, locations in references.items():
+                row = row_ids.get(doc_id)
+                if row is None or not locations:
+                    continue
+                node = nodes[row]
+                metadata = {**node.metadata, 'duplicates': node.metadata.get('duplicates', []) + list(locations)}
+                # Replaced rather than mutated: earlier views still hold the old node
+                nodes[row] = VectorStoreNode(doc_id=node.doc_id, text=node.text, embedding=None, metadata=metadata)
+                if metadata_index is not None:
+                    metadata_index.add_locations(row, locations)
+                for location in locations:
+                    self._count_location(documents, location)
+                attached += len(locations)
+            if attached:
+                self._view = IndexView(
+                    self, nodes, current._matrix, current._scales, current.size, documents,
+                    ann=current._ann, lexical=current._lexical, metadata=metadata_index, row_ids=row_ids,
+                )
+            return attached
+
+    def train_ann(self) -> bool:
+        """Train the IVF index if the store needs one and it is missing or stale; returns whether it trained.
+
+        Writers call this before publishing (VectorStoreRegistry.writing does,
+        for every change), so training runs at most once per publish, under
+        the write lock, while readers keep searching the previous view.
+        """
+        with self._write_lock:
+            current = self._view
+            if self.index_mode != "ivf" or current.size < self.ann_min_size:
+                return False
+            if current._ann is not None and current.size < current._ann.trained_size * self.ann_retrain_growth:
+                return False
+            ann = IVFIndex(nlist=self.ivf_nlist, nprobe=self.ivf_nprobe)
+            ann.train(current.embeddings)
+            self._view = IndexView(
+                self, current._nodes, current._matrix, current._scales, current.size, current._documents,
+                ann=ann, lexical=current._lexical, metadata=current._metadata, row_ids=current._row_ids,
+            )
+            return True
+
+    def update_document(self, document_id: str, **fields: Any) -> None:
+        """Record extra fields in a resident document's summary, e.g. its source file's content_hash."""
+        with self._write_lock:
+            current = self._view
+            if document_id not in current._documents:
+                return
+            documents = dict(current._documents)
+            documents[document_id] = {**documents[document_id], **fields}
+            self._view = IndexView(
+                self, current._nodes, current._matrix, current._scales, current.size, documents,
+                ann=current._ann, lexical=current._lexical, metadata=current._metadata, row_ids=current._row_ids,
+            )
+
+    def duplicate_index(self) -> DuplicateIndex:
+        """Content lookup over the stored rows, rebuilt from the node text after a snapshot load."""
+        if self._duplicates is None:
+            duplicates = DuplicateIndex(threshold=self.dedup_threshold)
+            for node in self._view.nodes():
+                duplicates.add(node.doc_id, node.text)
+            self._duplicates = duplicates
+            logger.info(f"Built duplicate index over {len(duplicates)} rows")
+        return self._duplicates
+
+    @staticmethod
+    def _locations(metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Every place a row's content occurs: its own location first, then its back-references."""
+        return [location_of(metadata)] + list(metadata.get('duplicates', []))
+
+    @staticmethod
+    def _count_location(documents: Dict[str, Dict[str, Any]], location: Dict[str, Any]) -> None:
+        """Count a location in a copied documents map; entries are replaced, never mutated."""
+        document_id = location.get('document_id')
+        if document_id is None:
+            return
+        entry = dict(documents.get(document_id) or {
+            "document_id": document_id,
+            "file_name": location.get('file_name'),
+            "chunks": 0,
+        })
+        entry["chunks"] += 1
+        documents[document_id] = entry
+
+    @staticmethod
+    def _copy_nodes(view: IndexView):
+        """A node list for a new view that can be changed without affecting the given one."""
+        if isinstance(view._nodes, SnapshotNodes):
+            return view._nodes.copy()
+        return view._nodes[:view.size]
+
+    def remove_document(self, document_id: str) -> int:
+        """Remove every location of one document and return how many were removed.
+
+        Rows only referenced by this document are dropped. Rows that other
+        documents still reference are kept, and the first remaining location
+        becomes the row's own.
+        """
+        with self._write_lock:
+            current = self._view
+            if document_id not in current._documents:
+                return 0
+
+            nodes = self._copy_nodes(current)
+            keep = np.ones(current.size, dtype=bool)
+            removed = 0
+            dropped_ids = []
+            relocated = False
+            for row in range(current.size):
+                node = nodes[row]
+                if node.metadata.get('document_id') != document_id and not node.metadata.get('duplicates'):
+                    continue
+                locations = self._locations(node.metadata)
+                remaining = [location for location in locations if location.get('document_id') != document_id]
+                if len(remaining) == len(locations):
+                    continue
+                removed += len(locations) - len(remaining)
+                if not remaining:
+                    keep[row] = False
+                    dropped_ids.append(node.doc_id)
+                    continue
+                metadata = {k: v for k, v in node.metadata.items() if k not in LOCATION_FIELDS and k != 'duplicates'}
+                metadata.update(remaining[0])
+                if len(remaining) > 1:
+                    metadata['duplicates'] = remaining[1:]
+                nodes[row] = VectorStoreNode(doc_id=node.doc_id, text=node.text, embedding=None, metadata=metadata)
+                relocated = True
+            kept_indices = np.flatnonzero(keep)
+
+            # Surviving rows are copied to the front of a new matrix; readers of the old view keep the old one
+            matrix = np.zeros(current._matrix.shape, dtype=current._matrix.dtype)
+            matrix[:len(kept_indices)] = current._matrix[kept_indices]
+            scales = None
+            if current._scales is not None:
+                scales = np.ones(current._scales.shape, dtype=np.float32)
+                scales[:len(kept_indices)] = current._scales[kept_indices]
+            metadata_index = None
+            # Relocated rows changed their indexed fields, so rebuild rather than compact
+            if current._metadata is not None and not relocated:
+                metadata_index = current._metadata.compacted(kept_indices)
+            documents = {key: entry for key, entry in current._documents.items() if key != document_id}
+            self._view = IndexView(
+                self, [nodes[i] for i in kept_indices], matrix, scales, len(kept_indices), documents,
+                ann=current._ann.compacted(kept_indices) if current._ann is not None else None,
+                lexical=current._lexical.compacted(kept_indices) if current._lexical is not None else None,
+                metadata=metadata_index,
+            )
+            if self._duplicates is not None:
+                self._duplicates.remove(dropped_ids)
+            return removed
+
+    def _quantize(self, vectors: np.ndarray):
+        """Convert normalized float32 rows to the storage dtype; returns (rows, scales or None)."""
+        if self.precision == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(PRECISION_DTYPES[self.precision]), None
+
     def clear(self) -> None:
         """Clear all nodes from the vector store."""
-        self.nodes = []
-    
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calculate cosine similarity between two vectors."""
-        # Convert to numpy arrays for easier computation
-        a = np.array(vec1)
-        b = np.array(vec2)
-        
-        # Calculate cosine similarity
-        dot_product = np.dot(a, b)
-        norm_a = np.linalg.norm(a)
-        norm_b = np.linalg.norm(b)
-        
-        if norm_a == 0 or norm_b == 0:
-            return 0.0
-        
-        return dot_product / (norm_a * norm_b)
+        with self._write_lock:
+            self._view = self._empty_view()
+            self._duplicates = DuplicateIndex(threshold=self.dedup_threshold)
+
+    def save(self, directory: Path) -> None:
+        """Snapshot the store to disk; see utils.snapshot for the versioned, crash-safe layout."""
+        view = self._view
+        matrix = view._matrix[:view.size] if view._matrix is not None else np.empty((0, 0), dtype=np.float32)
+        scales = view._scales[:view.size] if view._scales is not None else None
+        ivf = (view._ann.centroids, view._ann.labels, view._ann.trained_size) if view._ann is not None else None
+        write_snapshot(directory, matrix, view.node_records(), view.list_documents(), scales=scales, ivf=ivf)
+
+    def load(self, directory: Path) -> None:
+        """Replace the store contents with the latest snapshot, memory-mapped rather than parsed."""
+        matrix, scales, nodes, documents, ivf = open_snapshot(directory, self._snapshot_node)
+        stored_precision = np.dtype(matrix.dtype).name
+        if stored_precision != self.precision:
+            # The snapshot predates a precision change: convert once, in memory
+            logger.info(f"Converting snapshot from {stored_precision} to {self.precision}")
+            vectors = matrix.astype(np.float32)
+            if scales is not None:
+                vectors *= scales[:, None]
+            matrix, scales = self._quantize(vectors)
+        ann = None
+        if ivf is not None and self.index_mode == "ivf":
+            centroids, labels, trained_size = ivf
+            ann = IVFIndex.restored(centroids, labels, trained_size, nprobe=self.ivf_nprobe)
+        with self._write_lock:
+            # The IVF index comes from the snapshot; the other derived indexes are rebuilt on first use
+            self._view = IndexView(
+                self, nodes, matrix, scales, len(nodes),
+                {entry["document_id"]: dict(entry) for entry in documents}, ann=ann,
+            )
+            self._duplicates = None
+
+    def replace(
+        self,
+        nodes: List[VectorStoreNode],
+        vectors: np.ndarray,
+        ivf: Optional[Tuple[np.ndarray, int]] = None,
+        documents: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        """Replace the store contents with these rows in a single publish, as load() does.
+
+        ivf is (centroids, trained_size) of the IVF index the publishing
+        writer trained; the rows are assigned to those centroids rather than
+        training new ones. documents are the publisher's document summaries,
+        kept as they are (fields from update_document included), as load()
+        keeps a snapshot's; by default they are counted from the rows.
+        """
+        staged = SimpleInMemoryVectorStore(
+            index_mode=self.index_mode,
+            ann_min_size=self.ann_min_size,
+            ivf_nlist=self.ivf_nlist,
+            ivf_nprobe=self.ivf_nprobe,
+            precision=self.precision,
+            dedup_threshold=self.dedup_threshold,
+        )
+        staged.add_nodes(nodes, vectors)
+        view = staged.view()
+        ann = None
+        if ivf is not None and self.index_mode == "ivf" and view.size:
+            centroids, trained_size = ivf
+            # Extending an index with no rows assigns every row to its list
+            ann = IVFIndex.restored(centroids, np.empty(0, dtype=np.int32), trained_size, nprobe=self.ivf_nprobe)
+            ann = ann.extended(view.embeddings)
+        if documents is not None:
+            documents = {entry["document_id"]: dict(entry) for entry in documents}
+        with self._write_lock:
+            self._view = IndexView(
+                self, view._nodes, view._matrix, view._scales, view.size,
+                view._documents if documents is None else documents,
+                ann=ann, lexical=view._lexical, metadata=view._metadata, row_ids=view._row_ids,
+            )
+            self._duplicates = None
+
+    def _snapshot_node(self, index: int, record: Dict[str, Any]) -> VectorStoreNode:
+        """Materialize a snapshot row on demand."""
+        return VectorStoreNode(
+            doc_id=record["doc_id"],
+            text=record["text"],
+            embedding=None,
+            metadata=record["metadata"],
+        )
+
+    def _reserve(self, view: IndexView, rows: int, dimension: int):
+        """(matrix, scales) that can hold at least `rows` rows, starting with the view's rows.
+
+        The view's own arrays are returned when they have room; otherwise the
+        rows are copied into new, geometrically larger arrays.
+        """
+        dtype = PRECISION_DTYPES[self.precision]
+        if view._matrix is None:
+            capacity = max(self.initial_capacity, rows)
+            scales = np.ones(capacity, dtype=np.float32) if self.precision == "int8" else None
+            return np.zeros((capacity, dimension), dtype=dtype), scales
+
+        if dimension != view._matrix.shape[1]:
+            raise ValueError(
+                f"Embedding dimension mismatch: store holds {view._matrix.shape[1]}, got {dimension}"
+            )
+
+        capacity = view._matrix.shape[0]
+        if rows <= capacity and not isinstance(view._matrix, np.memmap):
+            return view._matrix, view._scales
+        # A mapped snapshot is sized exactly, so any growth moves it into an in-memory matrix
+        capacity = max(capacity, self.initial_capacity)
+        while capacity < rows:
+            capacity *= self.growth_factor
+        grown = np.zeros((capacity, dimension), dtype=dtype)
+        grown[:view.size] = view._matrix[:view.size]
+        grown_scales = None
+        if self.precision == "int8":
+            grown_scales = np.ones(capacity, dtype=np.float32)
+            grown_scales[:view.size] = view._scales[:view.size]
+        return grown, grown_scales
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalize a vector or each row of a matrix; zero vectors stay zero."""
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
 
 class VectorStoreManager:
-    def __init__(self, openai_api_key: str = None):
-        self.embedding_model = OpenAIEmbedding(api_key=openai_api_key)
-        self.vector_store = SimpleInMemoryVectorStore()
-        logger.info("Initialized custom SimpleInMemoryVectorStore")
+    def __init__(
+        self,
+        openai_api_key: str = None,
+        embed_batch_size: int = 100,
+        max_concurrent_batches: int = 4,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        http_client: Optional[httpx.Client] = None,
+        async_http_client: Optional[httpx.AsyncClient] = None,
+        index_mode: str = "exact",
+        ann_min_size: int = 5000,
+        ivf_nlist: Optional[int] = None,
+        ivf_nprobe: int = 8,
+        precision: str = "float32",
+        search_mode: str = "dense",
+        rrf_k: int = 60,
+        dedup_threshold: Optional[float] = 1.0,
+        embedding_model_name: str = "text-embedding-ada-002",
+    ):
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {search_mode}")
+        self.search_mode = search_mode
+        # Reciprocal rank fusion constant: larger values flatten the advantage of top ranks
+        self.rrf_k = rrf_k
+        # Estimated Jaccard similarity at which a chunk is stored as a back-reference; 1.0 (the default)
+        # only merges exact copies, lower values also merge near-duplicates, None disables dedup
+        self.dedup_threshold = dedup_threshold
+        self.embed_batch_size = embed_batch_size
+        # Known without building the model, so cache keys never import llama_index
+        self.embedding_model_name = embedding_model_name
+        # Looked up per call so a rebuilt embedding model is picked up automatically
+        self.embedder = BatchEmbedder(
+            lambda batch: self.embedding_model.get_text_embedding_batch(batch),
+            batch_size=embed_batch_size,
+            max_concurrency=max_concurrent_batches,
+        )
+        self.use_http_clients(openai_api_key, http_client, async_http_client)
+        self.embedding_cache = embedding_cache
+        self.vector_store = SimpleInMemoryVectorStore(
+            index_mode=index_mode,
+            ann_min_size=ann_min_size,
+            ivf_nlist=ivf_nlist,
+            ivf_nprobe=ivf_nprobe,
+            precision=precision,
+            dedup_threshold=dedup_threshold if dedup_threshold is not None else 1.0,
+        )
+        logger.info(f"Initialized custom SimpleInMemoryVectorStore ({index_mode} index, {precision})")
+
+    def use_http_clients(
+        self,
+        openai_api_key: str,
+        http_client: Optional[httpx.Client],
+        async_http_client: Optional[httpx.AsyncClient],
+    ) -> None:
+        """Move the embedding model onto shared HTTP clients so calls reuse warm keep-alive connections."""
+        self.http_client = http_client
+        self.async_http_client = async_http_client
+        self._openai_api_key = openai_api_key
+        self._embedding_model: Optional["OpenAIEmbedding"] = None
+
+    @property
+    def embedding_model(self) -> "OpenAIEmbedding":
+        """OpenAIEmbedding on the current HTTP clients, built on first use."""
+        model = self._embedding_model
+        if model is None:
+            from llama_index.embeddings.openai import OpenAIEmbedding
+            model = self._embedding_model = OpenAIEmbedding(
+                model=self.embedding_model_name,
+                api_key=self._openai_api_key,
+                embed_batch_size=self.embed_batch_size,
+                http_client=self.http_client,
+                async_http_client=self.async_http_client,
+            )
+        return model
 
-    def add_documents(self, documents: List[Document]) -> None:
-        """Add documents to the vector store."""
+    def embed_texts(self, texts: List[str], report: Optional[IngestionReport] = None) -> List[List[float]]:
+        """Embed texts, serving cached vectors first and only sending misses to OpenAI."""
+        report = report if report is not None else IngestionReport()
+        if self.embedding_cache is None:
+            return self.embedder.embed(texts, report)
+
+        model_name = self.embedding_model_name
+        embeddings = self.embedding_cache.get_many(model_name, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        report.add(cache_hits=len(texts) - len(missing))
+
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            fresh = self.embedder.embed(missing_texts, report)
+            self.embedding_cache.put_many(model_name, missing_texts, fresh)
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+        return embeddings
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a single query string, consulting the cache first."""
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(self.embedding_model_name, query)
+            if cached is not None:
+                return cached
+        embedding = self.embedding_model.get_text_embedding(query)
+        if self.embedding_cache is not None:
+            self.embedding_cache.put(self.embedding_model_name, query, embedding)
+        return embedding
+
+    def add_documents(self, documents: List["Document"], document_id: Optional[str] = None) -> IngestionReport:
+        """Add documents to the vector store and return embedding throughput.
+
+        When document_id is given it is stamped on every chunk's metadata so the
+        whole document can later be listed or removed as a unit.
+        """
+        return self.add_document_stream(documents, document_id=document_id)
+
+    def add_document_stream(
+        self,
+        documents: Iterable["Document"],
+        document_id: Optional[str] = None,
+        queue_size: int = 4,
+        report: Optional[IngestionReport] = None,
+    ) -> IngestionReport:
+        """Embed and index a stream of chunks as they are produced.
+
+        A producer thread groups incoming chunks into embedding batches and
+        hands them over through a bounded queue. Batches are embedded
+        concurrently and indexed in order as each completes, so chunks become
+        searchable immediately and memory stays flat however long the stream is.
+        Chunks that duplicate a stored or earlier chunk (exactly, or nearly by
+        MinHash) are never embedded; their locations are attached to the
+        existing row as back-references once the stream completes.
+        Pass a report to watch progress while the stream is running.
+        """
+        report = report if report is not None else IngestionReport()
+        start = time.perf_counter()
+        batches: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        done = object()
+        # Set when the consumer gives up, so the producer stops parsing instead of finishing the stream
+        stop = threading.Event()
+        producer_errors: List[BaseException] = []
+        duplicates = self.vector_store.duplicate_index() if self.dedup_threshold is not None else None
+        # Chunks of this stream that are queued but not yet stored; the store's index only learns
+        # a chunk once its row exists, so a failed stream leaves nothing behind for later copies to match
+        pending = duplicates.empty_copy() if duplicates is not None else None
+        # canonical doc_id -> locations of its duplicates in this stream
+        references: Dict[str, List[Dict[str, Any]]] = {}
+        registered: List[str] = []
+
+        def put(item) -> bool:
+            """Hand an item to the consumer; False once ingestion has been cancelled."""
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                batch = []
+                for doc in documents:
+                    if stop.is_set():
+                        return
+                    metadata = dict(getattr(doc, 'metadata', {}))
+                    if document_id is not None:
+                        metadata['document_id'] = document_id
+                    if duplicates is not None:
+                        canonical = duplicates.find(doc.text) or pending.find(doc.text)
+                        if canonical is not None:
+                            references.setdefault(canonical, []).append(location_of(metadata))
+                            report.add(duplicates=1)
+                            continue
+                    index = len(registered)
+                    doc_id = f"{document_id}_{index}" if document_id is not None else f"doc_{index}_{id(doc)}"
+                    registered.append(doc_id)
+                    if pending is not None:
+                        # Later copies in this stream match it before it is embedded and stored
+                        pending.add(doc_id, doc.text)
+                    batch.append((doc_id, doc.text, metadata))
+                    if len(batch) >= self.embed_batch_size:
+                        if not put(batch):
+                            return
+                        batch = []
+                if batch:
+                    put(batch)
+            except BaseException as e:
+                producer_errors.append(e)
+            finally:
+                put(done)
+
+        producer = threading.Thread(target=produce, name="ingest-producer", daemon=True)
+        producer.start()
+
+        def stop_producer() -> None:
+            stop.set()
+            producer.join()
+        indexed = 0
         try:
-            nodes = []
-            for i, doc in enumerate(documents):
-                # Get embedding for the document
-                embedding = self.embedding_model.get_text_embedding(doc.text)
-                
-                # Create a vector store node
-                node = VectorStoreNode(
-                    doc_id=f"doc_{i}_{id(doc)}",
-                    text=doc.text,
-                    embedding=embedding,
-                    metadata=getattr(doc, 'metadata', {})
-                )
-                nodes.append(node)
-            
-            self.vector_store.add_nodes(nodes)
-            logger.info(f"Added {len(documents)} documents to vector store")
+            with ThreadPoolExecutor(max_workers=self.embedder.max_concurrency) as pool:
+                in_flight: "deque" = deque()
+                while True:
+                    batch = batches.get()
+                    if batch is done:
+                        break
+                    in_flight.append((batch, pool.submit(self.embed_texts, [text for _, text, _ in batch], report)))
+                    if len(in_flight) >= self.embedder.max_concurrency:
+                        indexed += self._index_batch(*in_flight.popleft(), duplicates, report)
+                while in_flight:
+                    indexed += self._index_batch(*in_flight.popleft(), duplicates, report)
+            if producer_errors:
+                raise producer_errors[0]
+            self.vector_store.add_duplicate_locations(references)
+
+            # Concurrent batches overlap, so report wall-clock time for the whole stream
+            report.seconds = time.perf_counter() - start
+            logger.info(
+                f"Added {indexed} documents to vector store: "
+                f"{report.batches} batches, {report.retries} retries, {report.cache_hits} cache hits, "
+                f"{report.duplicates} duplicates, {report.chunks_per_second:.1f} chunks/s"
+            )
+            return report
 
         except Exception as e:
             logger.error(f"Error adding documents to vector store: {str(e)}", exc_info=True)
+            # The producer must be finished before cleanup, or it keeps registering chunks afterwards
+            stop_producer()
+            if document_id is not None:
+                # Don't leave a half-indexed document behind; this also unregisters its stored rows
+                self.vector_store.remove_document(document_id)
             raise
+        finally:
+            # Also covers cancellation (BaseException), which skips the except block
+            stop_producer()
+
+    def _index_batch(
+        self,
+        batch: List[Tuple[str, str, Dict[str, Any]]],
+        future,
+        duplicates: Optional[DuplicateIndex] = None,
+        report: Optional[IngestionReport] = None,
+    ) -> int:
+        """Wait for a batch's embeddings, add its (doc_id, text, metadata) chunks and register them for dedup."""
+        embeddings = future.result()
+        nodes = []
+        for (doc_id, text, metadata), embedding in zip(batch, embeddings):
+            # Create a vector store node
+            node = VectorStoreNode(
+                doc_id=doc_id,
+                text=text,
+                embedding=embedding,
+                metadata=metadata
+            )
+            nodes.append(node)
+        self.vector_store.add_nodes(nodes)
+        if duplicates is not None:
+            for node in nodes:
+                duplicates.add(node.doc_id, node.text)
+        if report is not None:
+            report.add(indexed=len(nodes))
+        return len(nodes)
 
-    def search(self, query: str, limit: int = 5, score_threshold: float = 0.5) -> List[Dict[str, Any]]:
-        """Search the vector store for similar documents."""
+    async def aembed_query(self, query: str) -> List[float]:
+        """Async variant of embed_query that never blocks the event loop."""
+        model_name = self.embedding_model_name
+        if self.embedding_cache is not None:
+            cached = await asyncio.to_thread(self.embedding_cache.get, model_name, query)
+            if cached is not None:
+                return cached
+        model = self._embedding_model
+        if model is None:
+            # Building it imports llama_index, which would stall every request on the loop
+            model = await asyncio.to_thread(lambda: self.embedding_model)
+        embedding = await model.aget_text_embedding(query)
+        if self.embedding_cache is not None:
+            await asyncio.to_thread(self.embedding_cache.put, model_name, query, embedding)
+        return embedding
+
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        score_threshold: float = 0.5,
+        mode: Optional[str] = None,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[Dict[str, Any]]:
+        """Search the vector store for similar documents.
+
+        mode is "dense" (cosine), "lexical" (BM25, no embedding call) or
+        "hybrid" (both, fused by reciprocal rank); defaults to self.search_mode.
+        score_threshold applies to cosine scores only. filters restricts the
+        candidates before any scoring.
+        """
+        mode = self._resolve_mode(mode)
         try:
+            if mode == "lexical":
+                return self._results(self._search_lexical(self.vector_store.view(), query, limit, filters))
             # Compute embedding for the query string
-            query_embedding = self.embedding_model.get_text_embedding(query)
-            
-            # Search vector store
-            results = self.vector_store.query(query_embedding, top_k=limit)
-
-            # Filter by score threshold and format results
-            filtered_results = []
-            for node in results:
-                if node.score >= score_threshold:
-                    filtered_results.append({
-                        'text': node.text,
-                        'score': float(node.score),
-                        'metadata': node.metadata
-                    })
-
-            return filtered_results
+            query_embedding = self.embed_query(query)
+            view = self.vector_store.view()
+            if mode == "hybrid":
+                return self._results(self._search_hybrid(view, query, query_embedding, limit, score_threshold, filters))
+            return self._results(self._search_by_embedding(view, query_embedding, limit, score_threshold, filters))
+        except Exception as e:
+            logger.error(f"Error searching vector store: {str(e)}", exc_info=True)
+            raise
+
+    async def asearch(
+        self,
+        query: str,
+        limit: int = 5,
+        score_threshold: float = 0.5,
+        mode: Optional[str] = None,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[Dict[str, Any]]:
+        """Async search: awaits the query embedding and scores in a worker thread."""
+        ranked, _, _ = await self._asearch(query, limit, score_threshold, mode, filters)
+        return self._results(ranked)
+
+    async def _asearch(
+        self,
+        query: str,
+        limit: int,
+        score_threshold: float,
+        mode: Optional[str],
+        filters: Optional[MetadataFilter],
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], IndexView, Optional[List[float]]]:
+        """asearch() results as (row, result) pairs, the view whose rows they are, and the
+        query embedding they were scored with (None for lexical search)."""
+        mode = self._resolve_mode(mode)
+        try:
+            if mode == "lexical":
+                view = self.vector_store.view()
+                return await asyncio.to_thread(self._search_lexical, view, query, limit, filters), view, None
+            query_embedding = await self.aembed_query(query)
+            view = self.vector_store.view()
+            if mode == "hybrid":
+                ranked = await asyncio.to_thread(
+                    self._search_hybrid, view, query, query_embedding, limit, score_threshold, filters
+                )
+            else:
+                ranked = await asyncio.to_thread(
+                    self._search_by_embedding, view, query_embedding, limit, score_threshold, filters
+                )
+            return ranked, view, query_embedding
         except Exception as e:
             logger.error(f"Error searching vector store: {str(e)}", exc_info=True)
             raise
 
+    async def apack_context(
+        self,
+        query: str,
+        packer: ContextPacker,
+        candidates: int = 20,
+        score_threshold: float = 0.5,
+        mode: Optional[str] = None,
+        filters: Optional[MetadataFilter] = None,
+    ) -> Tuple[List[ContextPassage], Optional[List[float]]]:
+        """Retrieve up to `candidates` chunks and pack them into the packer's token budget.
+
+        Returns the passages and the query embedding, so callers can reuse it.
+        The query is embedded once, by the search; lexical search never embeds
+        it (the embedding is None), so its results are packed in BM25 order
+        without MMR. MMR reads the candidates' vectors from the rows of the
+        view they were found in.
+        """
+        ranked, view, query_embedding = await self._asearch(query, candidates, score_threshold, mode, filters)
+        if not ranked:
+            return [], query_embedding
+        results = self._results(ranked)
+        if query_embedding is None:
+            return packer.pack(results), None
+        query_vector = SimpleInMemoryVectorStore._normalize(np.asarray(query_embedding, dtype=np.float32))
+        vectors = view.vectors([row for row, _ in ranked])
+        return packer.pack(results, query_vector, vectors), query_embedding
+
+    def _resolve_mode(self, mode: Optional[str]) -> str:
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        return mode
+
+    @staticmethod
+    def _results(ranked: List[Tuple[int, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        return [result for _, result in ranked]
+
+    def _result(
+        self, view: IndexView, row: int, score: float, filters: Optional[MetadataFilter]
+    ) -> Tuple[int, Dict[str, Any]]:
+        node = view._nodes[row]
+        return row, {'id': node.doc_id, 'text': node.text, 'score': score, 'metadata': self._result_metadata(node, filters)}
+
+    def _search_lexical(
+        self, view: IndexView, query: str, limit: int, filters: Optional[MetadataFilter] = None
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """BM25 results as (row, result) pairs; 'score' is the raw BM25 score, so no cosine threshold applies."""
+        rows = view.filter_rows(filters)
+        return [self._result(view, row, score, filters) for row, score in view.rank_text(query, top_k=limit, rows=rows)]
+
+    def _search_hybrid(
+        self,
+        view: IndexView,
+        query: str,
+        query_embedding: List[float],
+        limit: int,
+        score_threshold: float,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """Fuse cosine and BM25 rankings with reciprocal rank fusion; (row, result) pairs.
+
+        Each list is read deeper than limit so a chunk ranked moderately by
+        both retrievers can overtake one ranked highly by just one of them.
+        'score' is the fused RRF score; the per-retriever scores are included
+        alongside it. Dense hits below score_threshold do not contribute.
+        """
+        rows = view.filter_rows(filters)
+        dense = view.rank(query_embedding, top_k=self._hybrid_depth(limit), rows=rows)
+        return self._fuse(view, dense, query, limit, score_threshold, rows, filters)
+
+    @staticmethod
+    def _hybrid_depth(limit: int) -> int:
+        return max(limit * 4, 20)
+
+    def _fuse(
+        self,
+        view: IndexView,
+        dense: List[Tuple[int, float]],
+        query: str,
+        limit: int,
+        score_threshold: float,
+        rows: Optional[np.ndarray],
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """Reciprocal rank fusion of a dense (row, score) ranking with the query's BM25 ranking."""
+        fused: Dict[int, Dict[str, Any]] = {}
+
+        def contribute(ranking: List[Tuple[int, float]], field: str) -> None:
+            for rank, (row, score) in enumerate(ranking):
+                entry = fused.get(row)
+                if entry is None:
+                    _, entry = self._result(view, row, 0.0, filters)
+                    entry.update({'dense_score': None, 'lexical_score': None})
+                    fused[row] = entry
+                entry[field] = float(score)
+                entry['score'] += 1.0 / (self.rrf_k + rank + 1)
+
+        contribute([(row, score) for row, score in dense if score >= score_threshold], 'dense_score')
+        contribute(view.rank_text(query, top_k=self._hybrid_depth(limit), rows=rows), 'lexical_score')
+        return sorted(fused.items(), key=lambda item: item[1]['score'], reverse=True)[:limit]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        limit: int = 5,
+        score_threshold: float = 0.5,
+        mode: Optional[str] = None,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Search for many queries at once; returns one result list per query, as search() would.
+
+        Dense and hybrid modes embed every query in one batched request (cached
+        queries are not re-embedded) and score them all with one matrix-matrix
+        product against the store. Batched dense scoring is always exact.
+        """
+        mode = self._resolve_mode(mode)
+        if not queries:
+            return []
+        view = self.vector_store.view()
+        if mode == "lexical":
+            return [self._results(self._search_lexical(view, query, limit, filters)) for query in queries]
+
+        embeddings = self.embed_texts(queries)
+        rows = view.filter_rows(filters)
+        depth = self._hybrid_depth(limit) if mode == "hybrid" else limit
+        rankings = view.rank_many(embeddings, top_k=depth, rows=rows)
+        if mode == "hybrid":
+            return [
+                self._results(self._fuse(view, ranking, query, limit, score_threshold, rows, filters))
+                for query, ranking in zip(queries, rankings)
+            ]
+        return [
+            [self._result(view, row, score, filters)[1] for row, score in ranking if score >= score_threshold]
+            for ranking in rankings
+        ]
+
+    async def asearch_batch(
+        self,
+        queries: List[str],
+        limit: int = 5,
+        score_threshold: float = 0.5,
+        mode: Optional[str] = None,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Async search_batch: embedding and scoring run in a worker thread."""
+        try:
+            return await asyncio.to_thread(self.search_batch, queries, limit, score_threshold, mode, filters)
+        except Exception as e:
+            logger.error(f"Error running batch search: {str(e)}", exc_info=True)
+            raise
+
+    def _search_by_embedding(
+        self,
+        view: IndexView,
+        query_embedding: List[float],
+        limit: int,
+        score_threshold: float,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """Score a view against an embedding and format results above the threshold as (row, result) pairs."""
+        # Search vector store, scoring only the rows that pass the filters
+        rows = view.filter_rows(filters)
+        results = view.rank(query_embedding, top_k=limit, rows=rows)
+
+        # Filter by score threshold and format results
+        return [self._result(view, row, score, filters) for row, score in results if score >= score_threshold]
+
+    @staticmethod
+    def _result_metadata(node: VectorStoreNode, filters: Optional[MetadataFilter]) -> Dict[str, Any]:
+        """The node's metadata, led by the first of its locations that satisfies the filters.
+
+        A row stored once for several locations matches a filter through one
+        of them; that location becomes the result's own, and the others
+        (the row's own location included) are listed in 'duplicates'.
+        """
+        if filters is None or filters.is_empty:
+            return node.metadata
+        locations = SimpleInMemoryVectorStore._locations(node.metadata)
+        matched = next((i for i, location in enumerate(locations) if filters.matches_location(location)), 0)
+        if matched == 0:
+            return node.metadata
+        metadata = {k: v for k, v in node.metadata.items() if k not in LOCATION_FIELDS and k != 'duplicates'}
+        metadata.update(locations[matched])
+        metadata['duplicates'] = locations[:matched] + locations[matched + 1:]
+        return metadata
+
     def get_collection_info(self) -> Dict[str, Any]:
         """Get information about the vector store."""
         return {
             "status": "active",
             "type": "SimpleInMemoryVectorStore",
-            "document_count": len(self.vector_store.nodes),
+            "index_mode": self.vector_store.index_mode,
+            "search_mode": self.search_mode,
+            "precision": self.vector_store.precision,
+            "index_memory_bytes": self.vector_store.index_bytes(),
+            "document_count": len(self.vector_store),
+            "documents": self.vector_store.list_documents(),
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None,
             "message": "Custom in-memory vector store is active"
         }
 
+    def export_document(self, document_id: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Chunk records (text and metadata, minus document_id) and vectors for one document."""
+        nodes, vectors = self.vector_store.export_document(document_id)
+        records = [
+            {"text": node.text, "metadata": {k: v for k, v in node.metadata.items() if k != 'document_id'}}
+            for node in nodes
+        ]
+        return records, vectors
+
+    def restore_document(
+        self,
+        records: List[Dict[str, Any]],
+        vectors: np.ndarray,
+        document_id: str,
+        file_name: Optional[str] = None,
+        report: Optional[IngestionReport] = None,
+    ) -> int:
+        """Index previously exported chunks and vectors under a new document id, without embedding.
+
+        Chunks are deduplicated against the store exactly as during ingestion,
+        and counted in report the same way. Returns the number of chunks
+        restored, back-references included.
+        """
+        duplicates = self.vector_store.duplicate_index() if self.dedup_threshold is not None else None
+        pending = duplicates.empty_copy() if duplicates is not None else None
+        nodes, rows = [], []
+        references: Dict[str, List[Dict[str, Any]]] = {}
+        for i, record in enumerate(records):
+            metadata = {**record["metadata"], 'document_id': document_id}
+            if file_name is not None:
+                metadata['file_name'] = file_name
+            if duplicates is not None:
+                canonical = duplicates.find(record["text"]) or pending.find(record["text"])
+                if canonical is not None:
+                    references.setdefault(canonical, []).append(location_of(metadata))
+                    continue
+            doc_id = f"{document_id}_{len(nodes)}"
+            if pending is not None:
+                pending.add(doc_id, record["text"])
+            nodes.append(VectorStoreNode(doc_id=doc_id, text=record["text"], embedding=None, metadata=metadata))
+            rows.append(i)
+        if nodes:
+            self.vector_store.add_nodes(nodes, np.asarray(vectors)[rows])
+            if duplicates is not None:
+                for node in nodes:
+                    duplicates.add(node.doc_id, node.text)
+        self.vector_store.add_duplicate_locations(references)
+        if report is not None:
+            report.add(indexed=len(nodes), duplicates=len(records) - len(nodes))
+        logger.info(
+            f"Restored document {document_id} from artifact: {len(nodes)} chunks, "
+            f"{len(records) - len(nodes)} duplicates"
+        )
+        return len(records)
+
+    @property
+    def collection_version(self) -> str:
+        """Opaque token that changes whenever the collection's contents change."""
+        return self.vector_store.version
+
+    def list_documents(self) -> List[Dict[str, Any]]:
+        """List the documents held in the vector store."""
+        return self.vector_store.list_documents()
+
+    def update_document(self, document_id: str, **fields: Any) -> None:
+        """Record extra fields in a document's summary, as returned by list_documents()."""
+        self.vector_store.update_document(document_id, **fields)
+
+    def remove_document(self, document_id: str) -> bool:
+        """Remove one document's chunks; returns False if the document is unknown."""
+        removed = self.vector_store.remove_document(document_id)
+        if removed:
+            logger.info(f"Removed document {document_id} ({removed} chunk locations) from vector store")
+        return removed > 0
+
     def delete_collection(self) -> bool:
         """Clear the vector store."""
         try:
@@ -1,8 +1,28 @@
-import { useCallback } from 'react';
+import { useCallback, useState } from 'react';
 import { useDropzone } from 'react-dropzone';
 import { ArrowUpTrayIcon } from '@heroicons/react/24/outline';
-import { uploadFile } from '@/lib/api';
+import { uploadFile, getJob } from '@/lib/api';
 import { useAppContext } from '@/contexts/AppContext';
+import { JobStatus } from '@/types';
+
+const JOB_POLL_INTERVAL_MS = 1000;
+
+const describeProgress = (job: JobStatus): string => {
+  switch (job.stage) {
+    case 'queued':
+      return 'Waiting for an ingestion worker...';
+    case 'parsing':
+      return `Parsing PDF (${job.pages_parsed} pages)...`;
+    case 'restoring':
+      return 'Restoring previously processed copy of this file...';
+    case 'embedding':
+      return `Embedding: ${job.pages_parsed} pages parsed, ${job.chunks_total} chunks processed, ${job.chunks_embedded} newly embedded (${job.chunks_per_second.toFixed(1)} chunks/s)...`;
+    case 'persisting':
+      return 'Saving index...';
+    default:
+      return 'Processing...';
+  }
+};
 
 export default function FileUpload() {
   const {
@@ -16,6 +36,23 @@ export default function FileUpload() {
     uploadSuccessMessage,
     setUploadSuccessMessage
   } = useAppContext();
+  const [progressMessage, setProgressMessage] = useState<string | null>(null);
+
+  // Poll the ingestion job until it completes or fails
+  const waitForJob = useCallback(async (jobId: string): Promise<JobStatus> => {
+    for (;;) {
+      const response = await getJob(jobId);
+      if (response.error || !response.data) {
+        throw new Error(response.error || 'Failed to fetch upload status');
+      }
+      const job = response.data;
+      if (job.stage === 'completed' || job.stage === 'failed') {
+        return job;
+      }
+      setProgressMessage(describeProgress(job));
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+  }, []);
 
   const onDrop = useCallback(async (acceptedFiles: File[]) => {
     const file = acceptedFiles[0];
@@ -43,17 +80,25 @@ export default function FileUpload() {
         }
         setUploadedFileName(null);
       } else if (response.data) {
-        setUploadSuccessMessage(`Successfully uploaded ${response.data.filename} (${response.data.chunks} chunks)`);
-        setUploadedFileName(response.data.filename);
-        setUploadError(null);
+        setProgressMessage('Queued for processing...');
+        const job = await waitForJob(response.data.job_id);
+        if (job.stage === 'failed') {
+          setUploadError(job.error || 'Failed to process file');
+          setUploadedFileName(null);
+        } else {
+          setUploadSuccessMessage(`Successfully uploaded ${job.filename} (${job.chunks_total} chunks)`);
+          setUploadedFileName(job.filename);
+          setUploadError(null);
+        }
       }
     } catch {
       setUploadError('Failed to upload file');
       setUploadedFileName(null);
     } finally {
       setIsUploading(false);
+      setProgressMessage(null);
     }
-  }, [setUploadedFileName, setIsUploading, setUploadError, setUploadSuccessMessage]);
+  }, [setUploadedFileName, setIsUploading, setUploadError, setUploadSuccessMessage, waitForJob]);
 
   const { getRootProps, getInputProps, isDragActive } = useDropzone({
     onDrop,
@@ -78,7 +123,7 @@ export default function FileUpload() {
             : 'Drag and drop a PDF file here, or click to select'}
         </p>
         {isUploading && (
-          <p className="mt-2 text-sm text-blue-600">Uploading...</p>
+          <p className="mt-2 text-sm text-blue-600">{progressMessage || 'Uploading...'}</p>
         )}
         {uploadError && (
           <p className="mt-2 text-sm text-red-600">{uploadError}</p>
@@ -1,6 +1,6 @@
 import axios from 'axios';
 // eslint-disable-next-line @typescript-eslint/no-unused-vars
-import { ApiResponse, ChatRequest, QueryRequest, QueryResult, UploadResponse, ApiQueryResponse } from '@/types';
+import { ApiResponse, ChatRequest, QueryRequest, QueryResult, UploadResponse, ApiQueryResponse, BatchQueryRequest, ApiBatchQueryResponse, DocumentSummary, JobStatus } from '@/types';
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
@@ -52,6 +52,21 @@ export const uploadFile = async (file: File): Promise<ApiResponse<UploadResponse
   }
 };
 
+export const getJob = async (jobId: string): Promise<ApiResponse<JobStatus>> => {
+  try {
+    const response = await api.get<JobStatus>(`/api/jobs/${encodeURIComponent(jobId)}`);
+    return { data: response.data };
+  } catch (error: unknown) {
+    let message = 'Failed to fetch upload status';
+    if (axios.isAxiosError(error)) {
+      message = error.response?.data?.detail || error.message || message;
+    } else if (error instanceof Error) {
+      message = error.message;
+    }
+    return { error: message };
+  }
+};
+
 export const queryDocuments = async (request: QueryRequest): Promise<ApiResponse<ApiQueryResponse>> => {
   try {
     const response = await api.post<ApiQueryResponse>('/api/query', request);
@@ -67,6 +82,21 @@ export const queryDocuments = async (request: QueryRequest): Promise<ApiResponse
   }
 };
 
+export const queryDocumentsBatch = async (request: BatchQueryRequest): Promise<ApiResponse<ApiBatchQueryResponse>> => {
+  try {
+    const response = await api.post<ApiBatchQueryResponse>('/api/query/batch', request);
+    return { data: response.data };
+  } catch (error: unknown) {
+    let message = 'Failed to query documents';
+    if (axios.isAxiosError(error)) {
+      message = error.response?.data?.detail || error.message || message;
+    } else if (error instanceof Error) {
+      message = error.message;
+    }
+    return { error: message };
+  }
+};
+
 export const chat = async (request: ChatRequest): Promise<ApiResponse<ReadableStream>> => {
   try {
     const apiKey = localStorage.getItem('apiKey');
@@ -148,6 +178,36 @@ export const deleteDocuments = async (): Promise<ApiResponse<{ detail: string }>
   }
 };
 
+export const listDocuments = async (): Promise<ApiResponse<{ documents: DocumentSummary[] }>> => {
+  try {
+    const response = await api.get<{ documents: DocumentSummary[] }>('/api/documents');
+    return { data: response.data };
+  } catch (error: unknown) {
+    let message = 'Failed to list documents';
+    if (axios.isAxiosError(error)) {
+      message = error.response?.data?.detail || error.message || message;
+    } else if (error instanceof Error) {
+      message = error.message;
+    }
+    return { error: message };
+  }
+};
+
+export const deleteDocument = async (documentId: string): Promise<ApiResponse<{ detail: string }>> => {
+  try {
+    const response = await api.delete<{ detail: string }>(`/api/documents/${encodeURIComponent(documentId)}`);
+    return { data: response.data };
+  } catch (error: unknown) {
+    let message = 'Failed to delete document';
+    if (axios.isAxiosError(error)) {
+      message = error.response?.data?.detail || error.message || message;
+    } else if (error instanceof Error) {
+      message = error.message;
+    }
+    return { error: message };
+  }
+};
+
 export const checkHealth = async (): Promise<ApiResponse<{ status: string }>> => {
   try {
     const response = await api.get<{ status: string }>('/api/health');
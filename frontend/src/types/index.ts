@@ -3,15 +3,28 @@ export interface ChatMessage {
   content: string;
 }
 
+// Where a chunk occurs; identical or near-identical chunks are stored once with every location
+export interface ChunkLocation {
+  document_id?: string;
+  file_name?: string;
+  page_number?: number;
+  page_label?: string;
+}
+
 export interface QueryResult {
+  id: string;
   text: string;
   metadata: {
     file_name: string;
     page_number: number;
     has_tables: boolean;
     has_images: boolean;
+    duplicates?: ChunkLocation[];
   };
   score: number;
+  // Present for hybrid searches: the cosine and BM25 scores behind the fused score
+  dense_score?: number | null;
+  lexical_score?: number | null;
 }
 
 export interface ApiQueryResponse {
@@ -19,25 +32,88 @@ export interface ApiQueryResponse {
   query: string;
 }
 
+export interface ApiBatchQueryResponse {
+  results: ApiQueryResponse[];
+}
+
 export interface ApiResponse<T> {
   data?: T;
   error?: string;
 }
 
+export interface IngestionReport {
+  chunks: number;
+  batches: number;
+  retries: number;
+  cache_hits: number;
+  indexed: number;
+  duplicates: number;
+  total_chunks: number;
+  seconds: number;
+  chunks_per_second: number;
+}
+
 export interface UploadResponse {
   message: string;
-  chunks: number;
+  job_id: string;
+  status_url: string;
+  filename: string;
+}
+
+export type JobStage = 'queued' | 'parsing' | 'restoring' | 'embedding' | 'persisting' | 'completed' | 'failed';
+
+export interface JobStatus {
+  job_id: string;
   filename: string;
+  stage: JobStage;
+  pages_parsed: number;
+  chunks_embedded: number;
+  chunks_indexed: number;
+  chunks_total: number;
+  chunks_per_second: number;
+  elapsed_seconds: number;
+  document_id: string | null;
+  ingestion: IngestionReport | null;
+  error: string | null;
+}
+
+export interface DocumentSummary {
+  document_id: string;
+  file_name: string;
+  chunks: number;
+}
+
+export type SearchMode = 'dense' | 'lexical' | 'hybrid';
+
+// Metadata predicates applied before scoring; omitted fields don't filter
+export interface SearchFilters {
+  file_names?: string[];
+  document_ids?: string[];
+  page_min?: number;
+  page_max?: number;
+  has_tables?: boolean;
+  has_images?: boolean;
 }
 
 export interface QueryRequest {
   query: string;
   limit?: number;
   score_threshold?: number;
+  mode?: SearchMode;
+  filters?: SearchFilters;
+}
+
+export interface BatchQueryRequest {
+  queries: string[];
+  limit?: number;
+  score_threshold?: number;
+  mode?: SearchMode;
+  filters?: SearchFilters;
 }
 
 export interface ChatRequest {
   developer_message: string;
   user_message: string;
   model?: string;
+  filters?: SearchFilters;
 } 
\ No newline at end of file